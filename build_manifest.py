@@ -0,0 +1,171 @@
+"""
+Build Manifest for CourseMate Data Pipeline
+Records input hashes, parameters and output checksums per pipeline stage so
+unchanged stages can be skipped, and lets the server check that the course
+frame and embeddings it loads came from the same build
+"""
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'build_manifest.json'
+MANIFEST_VERSION = 1
+HASH_CHUNK_BYTES = 1 << 20
+
+
+def manifest_path_for(artifact_path: str) -> str:
+    """Manifest that describes an artifact lives in the artifact's directory"""
+    return os.path.join(os.path.dirname(os.path.abspath(artifact_path)), MANIFEST_FILE)
+
+
+def file_sha256(path: str) -> str:
+    """Streaming SHA-256 of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def params_sha256(params: Dict) -> str:
+    """Stable hash of a stage's parameters"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class BuildManifest:
+    """JSON manifest of pipeline stages and the artifacts they produced"""
+
+    def __init__(self, path: str = MANIFEST_FILE):
+        self.path = path
+        self.data = {"version": MANIFEST_VERSION, "stages": {}, "artifacts": {}, "files": {}}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    loaded = json.load(f)
+                if loaded.get("version") == MANIFEST_VERSION:
+                    self.data.update(loaded)
+                else:
+                    logger.warning(f"Ignoring manifest {path} with unknown version {loaded.get('version')}")
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+
+    def save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.data, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    # ---------- hashing ----------
+
+    def checksum(self, path: str) -> str:
+        """SHA-256 of a file, reusing the recorded hash while size and mtime are unchanged"""
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        cached = self.data["files"].get(key)
+        if cached and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["sha256"]
+        sha = file_sha256(path)
+        self.data["files"][key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": sha}
+        return sha
+
+    # ---------- stages ----------
+
+    def stage_is_current(self, name: str, inputs: Dict[str, str], params: Dict, outputs: Iterable[str]) -> bool:
+        """True when the stage ran with these inputs and params and its outputs are intact"""
+        record = self.data["stages"].get(name)
+        if not record:
+            return False
+        if record.get("params_sha256") != params_sha256(params):
+            return False
+        for label, path in inputs.items():
+            if not os.path.exists(path) or record["inputs"].get(label) != self.checksum(path):
+                return False
+        for path in outputs:
+            expected = record["outputs"].get(os.path.basename(path))
+            if expected is None or not os.path.exists(path) or self.checksum(path) != expected:
+                return False
+        return True
+
+    def record_stage(self, name: str, inputs: Dict[str, str], params: Dict, outputs: Iterable[str],
+                     stats: Optional[Dict] = None):
+        self.data["stages"][name] = {
+            "inputs": {label: self.checksum(path) for label, path in inputs.items()},
+            "params": params,
+            "params_sha256": params_sha256(params),
+            "outputs": {os.path.basename(path): self.checksum(path) for path in outputs},
+            "completed_at": _now(),
+            "stats": stats or {},
+        }
+
+    # ---------- artifacts ----------
+
+    def record_artifacts(self, build_id: str, paths: Iterable[str], **extra):
+        """Tag served artifacts with the build they belong to"""
+        for path in paths:
+            name = os.path.basename(path)
+            sha = self.checksum(path)
+            previous = self.data["artifacts"].get(name) or {}
+            # An unchanged artifact keeps its original build time (drives Last-Modified)
+            unchanged = previous.get("sha256") == sha and previous.get("build_id") == build_id
+            self.data["artifacts"][name] = {
+                "build_id": build_id,
+                "sha256": sha,
+                "size": os.path.getsize(path),
+                "built_at": previous["built_at"] if unchanged else _now(),
+                **extra,
+            }
+
+    def artifact(self, path: str) -> Optional[Dict]:
+        return self.data["artifacts"].get(os.path.basename(path))
+
+
+def verify_artifacts(frame_path: str, embeddings_path: Optional[str], full_checksum: bool = False) -> Dict:
+    """Check that the served frame (and embeddings) belong to one recorded build.
+
+    Returns {"build_id", "built_at", "verified", "problems"}. A missing
+    manifest is not an error; size or checksum drift and build mismatches are.
+    """
+    result = {"build_id": None, "built_at": None, "verified": False, "problems": []}
+    path = manifest_path_for(frame_path)
+    if not os.path.exists(path):
+        result["problems"].append(f"no {MANIFEST_FILE} next to {frame_path}")
+        return result
+
+    manifest = BuildManifest(path)
+    frame_entry = manifest.artifact(frame_path)
+    if frame_entry is None:
+        result["problems"].append(f"{os.path.basename(frame_path)} is not recorded in {path}")
+        return result
+    result["build_id"] = frame_entry["build_id"]
+    result["built_at"] = frame_entry.get("built_at")
+
+    entries = [(frame_path, frame_entry)]
+    if embeddings_path:
+        emb_entry = manifest.artifact(embeddings_path)
+        if emb_entry is None:
+            result["problems"].append(f"{os.path.basename(embeddings_path)} is not recorded in {path}")
+        elif emb_entry["build_id"] != frame_entry["build_id"]:
+            result["problems"].append(
+                f"embeddings build {emb_entry['build_id']} != course frame build {frame_entry['build_id']}"
+            )
+        else:
+            entries.append((embeddings_path, emb_entry))
+
+    for artifact_path, entry in entries:
+        if os.path.getsize(artifact_path) != entry["size"]:
+            result["problems"].append(f"{os.path.basename(artifact_path)} size changed since build")
+        elif full_checksum and file_sha256(artifact_path) != entry["sha256"]:
+            result["problems"].append(f"{os.path.basename(artifact_path)} checksum changed since build")
+
+    result["verified"] = not result["problems"]
+    return result
@@ -0,0 +1,306 @@
+"""
+Catalogue Sync for CourseMate
+Background job that pages through the external providers, normalises
+their courses to rows of the local course table and upserts them into
+the live store. Every batch is appended to a log and checkpointed, so a
+restart replays what was synced and resumes the pass where it stopped.
+"""
+
+import os
+import json
+import time
+import zlib
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from providers import Provider
+from upstream import UpstreamError
+
+logger = logging.getLogger(__name__)
+
+SYNC_LOG = "synced_courses.jsonl"
+CHECKPOINT = "sync_checkpoint.json"
+
+
+def synthetic_id(provider: str, key: str) -> int:
+    """Stable negative id for courses without a Udemy integer id (never collides with local ids)"""
+    return -1 - (zlib.crc32(f"{provider}:{key}".encode()) & 0x7FFFFFFF)
+
+
+def course_row(course: dict, provider: str) -> Optional[dict]:
+    """Frontend course dict (as the provider adapters return) -> row of the local course table"""
+    title = (course.get("title") or "").strip()
+    if not title:
+        return None
+    course_id = course.get("id")
+    if not (isinstance(course_id, int) and course_id > 0):
+        course_id = synthetic_id(provider, str(course_id or course.get("url") or title))
+    instructors = ", ".join(i.get("name", "") for i in course.get("visible_instructors") or [] if i.get("name"))
+    language = course.get("language") or ""
+    is_paid = bool(course.get("is_paid", False))
+    try:
+        rating = float(course.get("avg_rating") or course.get("rating") or 0)
+    except (TypeError, ValueError):
+        rating = 0.0
+    return {
+        "id": course_id,
+        "title": title,
+        "instructor": instructors or None,
+        "price": "Paid" if is_paid else "Free",
+        "is_paid": is_paid,
+        "rating": rating,
+        "num_subscribers": int(course.get("num_subscribers") or 0),
+        "num_reviews": int(course.get("num_reviews") or 0),
+        "category": (course.get("primary_category") or {}).get("name") or None,
+        "level": course.get("instructional_level") or None,
+        "language": "English" if language.lower().startswith("en") else (language or None),
+        "headline": course.get("headline") or None,
+        "description": course.get("description") or None,
+        "url": course.get("url") or None,
+        "image_url": course.get("image_480x270") or None,
+    }
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class CatalogueSync:
+    """Pages `queries` through each provider, `batch_size` pages at a time, at most `max_per_host` per host.
+
+    `apply` receives each batch's rows (already persisted) and upserts them
+    into the serving store.
+    """
+
+    def __init__(self, providers: List[Provider], queries: List[str], apply: Callable[[List[dict]], Awaitable[Any]],
+                 state_dir: str, pages: int = 10, page_size: int = 50, batch_size: int = 6,
+                 max_per_host: int = 12):
+        self.providers = {provider.name: provider for provider in providers}
+        self.queries = queries
+        self.apply = apply
+        self.state_dir = state_dir
+        self.pages = pages
+        self.page_size = page_size
+        self.batch_size = max(1, batch_size)
+        self.log_path = os.path.join(state_dir, SYNC_LOG)
+        self.checkpoint_path = os.path.join(state_dir, CHECKPOINT)
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+        self.max_per_host = max(1, max_per_host)
+        self.state = self._load_checkpoint()
+        self.running = False
+        self.last_error: Optional[str] = None
+        self.last_batch_ms = 0.0
+
+    # ---------- persistence ----------
+
+    def _new_pass(self, number: int) -> Dict[str, Any]:
+        return {
+            "pass": number,
+            "started_at": _now(),
+            "completed_at": None,
+            "streams": {f"{name}|{query}": {"next_page": 1, "exhausted": False, "error": None}
+                        for name in self.providers for query in self.queries},
+            "log_bytes": os.path.getsize(self.log_path) if os.path.exists(self.log_path) else 0,
+            "records": 0,
+        }
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        try:
+            with open(self.checkpoint_path) as f:
+                state = json.load(f)
+            # A restart retries streams that failed; providers or queries added since start from page 1
+            for cursor in state["streams"].values():
+                cursor["error"] = None
+            for name in self.providers:
+                for query in self.queries:
+                    state["streams"].setdefault(f"{name}|{query}",
+                                                {"next_page": 1, "exhausted": False, "error": None})
+            return state
+        except FileNotFoundError:
+            return self._new_pass(1)
+        except (ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable sync checkpoint {self.checkpoint_path}: {e}")
+            return self._new_pass(1)
+
+    def _save_checkpoint(self):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+
+    def _append_log(self, rows: List[dict]) -> int:
+        with open(self.log_path, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+    def _read_log(self) -> List[dict]:
+        """Rows acknowledged by the checkpoint, latest copy per id; a torn tail is truncated away"""
+        if not os.path.exists(self.log_path):
+            return []
+        limit = self.state.get("log_bytes", 0)
+        if os.path.getsize(self.log_path) > limit:
+            with open(self.log_path, "r+") as f:
+                f.truncate(limit)
+        latest: Dict[int, dict] = {}
+        with open(self.log_path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    continue
+                latest[row["id"]] = row
+        return list(latest.values())
+
+    def _compact_log(self) -> int:
+        """Rewrite the log with one row per course before a new pass appends to it"""
+        rows = self._read_log()
+        tmp = self.log_path + ".tmp"
+        with open(tmp, "w") as f:
+            for row in rows:
+                f.write(json.dumps(row, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.log_path)
+        return len(rows)
+
+    # ---------- running ----------
+
+    async def restore(self) -> int:
+        """Replay previously synced rows into the store (call once after the store is loaded)"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        rows = await asyncio.to_thread(self._read_log)
+        if rows:
+            await self.apply(rows)
+            logger.info(f"Catalogue sync: restored {len(rows)} synced courses (pass {self.state['pass']})")
+        return len(rows)
+
+    def _slots(self, provider: Provider) -> asyncio.Semaphore:
+        host = urlparse(provider.url).hostname or provider.name
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.max_per_host)
+        return self._host_slots[host]
+
+    async def _fetch_page(self, stream: str, page: int) -> Tuple[str, int, Any]:
+        name, query = stream.split("|", 1)
+        provider = self.providers[name]
+        async with self._slots(provider):
+            try:
+                return stream, page, await provider.fetch(query, self.page_size, None, page=page)
+            except (UpstreamError, asyncio.TimeoutError) as e:
+                return stream, page, e
+            except Exception as e:
+                logger.exception(f"Catalogue sync: {name} page {page} of {query!r} raised: {e}")
+                return stream, page, e
+
+    def _next_batch(self) -> List[Tuple[str, int]]:
+        """Up to batch_size (stream, page) units, taken round-robin so providers share the batch"""
+        open_streams = [key for key, cursor in self.state["streams"].items()
+                        if key.split("|", 1)[0] in self.providers and not cursor["exhausted"]
+                        and not cursor["error"] and cursor["next_page"] <= self.pages]
+        units: List[Tuple[str, int]] = []
+        offset = 0
+        while open_streams and len(units) < self.batch_size:
+            for key in list(open_streams):
+                page = self.state["streams"][key]["next_page"] + offset
+                if page > self.pages:
+                    open_streams.remove(key)
+                    continue
+                units.append((key, page))
+                if len(units) >= self.batch_size:
+                    break
+            offset += 1
+        return units
+
+    async def run_pass(self) -> int:
+        """Run (or resume) the current pass to completion; returns rows synced by this call"""
+        os.makedirs(self.state_dir, exist_ok=True)
+        # File writes and fsyncs run on a thread so requests never stall behind the disk
+        if self.state.get("completed_at"):
+            await asyncio.to_thread(self._compact_log)
+            self.state = self._new_pass(self.state["pass"] + 1)
+            await asyncio.to_thread(self._save_checkpoint)
+        self.running = True
+        synced = 0
+        try:
+            while True:
+                units = self._next_batch()
+                if not units:
+                    break
+                start = time.perf_counter()
+                results = await asyncio.gather(*(self._fetch_page(key, page) for key, page in units))
+                rows = self._advance(sorted(results, key=lambda r: (r[0], r[1])))
+                if rows:
+                    self.state["log_bytes"] = await asyncio.to_thread(self._append_log, rows)
+                    self.state["records"] += len(rows)
+                await asyncio.to_thread(self._save_checkpoint)
+                if rows:
+                    await self.apply(rows)
+                    synced += len(rows)
+                self.last_batch_ms = round((time.perf_counter() - start) * 1000, 1)
+            self.state["completed_at"] = _now()
+            await asyncio.to_thread(self._save_checkpoint)
+            logger.info(f"Catalogue sync pass {self.state['pass']} complete: {self.state['records']} rows")
+        finally:
+            self.running = False
+        return synced
+
+    def _advance(self, results: List[Tuple[str, int, Any]]) -> List[dict]:
+        """Move stream cursors past contiguous successful pages and collect their rows"""
+        rows: List[dict] = []
+        for key, page, outcome in results:
+            cursor = self.state["streams"][key]
+            # A failure or short page earlier in this stream makes later pages moot
+            if cursor["exhausted"] or cursor["error"] or page != cursor["next_page"]:
+                continue
+            if isinstance(outcome, Exception):
+                cursor["error"] = f"{type(outcome).__name__}: {outcome}"
+                self.last_error = f"{key} page {page}: {cursor['error']}"
+                logger.warning(f"Catalogue sync: {self.last_error}")
+                continue
+            name = key.split("|", 1)[0]
+            rows.extend(row for row in (course_row(course, name) for course in outcome) if row)
+            cursor["next_page"] = page + 1
+            if len(outcome) < self.page_size:
+                cursor["exhausted"] = True
+        return rows
+
+    async def run_forever(self, interval: float):
+        """Resume any unfinished pass, then start a new one every `interval` seconds"""
+        while True:
+            completed = self.state.get("completed_at")
+            if completed:
+                elapsed = (datetime.now(timezone.utc) - datetime.fromisoformat(completed)).total_seconds()
+                if elapsed < interval:
+                    await asyncio.sleep(interval - elapsed)
+            try:
+                await self.run_pass()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.exception(f"Catalogue sync pass failed: {e}")
+                await asyncio.sleep(min(interval, 60))
+
+    def metrics(self) -> Dict[str, Any]:
+        streams = self.state["streams"]
+        return {
+            "running": self.running,
+            "pass": self.state["pass"],
+            "started_at": self.state["started_at"],
+            "completed_at": self.state["completed_at"],
+            "records_this_pass": self.state["records"],
+            "streams_open": sum(1 for c in streams.values() if not c["exhausted"] and not c["error"]
+                                and c["next_page"] <= self.pages),
+            "streams_failed": sum(1 for c in streams.values() if c["error"]),
+            "last_batch_ms": self.last_batch_ms,
+            "last_error": self.last_error,
+            "streams": streams,
+        }
@@ -5,6 +5,17 @@ from dotenv import load_dotenv
 # Load environment variables from config.env file
 load_dotenv('config.env')
 
+
+def shard_local_path(path: str) -> str:
+    """`path` with this server's shard suffixed ("x.npz" -> "x.0of2.npz"), so shard processes
+    started from one directory never share state files. Unchanged when the catalogue is not sharded.
+    """
+    count = int(os.getenv('SHARD_COUNT', '1'))
+    if count <= 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{os.getenv('SHARD_INDEX', '0')}of{count}{ext}"
+
 class Config:
     """Configuration class for the course recommender application"""
     
@@ -13,14 +24,60 @@ class Config:
     UDEMY_BASE_URL: str = os.getenv('UDEMY_BASE_URL', 'https://www.udemy.com/api-2.0')
     COURSERA_BASE_URL: str = os.getenv('COURSERA_BASE_URL', 'https://api.coursera.org/api')
     EDX_BASE_URL: str = os.getenv('EDX_BASE_URL', 'https://courses.edx.org/api')
+    RAPIDAPI_KEY: str = os.getenv('RAPIDAPI_KEY', '')
+    RAPIDAPI_HOST: str = os.getenv('RAPIDAPI_HOST', 'udemy-paid-courses-for-free-api.p.rapidapi.com')
+    RAPIDAPI_BASE_URL: str = os.getenv('RAPIDAPI_BASE_URL', 'https://udemy-paid-courses-for-free-api.p.rapidapi.com')
     IMAGE_BASE_URL: str = os.getenv('IMAGE_BASE_URL', 'https://img-c.udemycdn.com')
     FALLBACK_POSTER_URL: str = os.getenv('FALLBACK_POSTER_URL', 'https://dummyimage.com/480x270/1f2937/9ca3af&text=No+Image')
     COURSE_LINK_BASE: str = os.getenv('COURSE_LINK_BASE', 'https://www.udemy.com')
+    # Image proxy cache: disk LRU budget and in-memory hot tier (IMAGE_CACHE_MAX_MB=0 streams uncached)
+    IMAGE_CACHE_DIR: str = os.getenv('IMAGE_CACHE_DIR', shard_local_path('./image_cache'))
+    IMAGE_CACHE_MAX_MB: int = int(os.getenv('IMAGE_CACHE_MAX_MB', '256'))
+    IMAGE_CACHE_MEMORY_MB: int = int(os.getenv('IMAGE_CACHE_MEMORY_MB', '32'))
+    # Largest upstream image the proxy will relay or cache
+    IMAGE_PROXY_MAX_BYTES: int = int(os.getenv('IMAGE_PROXY_MAX_BYTES', str(5 * 1024 * 1024)))
+    # ?size= targets and output formats for resized thumbnails (formats in preference order; needs Pillow)
+    IMAGE_VARIANTS: str = os.getenv('IMAGE_VARIANTS', '240x135,480x270')
+    IMAGE_TRANSCODE_FORMATS: str = os.getenv('IMAGE_TRANSCODE_FORMATS', 'avif,webp')
+    IMAGE_TRANSCODE_THREADS: int = int(os.getenv('IMAGE_TRANSCODE_THREADS', '2'))
+    # Background thumbnail warm-up for course lists: concurrent fetches, variant warmed and cards per list
+    IMAGE_PREFETCH_CONCURRENCY: int = int(os.getenv('IMAGE_PREFETCH_CONCURRENCY', '8'))
+    IMAGE_PREFETCH_SIZE: str = os.getenv('IMAGE_PREFETCH_SIZE', '480x270')
+    IMAGE_PREFETCH_PER_LIST: int = int(os.getenv('IMAGE_PREFETCH_PER_LIST', '12'))
     
     # Backend API Configuration
     BACKEND_BASE_URL: str = os.getenv('BACKEND_BASE_URL', 'http://127.0.0.1:8000')
     API_TIMEOUT_SEC: int = int(os.getenv('API_TIMEOUT_SEC', '20'))
     API_MAX_RETRIES: int = int(os.getenv('API_MAX_RETRIES', '3'))
+    # Upstream client: per-attempt timeout, stale fallback window and circuit breaker
+    UPSTREAM_ATTEMPT_TIMEOUT_SEC: float = float(os.getenv('UPSTREAM_ATTEMPT_TIMEOUT_SEC', '4'))
+    UPSTREAM_STALE_TTL_SEC: float = float(os.getenv('UPSTREAM_STALE_TTL_SEC', '600'))
+    UPSTREAM_BREAKER_FAILURES: int = int(os.getenv('UPSTREAM_BREAKER_FAILURES', '5'))
+    UPSTREAM_BREAKER_RESET_SEC: float = float(os.getenv('UPSTREAM_BREAKER_RESET_SEC', '30'))
+    # Federated search: providers queried (unconfigured ones are skipped) and each one's time budget
+    FEDERATED_PROVIDERS: str = os.getenv('FEDERATED_PROVIDERS', 'local,udemy,rapidapi,coursera,edx')
+    FEDERATED_TIMEOUT_MS: int = int(os.getenv('FEDERATED_TIMEOUT_MS', '1200'))
+    # Catalogue sync: background paging of providers into the local store (interval 0 = off);
+    # API_BATCH_SIZE pages per checkpointed batch, at most API_MAX_PER_HOST in flight per host
+    CATALOGUE_SYNC_INTERVAL_SEC: int = int(os.getenv('CATALOGUE_SYNC_INTERVAL_SEC', '0'))
+    CATALOGUE_SYNC_PROVIDERS: str = os.getenv('CATALOGUE_SYNC_PROVIDERS', 'udemy,rapidapi,coursera,edx')
+    CATALOGUE_SYNC_QUERIES: str = os.getenv(
+        'CATALOGUE_SYNC_QUERIES', 'python,javascript,data science,machine learning,web development,design,marketing')
+    CATALOGUE_SYNC_PAGES: int = int(os.getenv('CATALOGUE_SYNC_PAGES', '10'))
+    CATALOGUE_SYNC_PAGE_SIZE: int = int(os.getenv('CATALOGUE_SYNC_PAGE_SIZE', '50'))
+    CATALOGUE_SYNC_DIR: str = os.getenv('CATALOGUE_SYNC_DIR', './sync_state')
+    # Trending: interaction counters halving every TRENDING_HALF_LIFE_HOURS (0 = subscriber order only);
+    # exact counters for TRENDING_TRACKED courses, a count-min sketch for the rest, snapshotted to disk
+    TRENDING_HALF_LIFE_HOURS: float = float(os.getenv('TRENDING_HALF_LIFE_HOURS', '12'))
+    TRENDING_TRACKED: int = int(os.getenv('TRENDING_TRACKED', '4096'))
+    TRENDING_TOP_K: int = int(os.getenv('TRENDING_TOP_K', '200'))
+    TRENDING_SKETCH_WIDTH: int = int(os.getenv('TRENDING_SKETCH_WIDTH', '65536'))
+    TRENDING_SKETCH_DEPTH: int = int(os.getenv('TRENDING_SKETCH_DEPTH', '4'))
+    # Decayed score (clicks' worth) a course needs before it outranks the subscriber-ordered catalogue
+    TRENDING_MIN_SCORE: float = float(os.getenv('TRENDING_MIN_SCORE', '3'))
+    TRENDING_MAX_BATCH: int = int(os.getenv('TRENDING_MAX_BATCH', '500'))
+    TRENDING_SNAPSHOT_FILE: str = os.getenv('TRENDING_SNAPSHOT_FILE', shard_local_path('./trending_state.npz'))
+    TRENDING_SNAPSHOT_SEC: int = int(os.getenv('TRENDING_SNAPSHOT_SEC', '60'))
     
     # Model Configuration (Local files only)
     MODEL_CACHE_DIR: str = os.getenv('MODEL_CACHE_DIR', './models')
@@ -38,7 +95,41 @@ class Config:
     COURSES_DATA_FILE: str = os.getenv('COURSES_DATA_FILE', "courses_data.sample.feather")
     EMBEDDINGS_FILE: str = os.getenv('EMBEDDINGS_FILE', "course_embeddings_sample.npy")
     MODEL_FILE: str = "fine_tuned_sbert_course_model.zip"
-    
+    # Re-hash artifacts against build_manifest.json at startup (size is always checked)
+    VERIFY_ARTIFACT_CHECKSUMS: bool = os.getenv('VERIFY_ARTIFACT_CHECKSUMS', 'false').lower() == 'true'
+
+    # Scoring executor (CPU-bound ranking runs off the event loop)
+    SCORING_THREADS: int = int(os.getenv('SCORING_THREADS', '0'))  # 0 = min(8, cpu count)
+    SCORING_ROUTE_LIMITS: str = os.getenv('SCORING_ROUTE_LIMITS', 'search=4,recommendations=4,listing=8')
+    # Similarity scoring processes sharing the memory-mapped embeddings (0 = score on the threads)
+    SCORING_PROCESSES: int = int(os.getenv('SCORING_PROCESSES', '0'))
+    # Time budget for /search and /recommendations; scans stop here and return partial results
+    # (leaves headroom under the 2 s response promise for formatting and transfer)
+    REQUEST_DEADLINE_MS: int = int(os.getenv('REQUEST_DEADLINE_MS', '1500'))
+    # Admission control: requests waiting per route and how long they may wait before a 503
+    SCORING_MAX_QUEUE: int = int(os.getenv('SCORING_MAX_QUEUE', '32'))
+    SCORING_MAX_WAIT_MS: int = int(os.getenv('SCORING_MAX_WAIT_MS', '2000'))
+    # Cheap routes with their own thread lane so they never wait behind search scans
+    SCORING_PRIORITY_ROUTES: str = os.getenv('SCORING_PRIORITY_ROUTES', 'listing')
+
+    # Sharding: a shard server holds courses with id % SHARD_COUNT == SHARD_INDEX;
+    # setting SHARD_URLS (shard 0 first) turns this server into a coordinator
+    SHARD_INDEX: int = int(os.getenv('SHARD_INDEX', '0'))
+    SHARD_COUNT: int = int(os.getenv('SHARD_COUNT', '1'))
+    SHARD_URLS: str = os.getenv('SHARD_URLS', '')
+    SHARD_TIMEOUT_SEC: float = float(os.getenv('SHARD_TIMEOUT_SEC', '5'))
+
+    # Per-client rate limits: path=tokens_per_sec:burst, keyed by X-API-Key or client IP
+    RATE_LIMIT_ENABLED: bool = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMITS: str = os.getenv('RATE_LIMITS', '/search=5:20,/image-proxy=30:120,/events=10:40,/external/udemy-rapid/search=1:5')
+    # "memory" (per process) or redis://host:6379/0 to share buckets across workers
+    RATE_LIMIT_BACKEND: str = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    # Key on the X-Forwarded-For hop appended by your proxy. Must be true behind a reverse proxy or
+    # hosting load balancer: otherwise every user arrives from the proxy's IP and shares one bucket
+    RATE_LIMIT_TRUST_PROXY: bool = os.getenv('RATE_LIMIT_TRUST_PROXY', 'false').lower() == 'true'
+    # Comma-separated API keys that get their own bucket via X-API-Key (any other value is keyed by IP)
+    RATE_LIMIT_API_KEYS: str = os.getenv('RATE_LIMIT_API_KEYS', '')
+
     @classmethod
     def validate(cls) -> bool:
         """Validate that all required configuration is present"""
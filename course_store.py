@@ -0,0 +1,614 @@
+"""
+Compact Course Store for CourseMate
+Holds the course catalogue in narrow, dictionary-encoded columns and
+reads the heavy text columns lazily from the on-disk artifact
+"""
+
+import os
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORICAL_COLUMNS = ('category', 'level', 'language', 'price', 'duration')
+
+# Free-text columns kept resident as Arrow-backed strings (search and cards need them)
+STRING_COLUMNS = ('title', 'instructor', 'description', 'url', 'headline', 'image_url', 'title_clean')
+
+# Narrow numeric dtypes for count/score columns
+INTEGER_COLUMNS = ('id', 'num_subscribers', 'num_reviews', 'canonical_id')
+FLOAT_COLUMNS = ('rating',)
+
+# Large text columns only the detail endpoint needs; read on demand from disk
+LAZY_TEXT_COLUMNS = ('curriculum', 'objectives')
+
+ARROW_STRING = "string[pyarrow]"
+
+# Artifact encoding: zstd-compressed Arrow IPC in small batches so a detail
+# lookup only decompresses one batch of the lazy text columns
+DEFAULT_COMPRESSION = os.getenv('ARTIFACT_COMPRESSION', 'zstd')
+DEFAULT_CHUNK_ROWS = int(os.getenv('ARTIFACT_CHUNK_ROWS', '4096'))
+BATCH_ROWS_KEY = b'coursemate.batch_rows'
+ROW_COUNT_KEY = b'coursemate.rows'
+# JSON {column: uncompressed bytes} of the lazy text columns, so reports never decompress them
+LAZY_BYTES_KEY = b'coursemate.lazy_bytes'
+
+# Sidecar file holding derived lookup arrays next to a course artifact
+INDEX_SUFFIX = '.indexes.npz'
+
+# Keys with a presorted permutation index (frame positions, best first)
+SORT_KEYS = ('subscribers', 'rating', 'reviews', 'bayes', 'recency')
+
+# Weight, in reviews, of the catalogue mean in the Bayesian average rating
+BAYES_PRIOR_REVIEWS = 100
+
+# Permutation entries checked per step when walking an index through a filter
+ORDER_WALK_ROWS = 4096
+
+# Filter bitmaps kept per store snapshot
+MASK_CACHE_SIZE = 64
+
+
+def index_path_for(artifact_path: str) -> str:
+    """Path of the derived-index sidecar for a course artifact"""
+    return artifact_path + INDEX_SUFFIX
+
+
+def bayesian_rating(rating: np.ndarray, reviews: np.ndarray, prior_reviews: float = BAYES_PRIOR_REVIEWS) -> np.ndarray:
+    """Ratings shrunk toward the review-weighted catalogue mean: (C*m + n*r) / (C + n)"""
+    rating = rating.astype(np.float64)
+    reviews = reviews.astype(np.float64)
+    mean = float(np.average(rating, weights=reviews)) if reviews.sum() > 0 else 0.0
+    return ((prior_reviews * mean + reviews * rating) / (prior_reviews + reviews)).astype(np.float32)
+
+
+def sort_key_values(frame: pd.DataFrame, key: str) -> np.ndarray:
+    """Per-row value a sort key orders by (higher first)"""
+    if key == 'subscribers':
+        return frame['num_subscribers'].to_numpy()
+    if key == 'rating':
+        return frame['rating'].to_numpy(dtype=np.float32, na_value=0.0)
+    if key == 'reviews':
+        return frame['num_reviews'].to_numpy()
+    if key == 'bayes':
+        return bayesian_rating(frame['rating'].to_numpy(dtype=np.float32, na_value=0.0),
+                               frame['num_reviews'].to_numpy())
+    if key == 'recency':
+        # The catalogue has no publish date; Udemy course ids grow with creation time
+        return frame['id'].to_numpy()
+    raise ValueError(f"Unknown sort key {key}")
+
+
+def sort_indexes(frame: pd.DataFrame, keys: Sequence[str] = SORT_KEYS) -> Dict[str, np.ndarray]:
+    """Descending permutation of frame positions per sort key; ties keep frame order"""
+    indexes = {}
+    for key in keys:
+        values = sort_key_values(frame, key)
+        if key == 'bayes':
+            indexes['bayes_rating'] = values
+        # Stable sort of the negated key: descending, and equal keys stay in frame order (like nlargest)
+        indexes[f'order_{key}'] = np.argsort(-values.astype(np.float64), kind='stable').astype(np.int32)
+    return indexes
+
+
+def category_indexes(frame: pd.DataFrame, bayes_order: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per-category Bayesian rankings packed into one array.
+
+    bayes_by_category[bayes_category_offsets[i]:bayes_category_offsets[i + 1]]
+    holds the positions of category bayes_categories[i], best first. Courses
+    without a category are left out.
+    """
+    codes, names = pd.factorize(frame['category'].astype(object), sort=True)
+    # Stable regrouping of the global order keeps each category's rows in Bayesian order
+    ranked_codes = codes[bayes_order]
+    grouping = np.argsort(ranked_codes, kind='stable')
+    grouped = bayes_order[grouping]
+    grouped_codes = ranked_codes[grouping]
+    start = np.searchsorted(grouped_codes, 0)
+    offsets = np.searchsorted(grouped_codes[start:], np.arange(len(names) + 1)).astype(np.int64)
+    return {
+        'bayes_categories': np.asarray([str(name) for name in names], dtype=str),
+        'bayes_category_offsets': offsets,
+        'bayes_by_category': grouped[start:].astype(np.int32),
+    }
+
+
+def build_indexes(frame: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Derived lookup arrays for a course frame (row order must match the artifact)"""
+    ids = frame['id'].to_numpy()
+    id_order = np.argsort(ids, kind='stable').astype(np.int32)
+    indexes = {
+        'id_order': id_order,
+        'sorted_ids': ids[id_order],
+        **sort_indexes(frame),
+    }
+    if 'category' in frame.columns:
+        indexes.update(category_indexes(frame, indexes['order_bayes']))
+    return indexes
+
+
+def save_indexes(artifact_path: str, indexes: Dict[str, np.ndarray]) -> str:
+    """Write derived indexes next to the artifact they describe"""
+    path = index_path_for(artifact_path)
+    with open(path, 'wb') as f:
+        np.savez(f, **indexes)
+    return path
+
+
+def load_indexes(artifact_path: str, rows: int) -> Optional[Dict[str, np.ndarray]]:
+    """Load the index sidecar if present and aligned with a frame of `rows` rows"""
+    path = index_path_for(artifact_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            indexes = {k: data[k] for k in data.files}
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable index file {path}: {e}")
+        return None
+    if len(indexes.get('id_order', ())) != rows:
+        logger.warning(f"Ignoring stale index file {path}: expected {rows} rows")
+        return None
+    return indexes
+
+
+def _column_bytes(series: pd.Series) -> int:
+    """Deep memory usage of a single column in bytes"""
+    return int(series.memory_usage(index=False, deep=True))
+
+
+def compact_column(name: str, series: pd.Series) -> pd.Series:
+    """Convert a column to the narrowest dtype suited to its role"""
+    if name in CATEGORICAL_COLUMNS:
+        return series.astype("category")
+    if name in INTEGER_COLUMNS:
+        values = pd.to_numeric(series.fillna(0)).astype(np.int64)
+        # int32 covers every Udemy id and count; smaller types would overflow on upserts
+        if len(values) == 0 or (values.min() >= np.iinfo(np.int32).min and values.max() <= np.iinfo(np.int32).max):
+            return values.astype(np.int32)
+        return values
+    if name in FLOAT_COLUMNS:
+        return series.fillna(0.0).astype(np.float32)
+    if name == 'is_paid':
+        return series.fillna(True).astype(bool)
+    if series.dtype == object or name in STRING_COLUMNS or name in LAZY_TEXT_COLUMNS:
+        return series.astype(ARROW_STRING)
+    return series
+
+
+def widen_integer_column(frame: pd.DataFrame, name: str, values: pd.Series):
+    """Widen an integer column of `frame` to int64 in place when `values` do not fit its dtype"""
+    dtype = frame[name].dtype
+    if not (isinstance(dtype, np.dtype) and np.issubdtype(dtype, np.integer)) or not len(values):
+        return
+    numbers = pd.to_numeric(values, errors='coerce').dropna()
+    info = np.iinfo(dtype)
+    # A plain astype would wrap the value around, and lookups by id would then miss it
+    if len(numbers) and (numbers.min() < info.min or numbers.max() > info.max):
+        frame[name] = frame[name].astype(np.int64)
+
+
+class LazyTextSource:
+    """Reads heavy text values for single rows from a memory-mapped Arrow IPC file"""
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        self.path = path
+        self._reader = pa.ipc.open_file(pa.memory_map(path, 'r'))
+        self.schema = self._reader.schema
+        names = self.schema.names
+        self.columns = [c for c in columns if c in names]
+        self._column_index = {c: names.index(c) for c in self.columns}
+        self._batch_starts = self._read_batch_starts()
+        self._column_bytes: Optional[Dict[str, int]] = None
+
+    def _read_batch_starts(self) -> np.ndarray:
+        # Artifacts written by write_artifact record their batch size, which
+        # avoids decompressing every batch just to count rows
+        metadata = self.schema.metadata or {}
+        batches = self._reader.num_record_batches
+        if BATCH_ROWS_KEY in metadata and ROW_COUNT_KEY in metadata:
+            chunk = int(metadata[BATCH_ROWS_KEY])
+            total = int(metadata[ROW_COUNT_KEY])
+            starts = np.arange(batches + 1, dtype=np.int64) * chunk
+            starts[-1] = total
+            return starts
+        sizes = [self._reader.get_batch(i).num_rows for i in range(batches)]
+        return np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+
+    def fetch(self, file_row: int, columns: Optional[Sequence[str]] = None) -> Dict[str, Optional[str]]:
+        """Return the requested heavy columns for one row of the artifact"""
+        wanted = [c for c in (columns or self.columns) if c in self._column_index]
+        if not wanted:
+            return {}
+        batch_no = int(np.searchsorted(self._batch_starts, file_row, side='right') - 1)
+        batch = self._reader.get_batch(batch_no)
+        offset = file_row - int(self._batch_starts[batch_no])
+        return {c: batch.column(self._column_index[c])[offset].as_py() for c in wanted}
+
+    def column_bytes(self, scan: bool = True) -> Dict[str, int]:
+        """Uncompressed size of each lazy column inside the artifact.
+
+        Read from the schema metadata when write_artifact recorded it; older
+        artifacts are decompressed batch by batch, only when `scan` is set.
+        """
+        if self._column_bytes is None:
+            recorded = (self.schema.metadata or {}).get(LAZY_BYTES_KEY)
+            if recorded is not None:
+                sizes = json.loads(recorded)
+                self._column_bytes = {c: int(sizes.get(c, 0)) for c in self.columns}
+                return self._column_bytes
+            if not scan:
+                return {}
+            sizes = {c: 0 for c in self.columns}
+            for i in range(self._reader.num_record_batches):
+                batch = self._reader.get_batch(i)
+                for c in self.columns:
+                    sizes[c] += batch.column(self._column_index[c]).nbytes
+            self._column_bytes = sizes
+        return self._column_bytes
+
+
+class ParquetTextSource:
+    """Reads heavy text values for single rows from one Parquet row group"""
+
+    def __init__(self, path: str, columns: Sequence[str]):
+        self.path = path
+        self._file = pq.ParquetFile(path)
+        self.schema = self._file.schema_arrow
+        self.columns = [c for c in columns if c in self.schema.names]
+        metadata = self._file.metadata
+        sizes = [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+        self._group_starts = np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+
+    def fetch(self, file_row: int, columns: Optional[Sequence[str]] = None) -> Dict[str, Optional[str]]:
+        """Return the requested heavy columns for one row of the artifact"""
+        wanted = [c for c in (columns or self.columns) if c in self.columns]
+        if not wanted:
+            return {}
+        group = int(np.searchsorted(self._group_starts, file_row, side='right') - 1)
+        table = self._file.read_row_group(group, columns=wanted)
+        offset = file_row - int(self._group_starts[group])
+        return {c: table.column(c)[offset].as_py() for c in wanted}
+
+    def column_bytes(self, scan: bool = True) -> Dict[str, int]:
+        """Uncompressed size of each lazy column, taken from the Parquet footer"""
+        metadata = self._file.metadata
+        names = self.schema.names
+        sizes = {c: 0 for c in self.columns}
+        for i in range(metadata.num_row_groups):
+            group = metadata.row_group(i)
+            for c in self.columns:
+                sizes[c] += group.column(names.index(c)).total_uncompressed_size
+        return sizes
+
+
+def write_artifact(df: pd.DataFrame, path: str, compression: str = DEFAULT_COMPRESSION,
+                   chunk_rows: int = DEFAULT_CHUNK_ROWS) -> str:
+    """Write a course frame as a natively compressed columnar artifact.
+
+    `.feather`/`.arrow` produce Arrow IPC (compression: uncompressed, lz4, zstd);
+    `.parquet` produces Parquet (compression: none, snappy, lz4, zstd, gzip).
+    Small batches/row groups keep single-row detail reads cheap.
+    """
+    table = pa.Table.from_pandas(df.reset_index(drop=True), preserve_index=False)
+    lower = path.lower()
+    if lower.endswith('.parquet'):
+        pq.write_table(table, path, compression=compression, row_group_size=chunk_rows)
+    elif lower.endswith(('.feather', '.arrow')):
+        metadata = dict(table.schema.metadata or {})
+        metadata[BATCH_ROWS_KEY] = str(chunk_rows).encode()
+        metadata[ROW_COUNT_KEY] = str(table.num_rows).encode()
+        lazy = {c: table.column(c).nbytes for c in LAZY_TEXT_COLUMNS if c in table.column_names}
+        metadata[LAZY_BYTES_KEY] = json.dumps(lazy).encode()
+        table = table.replace_schema_metadata(metadata)
+        feather.write_feather(table, path, compression=compression, chunksize=chunk_rows)
+    else:
+        raise ValueError(f"Unsupported artifact extension for {path}. Expected .feather, .arrow or .parquet")
+    return path
+
+
+def read_artifact(path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Read a course artifact, projecting to `columns` when given"""
+    lower = path.lower()
+    if lower.endswith('.parquet'):
+        return pq.read_table(path, columns=columns).to_pandas()
+    if lower.endswith(('.feather', '.arrow')):
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+    if lower.endswith('.csv'):
+        return pd.read_csv(path, usecols=columns)
+    raise ValueError(f"Unsupported data file extension for {path}. Expected .feather, .arrow, .parquet or .csv")
+
+
+class CourseStore:
+    """Compact in-memory course table with lazily loaded heavy text"""
+
+    def __init__(self, frame: pd.DataFrame, source_path: Optional[str] = None,
+                 lazy_source: Optional[LazyTextSource] = None,
+                 raw_bytes: Optional[Dict[str, int]] = None,
+                 indexes: Optional[Dict[str, np.ndarray]] = None):
+        self.frame = frame.reset_index(drop=True)
+        self.source_path = source_path
+        self.lazy_source = lazy_source
+        self.raw_bytes = raw_bytes or {}
+        # Row of each frame position inside the on-disk artifact (-1: upserted, not on disk)
+        self.file_rows = np.arange(len(self.frame), dtype=np.int64)
+        self.indexes = indexes if indexes is not None else build_indexes(self.frame)
+        # Sidecars written before the sort indexes existed only carry the id lookup
+        missing = [key for key in SORT_KEYS if f'order_{key}' not in self.indexes]
+        if missing:
+            self.indexes.update(sort_indexes(self.frame, missing))
+        if 'category' in self.frame.columns and 'bayes_by_category' not in self.indexes:
+            self.indexes.update(category_indexes(self.frame, self.indexes['order_bayes']))
+        self._masks: Dict[tuple, np.ndarray] = {}
+        self._category_slots: Optional[Dict[str, int]] = None
+        self.build_id: Optional[str] = None
+        self.built_at: Optional[datetime] = None
+        # Bumped by every upsert so caches keyed on the snapshot can tell them apart
+        self.revision = 0
+        if source_path and os.path.exists(source_path):
+            self.built_at = datetime.fromtimestamp(os.path.getmtime(source_path), tz=timezone.utc)
+        # Names the loaded artifact: the pipeline build id, else the file's modification time
+        self.source_version = f"m{int(self.built_at.timestamp())}" if self.built_at else f"n{len(self.frame)}"
+        self._id_order = self.indexes['id_order']
+        self._sorted_ids = self.indexes['sorted_ids']
+
+    # ---------- loading ----------
+
+    @classmethod
+    def load(cls, path: str) -> "CourseStore":
+        """Load a course artifact (.feather, .arrow, .parquet or .csv) into a compact store"""
+        lower = path.lower()
+        if lower.endswith(('.feather', '.arrow')):
+            return cls._load_columnar(path, LazyTextSource(path, LAZY_TEXT_COLUMNS))
+        if lower.endswith('.parquet'):
+            return cls._load_columnar(path, ParquetTextSource(path, LAZY_TEXT_COLUMNS))
+        if lower.endswith('.csv'):
+            return cls.from_frame(pd.read_csv(path), source_path=path)
+        raise ValueError(f"Unsupported data file extension for {path}. Expected .feather, .arrow, .parquet or .csv")
+
+    @classmethod
+    def _load_columnar(cls, path: str, lazy_source) -> "CourseStore":
+        # Column projection: the lazy text columns are never decoded at startup
+        resident = [c for c in lazy_source.schema.names if c not in lazy_source.columns]
+        frame = read_artifact(path, columns=resident)
+        return cls.from_frame(frame, source_path=path, lazy_source=lazy_source,
+                              indexes=load_indexes(path, len(frame)))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, source_path: Optional[str] = None,
+                   lazy_source: Optional[LazyTextSource] = None,
+                   indexes: Optional[Dict[str, np.ndarray]] = None) -> "CourseStore":
+        """Compact an already materialised frame column by column"""
+        if 'title_clean' not in df.columns and 'title' in df.columns:
+            df['title_clean'] = df['title'].astype(str).str.lower().str.strip()
+        raw_bytes = {}
+        for name in list(df.columns):
+            raw_bytes[name] = _column_bytes(df[name])
+            df[name] = compact_column(name, df[name])
+        return cls(df, source_path=source_path, lazy_source=lazy_source, raw_bytes=raw_bytes,
+                   indexes=indexes)
+
+    def set_build(self, build_id: Optional[str], built_at: Optional[str]):
+        """Attach the pipeline build this snapshot was loaded from"""
+        self.build_id = build_id
+        if built_at:
+            self.built_at = datetime.fromisoformat(built_at)
+        if build_id:
+            self.source_version = build_id
+
+    @property
+    def version(self) -> str:
+        """Identifies this snapshot's content (stable across restarts until the data or a sync changes it)"""
+        if self.revision == 0:
+            return self.source_version
+        # Upserted snapshots also carry their build time: revision numbers restart with the process
+        return f"{self.source_version}.r{self.revision}.{int(self.built_at.timestamp() * 1000)}"
+
+    # ---------- lookups ----------
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def position(self, course_id: int) -> Optional[int]:
+        """Frame position of a course id, or None when it is not in the store"""
+        i = int(np.searchsorted(self._sorted_ids, course_id))
+        if i < len(self._sorted_ids) and self._sorted_ids[i] == course_id:
+            return int(self._id_order[i])
+        return None
+
+    def positions(self, course_ids) -> np.ndarray:
+        """Frame positions of many course ids at once (-1 where an id is not in the store)"""
+        ids = np.asarray(course_ids, dtype=np.int64)
+        if not len(self._sorted_ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        slots = np.searchsorted(self._sorted_ids, ids).clip(max=len(self._sorted_ids) - 1)
+        found = self._sorted_ids[slots] == ids
+        return np.where(found, self._id_order[slots], -1).astype(np.int64)
+
+    def heavy_text(self, position: int, columns: Optional[Sequence[str]] = None) -> Dict[str, Optional[str]]:
+        """Heavy text columns for one course, read from disk when not resident"""
+        wanted = list(columns or LAZY_TEXT_COLUMNS)
+        resident = {c: self.frame.at[position, c] for c in wanted if c in self.frame.columns}
+        missing = [c for c in wanted if c not in resident]
+        if missing and self.lazy_source is not None and self.file_rows[position] >= 0:
+            resident.update(self.lazy_source.fetch(int(self.file_rows[position]), missing))
+        return {k: (None if pd.isna(v) else v) for k, v in resident.items()}
+
+    def category_ranking(self, category: str) -> np.ndarray:
+        """Positions of one category's courses by Bayesian rating, best first (empty for an unknown category)"""
+        if self._category_slots is None:
+            names = self.indexes.get('bayes_categories', ())
+            self._category_slots = {str(name).lower(): slot for slot, name in enumerate(names)}
+        slot = self._category_slots.get(str(category).lower())
+        if slot is None:
+            return self.indexes['order_bayes'][:0]
+        offsets = self.indexes['bayes_category_offsets']
+        return self.indexes['bayes_by_category'][offsets[slot]:offsets[slot + 1]]
+
+    def ordered(self, key: str, mask: Optional[np.ndarray] = None, count: Optional[int] = None,
+                category: Optional[str] = None) -> np.ndarray:
+        """Frame positions in descending `key` order, limited to rows set in `mask`, the first `count` of them.
+
+        Walks the presorted permutation block by block, so a short page stops
+        as soon as enough rows pass the filter. `category` selects a
+        precomputed per-category ranking (bayes only).
+        """
+        if category is not None:
+            if key != 'bayes':
+                raise ValueError(f"No per-category ranking for {key}")
+            order = self.category_ranking(category)
+        else:
+            order = self.indexes[f'order_{key}']
+        if mask is None:
+            return order if count is None else order[:count]
+        if count is None:
+            return order[mask[order]]
+        parts = []
+        found = 0
+        for start in range(0, len(order), ORDER_WALK_ROWS):
+            block = order[start:start + ORDER_WALK_ROWS]
+            hits = block[mask[block]]
+            parts.append(hits)
+            found += len(hits)
+            if found >= count:
+                break
+        return np.concatenate(parts)[:count] if parts else order[:0]
+
+    def key_values(self, key: str) -> np.ndarray:
+        """Per-row values of a sort key (the bayes ones come precomputed with the indexes)"""
+        if key == 'bayes':
+            return self.indexes['bayes_rating']
+        return sort_key_values(self.frame, key)
+
+    def _cached_mask(self, key: tuple, build) -> np.ndarray:
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = build()
+            if len(self._masks) >= MASK_CACHE_SIZE:
+                self._masks.pop(next(iter(self._masks)))
+            self._masks[key] = mask
+        return mask
+
+    def mask(self, column: str, value) -> np.ndarray:
+        """Bitmap of rows whose `column` equals `value` (case-insensitive for categorical text)"""
+        def build():
+            series = self.frame[column]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                wanted = [code for code, category in enumerate(series.cat.categories)
+                          if str(category).lower() == str(value).lower()]
+                return np.isin(series.cat.codes.to_numpy(), wanted)
+            return (series == value).to_numpy(dtype=bool, na_value=False)
+        return self._cached_mask(('eq', column, value), build)
+
+    def at_least(self, column: str, minimum: float) -> np.ndarray:
+        """Bitmap of rows whose `column` is at least `minimum`"""
+        return self._cached_mask(('ge', column, minimum),
+                                 lambda: (self.frame[column] >= minimum).to_numpy(dtype=bool, na_value=False))
+
+    # ---------- updates ----------
+
+    def upsert(self, records: pd.DataFrame) -> "CourseStore":
+        """New store with `records` merged in by id: known ids updated in place, new ids appended.
+
+        Existing rows keep their positions, so position-aligned embeddings stay
+        valid for them; appended rows have no embedding and no lazy text on disk.
+        """
+        records = records.drop_duplicates('id', keep='last').reset_index(drop=True)
+        if 'title' in records.columns and 'title_clean' in self.frame.columns:
+            records['title_clean'] = records['title'].astype(str).str.lower().str.strip()
+        columns = [c for c in records.columns if c in self.frame.columns]
+        ids = records['id'].to_numpy(dtype=np.int64)
+        if len(self._sorted_ids):
+            slots = np.searchsorted(self._sorted_ids, ids).clip(max=len(self._sorted_ids) - 1)
+            found = self._sorted_ids[slots] == ids
+        else:
+            slots = np.zeros(len(ids), dtype=np.int64)
+            found = np.zeros(len(ids), dtype=bool)
+
+        frame = self.frame.copy()
+        if found.any():
+            rows = self._id_order[slots[found]]
+            updates = records.loc[found]
+            for name in columns:
+                if name in ('id', 'canonical_id'):
+                    continue
+                values = compact_column(name, updates[name])
+                widen_integer_column(frame, name, values)
+                if isinstance(frame[name].dtype, pd.CategoricalDtype):
+                    extra = pd.Index(values.dropna().unique()).difference(frame[name].cat.categories)
+                    if len(extra):
+                        frame[name] = frame[name].cat.add_categories(extra)
+                frame.iloc[rows, frame.columns.get_loc(name)] = values.to_numpy()
+
+        added = records.loc[~found, columns].copy()
+        if len(added):
+            if 'canonical_id' in frame.columns:
+                added['canonical_id'] = added['id']
+            added = added.reindex(columns=frame.columns)
+            for name in added.columns:
+                if isinstance(frame[name].dtype, pd.CategoricalDtype):
+                    # Same categories on both sides, or the concatenation falls back to object
+                    categories = frame[name].cat.categories.union(pd.Index(added[name].dropna().unique()))
+                    frame[name] = frame[name].cat.set_categories(categories)
+                    added[name] = pd.Categorical(added[name], categories=categories)
+                else:
+                    values = compact_column(name, added[name])
+                    widen_integer_column(frame, name, values)
+                    added[name] = values.astype(frame[name].dtype)
+            frame = pd.concat([frame, added], ignore_index=True)
+
+        store = CourseStore(frame, source_path=self.source_path, lazy_source=self.lazy_source,
+                            raw_bytes=self.raw_bytes)
+        store.file_rows = np.concatenate([self.file_rows, np.full(len(added), -1, dtype=np.int64)])
+        store.build_id = self.build_id
+        store.source_version = self.source_version
+        store.built_at = datetime.now(timezone.utc)
+        store.revision = self.revision + 1
+        return store
+
+    # ---------- reporting ----------
+
+    def memory_report(self, scan_lazy: bool = True) -> Dict:
+        """Per-column memory usage before and after compaction.
+
+        Without `scan_lazy`, lazy columns are listed only when their sizes are
+        known without decompressing the artifact.
+        """
+        lazy_disk = self.lazy_source.column_bytes(scan=scan_lazy) if self.lazy_source else {}
+        columns: List[Dict] = []
+        for name in self.frame.columns:
+            compact = _column_bytes(self.frame[name])
+            raw = self.raw_bytes.get(name, compact)
+            columns.append({
+                "column": name,
+                "dtype": str(self.frame[name].dtype),
+                "raw_bytes": raw,
+                "resident_bytes": compact,
+                "saved_pct": round(100.0 * (raw - compact) / raw, 1) if raw else 0.0,
+            })
+        for name, disk in lazy_disk.items():
+            columns.append({
+                "column": name,
+                "dtype": "lazy",
+                "raw_bytes": disk,
+                "resident_bytes": 0,
+                "saved_pct": 100.0 if disk else 0.0,
+            })
+        total_raw = sum(c["raw_bytes"] for c in columns)
+        total_resident = sum(c["resident_bytes"] for c in columns)
+        return {
+            "rows": len(self.frame),
+            "source": self.source_path,
+            "total_raw_bytes": total_raw,
+            "total_resident_bytes": total_resident,
+            "columns": columns,
+        }
@@ -62,6 +62,17 @@ let CACHE_TTL_MS = 30000; // 30 seconds for faster suggestions (reduced from 60s
 let searchResultCache = new Map();
 let suggestionCache = new Map();
 let tmdbPosterCache = new Map(); // id -> poster_path/backdrop/absolute
+// /courses/{id} fields the detail modal renders: the detail profile plus language, never the lazy curriculum text
+const COURSE_MODAL_FIELDS = 'id,title,url,price,is_paid,visible_instructors,image_480x270,avg_rating,rating,' +
+    'num_subscribers,num_reviews,instructional_level,headline,description,primary_category,language';
+// What a watchlist entry keeps (the card profile): it is inlined into onclick handlers and saved to localStorage
+const WATCHLIST_FIELDS = ['id', 'title', 'url', 'price', 'is_paid', 'visible_instructors', 'image_480x270',
+    'avg_rating', 'rating', 'num_subscribers', 'num_reviews', 'instructional_level', 'primary_category'];
+// Interaction events for /trending, sent in batches
+const EVENT_FLUSH_MS = 2000;
+const EVENT_BATCH_SIZE = 200;
+let pendingEvents = [];
+let eventFlushTimer = null;
 
 
 // ===========================================
@@ -105,7 +116,14 @@ function loadUserProfile() {
     if (saved) {
         userProfile = { ...userProfile, ...JSON.parse(saved) };
     }
-    watchlist = userProfile.watchlist || [];
+    // Entries saved by older versions may carry the whole course record
+    watchlist = (userProfile.watchlist || []).map(watchlistEntry);
+    userProfile.watchlist = [...watchlist];
+}
+
+function watchlistEntry(course) {
+    if (!course || typeof course !== 'object') return course;
+    return Object.fromEntries(WATCHLIST_FIELDS.filter(name => name in course).map(name => [name, course[name]]));
 }
 
 function saveUserProfile() {
@@ -297,6 +315,7 @@ function buildApiUrl(endpoint, page = 1, additionalParams = {}) {
     }
     
     params.set('limit', '10');
+    params.set('fields', 'card');
     
     // Add any additional parameters
     Object.entries(additionalParams).forEach(([key, value]) => {
@@ -477,6 +496,7 @@ async function getRecommendations(movieId) {
         }
         
         params.set('limit', '10');
+        params.set('fields', 'card');
         
         const response = await fetch(`${config.BACKEND_BASE_URL}/recommendations?${params.toString()}`);
         const data = await response.json();
@@ -517,6 +537,35 @@ async function fetchJSONWithRetry(url, options = {}, retries = 2, backoffMs = 50
     throw lastErr;
 }
 
+// Queue an impression, click or watchlist add; the queue is posted every EVENT_FLUSH_MS
+function trackEvent(courseId, type) {
+    const id = Number(courseId);
+    if (!Number.isInteger(id)) return;
+    pendingEvents.push({ course_id: id, type });
+    if (pendingEvents.length >= EVENT_BATCH_SIZE) {
+        flushEvents();
+    } else if (!eventFlushTimer) {
+        eventFlushTimer = setTimeout(flushEvents, EVENT_FLUSH_MS);
+    }
+}
+
+function flushEvents() {
+    clearTimeout(eventFlushTimer);
+    eventFlushTimer = null;
+    while (pendingEvents.length > 0) {
+        const events = pendingEvents.splice(0, EVENT_BATCH_SIZE);
+        // keepalive lets the last batch outlive the page
+        fetch(`${config.BACKEND_BASE_URL}/events`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ events }),
+            keepalive: true
+        }).catch(() => { /* trending is best effort */ });
+    }
+}
+
+window.addEventListener('pagehide', flushEvents);
+
 function getCourseImageUrl(course) {
     if (!course || typeof course !== 'object') return FALLBACK_POSTER_URL;
     
@@ -540,12 +589,13 @@ function getCourseImageUrl(course) {
 return FALLBACK_POSTER_URL;
 }
 
-function getSafeImageSrc(course) {
+function getSafeImageSrc(course, size) {
     try {
         const url = getCourseImageUrl(course);
         if (!url) return FALLBACK_POSTER_URL;
-        // Always proxy through backend to avoid hotlink/cold-start issues
-        return `${config.BACKEND_BASE_URL}/image-proxy?url=${encodeURIComponent(url)}`;
+        // Always proxy through backend to avoid hotlink/cold-start issues; size asks for a server-side thumbnail
+        const sizeParam = size ? `&size=${size}` : '';
+        return `${config.BACKEND_BASE_URL}/image-proxy?url=${encodeURIComponent(url)}${sizeParam}`;
     } catch (e) {
         return FALLBACK_POSTER_URL;
     }
@@ -624,7 +674,7 @@ function createCourseCard(course, showTrendingNumber = false, trendingIndex = 0)
             ${showTrendingNumber ? `<div class=\"trending-number\">${trendingIndex + 1}</div>` : ''}
             <div class="poster-container aspect-[16/9] w-full rounded-xl overflow-hidden mb-4 relative">
                 ${course.is_paid === false ? `<div class=\"free-badge\">FREE</div>` : ''}
-                <img src="${getSafeImageSrc(course)}" alt="${course.title}" ${shouldEagerLoad ? 'loading="eager"' : 'loading="lazy"'} 
+                <img src="${getSafeImageSrc(course, '480x270')}" alt="${course.title}" ${shouldEagerLoad ? 'loading="eager"' : 'loading="lazy"'} 
                      onerror="this.onerror=null;this.src='https://source.unsplash.com/480x270/?${fallbackQuery}';" 
                      data-course-id="${course.id}"
                      class="w-full h-full object-cover rounded-xl transition-transform group-hover:scale-110" />
@@ -656,7 +706,7 @@ function createCourseCard(course, showTrendingNumber = false, trendingIndex = 0)
                         ${course.instructional_level || course.level || 'All levels'}
                     </span>
                 </div>
-                <button data-course-id="${course.id}" onclick="toggleWatchlist(${JSON.stringify(course).replace(/\"/g, '&quot;')})" 
+                <button data-course-id="${course.id}" onclick="toggleWatchlist(${JSON.stringify(watchlistEntry(course)).replace(/\"/g, '&quot;')})" 
                         class="watchlist-btn w-full py-2 rounded-lg text-sm font-medium transition-colors flex items-center justify-center ${
                             isInWatchlist 
                                 ? 'bg-green-600 hover:bg-green-700 text-white' 
@@ -679,19 +729,13 @@ async function showCourseDetail(courseId) {
 
     try {
         addToHistory(courseId);
+        trackEvent(courseId, 'click');
 
-        // First try to find the course in our local data or cache
+        // Load the fields the modal shows (curriculum and objectives stay on the server)
         let course = null;
-        const searchParams = new URLSearchParams();
-        searchParams.set('course_id', courseId);
-        
-        // Search for the course by ID (backend may not expose /course/{id})
-        const searchResponse = await fetch(`${config.BACKEND_BASE_URL}/search?query=id:${courseId}&limit=1`);
-        if (searchResponse.ok) {
-            const searchResults = await searchResponse.json();
-            if (searchResults.length > 0) {
-                course = searchResults[0];
-            }
+        const detailResponse = await fetch(`${config.BACKEND_BASE_URL}/courses/${encodeURIComponent(courseId)}?fields=${COURSE_MODAL_FIELDS}`);
+        if (detailResponse.ok) {
+            course = await detailResponse.json();
         }
 
         if (!course) {
@@ -742,7 +786,7 @@ async function showCourseDetail(courseId) {
                     </div>` : ''}
                     <p class="text-gray-300 mb-6">${course.description || course.headline || 'No description available.'}</p>
                     <div class="flex flex-wrap gap-3 mb-6">
-                        <button data-course-id="${course.id}" onclick="toggleWatchlist(${JSON.stringify(course).replace(/"/g, '&quot;')})" 
+                        <button data-course-id="${course.id}" onclick="toggleWatchlist(${JSON.stringify(watchlistEntry(course)).replace(/"/g, '&quot;')})" 
                                 class="bg-orange-600 hover:bg-orange-700 px-4 py-2 rounded-lg text-white flex items-center transition-colors">
                             <i data-lucide="bookmark" class="w-4 h-4 mr-2"></i>
                             ${isInWatchlist ? 'Remove from Watchlist' : 'Add to Watchlist'}
@@ -784,7 +828,7 @@ async function showCourseDetail(courseId) {
         
         // Load course recommendations
         try {
-            const recResponse = await fetch(`${config.BACKEND_BASE_URL}/recommendations?course_id=${course.id}&limit=8`);
+            const recResponse = await fetch(`${config.BACKEND_BASE_URL}/recommendations?course_id=${course.id}&limit=8&fields=card`);
             if (recResponse.ok) {
                 const recommendations = await recResponse.json();
                 if (recommendations.length > 0) {
@@ -969,7 +1013,8 @@ function toggleWatchlist(course) {
     const index = watchlist.findIndex(item => item.id === course.id);
     let message = '';
     if (index === -1) {
-        watchlist.push(course);
+        watchlist.push(watchlistEntry(course));
+        trackEvent(course.id, 'watchlist');
         message = 'Added to Watchlist!';
     } else {
         watchlist.splice(index, 1);
@@ -1069,10 +1114,10 @@ function updateWatchlistModal() {
     } else {
         content.innerHTML = watchlist.map(course => `
             <div class="bg-gray-800/30 rounded-2xl p-4">
-                <img src="${getSafeImageSrc(course)}" alt="${course.title}" 
+                <img src="${getSafeImageSrc(course, '240x135')}" alt="${course.title}" 
                         class="w-full object-cover rounded-xl mb-3 cursor-pointer" onclick="showCourseDetail(${course.id})" onerror="this.onerror=null;this.src='https://source.unsplash.com/480x270/?${encodeURIComponent((course.primary_category?.name || course.title || 'education course'))}'">
                 <h3 class="font-semibold text-sm mb-2 line-clamp-1">${course.title}</h3>
-                <button onclick="toggleWatchlist(${JSON.stringify(course).replace(/\"/g, '&quot;')})" 
+                <button onclick="toggleWatchlist(${JSON.stringify(watchlistEntry(course)).replace(/\"/g, '&quot;')})" 
                         class="w-full bg-red-600 hover:bg-red-700 py-2 rounded-lg text-sm flex items-center justify-center transition-colors">
                     <i data-lucide="trash-2" class="w-4 h-4 mr-2"></i>
                     Remove
@@ -1114,6 +1159,7 @@ async function displayCourses(courses, containerId, showTrendingNumbers = false)
 
     // Defer DOM replacement to next frame to reduce layout thrash
     const visibleCourses = filtered.slice(0, 10);
+    visibleCourses.forEach(course => trackEvent(course.id, 'impression'));
     const courseCards = visibleCourses.map((course, index) => createCourseCard(course, showTrendingNumbers, index)).join('');
 
     requestAnimationFrame(() => {
@@ -1194,6 +1240,7 @@ async function getSearchSuggestions(query) {
         const params = new URLSearchParams();
         params.set('query', query);
         params.set('limit', '6'); // Limit suggestions to 6 for faster response
+        params.set('fields', 'card');
         
         if (userProfile.safe_mode) {
             params.set('safe_mode', 'true');
@@ -1238,7 +1285,7 @@ function displaySuggestions(suggestions) {
 
     content.innerHTML = suggestions.map((course, index) => `
         <div class="search-suggestion-item" data-index="${index}" onclick="selectSuggestion(${index})">
-            <img src="${getSafeImageSrc(course)}" alt="${course.title}" class="suggestion-poster" loading="lazy" onerror="this.onerror=null;this.src='https://source.unsplash.com/480x270/?${encodeURIComponent((course.primary_category?.name || course.title || 'education course'))}'">
+            <img src="${getSafeImageSrc(course, '240x135')}" alt="${course.title}" class="suggestion-poster" loading="lazy" onerror="this.onerror=null;this.src='https://source.unsplash.com/480x270/?${encodeURIComponent((course.primary_category?.name || course.title || 'education course'))}'">
             <div class="suggestion-info">
                 <div class="suggestion-title">${course.title}</div>
                 <div class="suggestion-meta">
@@ -1332,6 +1379,7 @@ async function searchCourses(query) {
         const params = new URLSearchParams();
         params.set('query', query);
         params.set('limit', '12');
+        params.set('fields', 'card');
         
         // Cache lookup
         const cacheKey = `search-${query}`;
@@ -1365,6 +1413,7 @@ async function searchCourses(query) {
                 const recParams = new URLSearchParams();
                 recParams.set('course_id', results[0].id);
                 recParams.set('limit', '10');
+                recParams.set('fields', 'card');
                 
                 const recs = await fetchJSONWithRetry(`${config.BACKEND_BASE_URL}/recommendations?${recParams.toString()}`, { signal: recsController.signal }, 1, 800);
                 if (Array.isArray(recs) && recs.length > 0) {
@@ -1422,8 +1471,8 @@ async function loadInitialData() {
         await Promise.race([warmup, new Promise(r => setTimeout(r, 500))]);
 
         const [trending, topRated] = await Promise.all([
-            fetchJSONWithRetry(`${config.BACKEND_BASE_URL}/trending?limit=12`, {}, 2, 600),
-            fetchJSONWithRetry(`${config.BACKEND_BASE_URL}/top-rated?limit=12`, {}, 2, 600),
+            fetchJSONWithRetry(`${config.BACKEND_BASE_URL}/trending?limit=12&fields=card`, {}, 2, 600),
+            fetchJSONWithRetry(`${config.BACKEND_BASE_URL}/top-rated?limit=12&fields=card`, {}, 2, 600),
         ]);
 
         clearTimeout(loadingToastTimer);
@@ -13,16 +13,15 @@ This backend server provides AI-powered course recommendations using:
 """
 
 from fastapi import FastAPI, HTTPException, Query, Request, Form, Body
-from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse, Response
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
 import pandas as pd
 import numpy as np
 import asyncio
 import aiohttp
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Literal, Optional, Sequence, Tuple
 import os
 import ftfy
 from sklearn.feature_extraction.text import TfidfVectorizer
@@ -31,10 +30,30 @@ from pydantic import BaseModel
 from datetime import datetime
 import json
 import time
+import base64
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from config import config
+from course_store import LAZY_TEXT_COLUMNS, SORT_KEYS, CourseStore
+from build_manifest import verify_artifacts
+from scoring import Deadline, ScoringExecutor, ScoringOverloaded, embedding_norms, parse_route_limits, top_k_similar
+from sharding import ShardCoordinator, parse_shard_urls, shard_of
+from rate_limit import RateLimitMiddleware, create_backend, parse_rate_limits
+from upstream import UpstreamClient, UpstreamError
+from catalogue_sync import CatalogueSync
+from trending import TrendingTracker
+from static_assets import StaticAssets, StaticAssetsMiddleware
+from response_cache import ResponseCache
+from image_cache import (FORMAT_MIME, CachedImage, ImageCache, ImagePrefetcher, etag_matches, make_etag,
+                         negotiate_format, parse_variants, supported_formats, transcode)
+from providers import (UDEMY_COURSE_FIELDS, CourseraProvider, EdxProvider, FederatedSearch, LocalProvider,
+                       RapidAPIProvider, UdemyProvider)
 from functools import lru_cache
 import os
 from contextlib import asynccontextmanager
+from collections import OrderedDict
+from urllib.parse import urlparse
+import threading
 import json
 import re
 
@@ -49,6 +68,13 @@ logger = logging.getLogger(__name__)
 # DATA MODELS
 # ===========================================
 
+class InteractionEvent(BaseModel):
+    course_id: int
+    type: Literal["impression", "click", "watchlist"]
+
+class EventBatch(BaseModel):
+    events: List[InteractionEvent]
+
 class Category(BaseModel):
     name: str
 
@@ -111,47 +137,23 @@ class CourseOut(BaseModel):
 # ===========================================
 app = FastAPI(title="CourseScout API", description="AI-Powered Course Recommendation System")
 
-# Mount static files
-app.mount("/static", StaticFiles(directory="."), name="static")
-app.mount("/dist", StaticFiles(directory="dist"), name="dist")
-
-# Serve individual static files
-from fastapi.responses import FileResponse
-
-@app.get("/style.css")
-async def get_style_css():
-    return FileResponse("style.css")
-
-@app.get("/main.js")
-async def get_main_js():
-    return FileResponse("main.js")
-
-@app.get("/config.js")
-async def get_config_js():
-    return FileResponse("config.js")
-
-@app.get("/tailwind-config.js")
-async def get_tailwind_config():
-    return FileResponse("tailwind-config.js")
-
-@app.get("/favicon.png")
-async def get_favicon():
-    return FileResponse("favicon.png")
-
-@app.get("/assets/coursemate-icon.png")
-async def get_coursemate_icon():
-    return FileResponse("assets/coursemate-icon.png")
-
-@app.get("/assets/{filename}")
-async def get_asset(filename: str):
-    file_path = f"assets/{filename}"
-    if not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail=f"Asset {filename} not found")
-    return FileResponse(file_path)
+# Frontend files, served from memory precompressed and fingerprinted (nothing outside this list is exposed)
+STATIC_FILES = ["index.html", "style.css", "main.js", "config.js", "tailwind-config.js", "favicon.png"]
+STATIC_DIRECTORIES = ["assets", "dist"]
+static_assets = StaticAssets(os.path.dirname(os.path.abspath(__file__)), STATIC_FILES, STATIC_DIRECTORIES)
 
 # Add GZip compression for better performance
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
+# Per-client token buckets on scrape-prone routes (added before CORS so 429s still carry CORS headers)
+app.add_middleware(
+    RateLimitMiddleware,
+    rules=parse_rate_limits(config.RATE_LIMITS) if config.RATE_LIMIT_ENABLED else [],
+    backend=create_backend(config.RATE_LIMIT_BACKEND),
+    trust_forwarded=config.RATE_LIMIT_TRUST_PROXY,
+    api_keys=[key.strip() for key in config.RATE_LIMIT_API_KEYS.split(",")],
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -159,17 +161,65 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Results", "X-Partial-Results"],
 )
 
+# Outermost, so asset responses skip the other middleware and are never re-gzipped
+app.add_middleware(StaticAssetsMiddleware, assets=static_assets)
+
 # Course data storage
+course_store = None
 courses_df = None
 course_embeddings = None
+embedding_row_norms = None
 tfidf_vectorizer = None
 session_pool = None
+scoring_executor = None
+shard_coordinator = None
+upstream_client = None
+federated_search = None
+catalogue_sync = None
+image_cache = None
+image_executor = None
+image_prefetcher = None
+image_formats: List[str] = []
+image_variants = parse_variants(config.IMAGE_VARIANTS)
+catalogue_sync_task = None
+trending_tracker = None
+trending_snapshot_task = None
 
-# In-memory cache for frequently accessed endpoints
-api_cache = {}
+# In-memory cache for frequently accessed endpoints, holding pre-serialised, pre-compressed bodies
 CACHE_TTL = 60  # 60 seconds cache TTL
+response_cache = ResponseCache(ttl=CACHE_TTL)
+LISTING_HEADERS = {"Cache-Control": "public, max-age=60"}
+
+# Ranked candidates fetched per requested result so near-duplicate collapsing can still fill the page
+DUPLICATE_OVERSAMPLE = 3
+
+# Results per /search page (default and maximum)
+SEARCH_LIMIT = 12
+# /search orders: the relevance score, or any presorted index key
+SEARCH_SORTS = ("relevance",) + SORT_KEYS
+SEARCH_MAX_LIMIT = 50
+# Deepest result a shard ranks for a coordinator (the /shard/search limit bound)
+SHARD_SEARCH_DEPTH = 1000
+
+# Cards the frontend's first paint requests from /trending and /top-rated (limit=12 in main.js);
+# the startup thumbnail warm-up covers exactly these
+DEFAULT_LIST_LIMIT = 12
+
+# Reviews a course needs to appear on /top-rated unless min_reviews= says otherwise
+TOP_RATED_MIN_REVIEWS = 10
+
+# Rows per search scan block; the request deadline is checked between blocks
+SEARCH_SCAN_ROWS = 16384
+
+# Completed match sets of recent queries (partial scans are never cached)
+MATCH_CACHE_SIZE = 256
+match_cache = OrderedDict()
+match_cache_lock = threading.Lock()
+# Full ranked result lists (int32 frame positions) of recent queries; /search pages slice them
+ranked_cache = OrderedDict()
 
 # API Configuration
 UDEMY_API_KEY = config.UDEMY_API_KEY
@@ -190,14 +240,59 @@ ALLOWED_IMAGE_HOSTS = {
 @app.on_event("startup")
 async def startup_event():
     """Initialize the application"""
-    global session_pool
+    global session_pool, scoring_executor, shard_coordinator, upstream_client, federated_search, image_cache
+    global image_executor, image_formats, image_prefetcher
     try:
         connector = aiohttp.TCPConnector(limit=100)
         timeout = aiohttp.ClientTimeout(total=API_TIMEOUT)
         session_pool = aiohttp.ClientSession(connector=connector, timeout=timeout)
         
-        # Initialize course data
-        await initialize_course_data()
+        # Retries, circuit breaking, coalescing and caching for outbound catalogue APIs
+        upstream_client = UpstreamClient(
+            session_pool,
+            max_retries=config.API_MAX_RETRIES,
+            attempt_timeout=config.UPSTREAM_ATTEMPT_TIMEOUT_SEC,
+            cache_ttl=config.CACHE_TTL_MS / 1000,
+            stale_ttl=config.UPSTREAM_STALE_TTL_SEC,
+            failure_threshold=config.UPSTREAM_BREAKER_FAILURES,
+            reset_timeout=config.UPSTREAM_BREAKER_RESET_SEC,
+        )
+        federated_search = build_federated_search()
+        if config.IMAGE_CACHE_MAX_MB > 0:
+            image_cache = ImageCache(config.IMAGE_CACHE_DIR, max_bytes=config.IMAGE_CACHE_MAX_MB * 1024 * 1024,
+                                     memory_bytes=config.IMAGE_CACHE_MEMORY_MB * 1024 * 1024)
+        # Thumbnail resizing/transcoding needs Pillow; without it ?size= serves the original
+        image_formats = supported_formats(config.IMAGE_TRANSCODE_FORMATS.split(","))
+        if image_formats:
+            image_executor = ThreadPoolExecutor(max_workers=config.IMAGE_TRANSCODE_THREADS,
+                                                thread_name_prefix="image")
+        if image_cache is not None and config.IMAGE_PREFETCH_CONCURRENCY > 0:
+            image_prefetcher = ImagePrefetcher(warm_card_image, concurrency=config.IMAGE_PREFETCH_CONCURRENCY)
+        
+        # Pandas scans and similarity scoring run here instead of on the event loop
+        scoring_executor = ScoringExecutor(
+            max_workers=config.SCORING_THREADS or None,
+            route_limits=parse_route_limits(config.SCORING_ROUTE_LIMITS),
+            processes=config.SCORING_PROCESSES,
+            max_queue=config.SCORING_MAX_QUEUE,
+            max_wait=config.SCORING_MAX_WAIT_MS / 1000,
+            priority_routes=[r.strip() for r in config.SCORING_PRIORITY_ROUTES.split(",") if r.strip()],
+        )
+        
+        shard_urls = parse_shard_urls(config.SHARD_URLS)
+        if shard_urls:
+            # Coordinator: the catalogue lives on the shard servers, nothing is loaded here
+            shard_coordinator = ShardCoordinator(shard_urls, session_pool, timeout=config.SHARD_TIMEOUT_SEC)
+            logger.info(f"Coordinating {len(shard_urls)} shards: {', '.join(shard_urls)}")
+        else:
+            # Initialize course data
+            await initialize_course_data()
+            if config.CATALOGUE_SYNC_INTERVAL_SEC > 0:
+                await start_catalogue_sync()
+            if config.TRENDING_HALF_LIFE_HOURS > 0:
+                await start_trending()
+        if image_prefetcher is not None:
+            asyncio.create_task(warm_listing_images())
         
         logger.info("CourseScout API started successfully")
     except Exception as e:
@@ -206,18 +301,96 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup resources"""
-    global session_pool
+    global session_pool, scoring_executor
+    if catalogue_sync_task:
+        catalogue_sync_task.cancel()
+    if trending_snapshot_task:
+        trending_snapshot_task.cancel()
+        await asyncio.to_thread(trending_tracker.save, config.TRENDING_SNAPSHOT_FILE)
+    if image_prefetcher:
+        image_prefetcher.close()
     if session_pool:
         await session_pool.close()
+    if scoring_executor:
+        scoring_executor.shutdown()
+    if image_executor:
+        image_executor.shutdown(wait=False)
     logger.info("CourseScout API shutdown completed")
 
 # ===========================================
 # CORE FUNCTIONS
 # ===========================================
 
+def has_embedding(position: Optional[int]) -> bool:
+    """Whether a frame position has an embedding row (courses added by catalogue sync do not)"""
+    return course_embeddings is not None and position is not None and position < course_embeddings.shape[0]
+
+async def apply_synced_courses(rows: List[dict]):
+    """Upsert provider rows into a new store snapshot and swap it in"""
+    global course_store, courses_df
+    if course_store is None:
+        return
+    if config.SHARD_COUNT > 1:
+        rows = [row for row in rows if shard_of(row["id"], config.SHARD_COUNT) == config.SHARD_INDEX]
+    if not rows:
+        return
+    store = await asyncio.to_thread(course_store.upsert, pd.DataFrame(rows))
+    course_store, courses_df = store, store.frame
+    with match_cache_lock:
+        match_cache.clear()
+        ranked_cache.clear()
+    response_cache.clear()
+
+async def start_catalogue_sync():
+    """Replay synced courses into the store, then keep syncing in the background"""
+    global catalogue_sync, catalogue_sync_task
+    providers = build_providers(config.CATALOGUE_SYNC_PROVIDERS, config.UPSTREAM_ATTEMPT_TIMEOUT_SEC)
+    providers = [p for p in providers if p.name != "local"]
+    if not providers:
+        logger.info("Catalogue sync enabled but no provider is configured")
+        return
+    for provider in providers:
+        provider.use_cache = False
+    catalogue_sync = CatalogueSync(
+        providers,
+        queries=[q.strip() for q in config.CATALOGUE_SYNC_QUERIES.split(",") if q.strip()],
+        apply=apply_synced_courses,
+        state_dir=config.CATALOGUE_SYNC_DIR,
+        pages=config.CATALOGUE_SYNC_PAGES,
+        page_size=config.CATALOGUE_SYNC_PAGE_SIZE,
+        batch_size=config.API_BATCH_SIZE,
+        max_per_host=config.API_MAX_PER_HOST,
+    )
+    await catalogue_sync.restore()
+    catalogue_sync_task = asyncio.create_task(catalogue_sync.run_forever(config.CATALOGUE_SYNC_INTERVAL_SEC))
+    logger.info(f"Catalogue sync every {config.CATALOGUE_SYNC_INTERVAL_SEC}s from {', '.join(p.name for p in providers)}")
+
+async def start_trending():
+    """Restore the interaction counters behind /trending and snapshot them periodically"""
+    global trending_tracker, trending_snapshot_task
+    trending_tracker = TrendingTracker(
+        half_life=config.TRENDING_HALF_LIFE_HOURS * 3600,
+        capacity=config.TRENDING_TRACKED,
+        top_k=config.TRENDING_TOP_K,
+        sketch_width=config.TRENDING_SKETCH_WIDTH,
+        sketch_depth=config.TRENDING_SKETCH_DEPTH,
+    )
+    if await asyncio.to_thread(trending_tracker.load, config.TRENDING_SNAPSHOT_FILE):
+        logger.info(f"Restored trending counters: {trending_tracker.metrics()}")
+    if config.TRENDING_SNAPSHOT_SEC > 0:
+        trending_snapshot_task = asyncio.create_task(snapshot_trending(config.TRENDING_SNAPSHOT_SEC))
+
+async def snapshot_trending(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(trending_tracker.save, config.TRENDING_SNAPSHOT_FILE)
+        except Exception as e:
+            logger.warning(f"Trending snapshot failed: {e}")
+
 async def initialize_course_data():
     """Initialize course data and embeddings"""
-    global courses_df, course_embeddings, tfidf_vectorizer
+    global course_store, courses_df, course_embeddings, embedding_row_norms, tfidf_vectorizer
 
     try:
         # Determine dataset file from config or fallbacks
@@ -228,44 +401,52 @@ async def initialize_course_data():
             try:
                 # Try configured file (both absolute and relative paths)
                 if os.path.exists(data_file):
-                    if data_file.lower().endswith('.feather'):
-                        courses_df = pd.read_feather(data_file)
-                    elif data_file.lower().endswith('.csv'):
-                        courses_df = pd.read_csv(data_file)
-                    else:
-                        logger.warning(f"Unsupported data file extension for {data_file}. Expected .feather or .csv")
-                        courses_df = None
-                    if courses_df is not None:
-                        logger.info(f"Loaded {len(courses_df)} courses from configured file: {data_file}")
-                        loaded = True
+                    course_store = CourseStore.load(data_file)
+                    logger.info(f"Loaded {len(course_store)} courses from configured file: {data_file}")
+                    loaded = True
                 else:
                     logger.info(f"Configured COURSES_DATA_FILE not found: {data_file}. Falling back to defaults.")
             except Exception as e:
                 logger.warning(f"Failed loading configured COURSES_DATA_FILE ({data_file}): {e}. Falling back to defaults.")
 
         if not loaded:
-            if os.path.exists("courses_data.feather"):
-                courses_df = pd.read_feather("courses_data.feather")
-                logger.info(f"Loaded {len(courses_df)} courses from courses_data.feather")
-                loaded = True
-            elif os.path.exists("courses_data.csv"):
-                courses_df = pd.read_csv("courses_data.csv")
-                logger.info(f"Loaded {len(courses_df)} courses from courses_data.csv")
-                loaded = True
+            for default_file in ("courses_data.feather", "courses_data.csv"):
+                if os.path.exists(default_file):
+                    course_store = CourseStore.load(default_file)
+                    logger.info(f"Loaded {len(course_store)} courses from {default_file}")
+                    loaded = True
+                    break
 
         if not loaded:
             logger.error("No course data file found. Set COURSES_DATA_FILE in config.env to an absolute path (e.g., C:\\Users\\<you>\\...\\courses_data.feather) or place courses_data.feather/csv in the repo root.")
             return
 
+        courses_df = course_store.frame
+        with match_cache_lock:
+            match_cache.clear()
+            ranked_cache.clear()
+        if config.SHARD_COUNT > 1:
+            logger.info(f"Serving shard {config.SHARD_INDEX} of {config.SHARD_COUNT}")
+        # Sizes known without decompressing the lazy text; /stats/memory has the full report
+        report = course_store.memory_report(scan_lazy=False)
+        logger.info(
+            f"Course table resident size: {report['total_resident_bytes'] / 1e6:.1f} MB "
+            f"(raw {report['total_raw_bytes'] / 1e6:.1f} MB)"
+        )
+
         # Load embeddings for similarity search
         emb_file = getattr(config, 'EMBEDDINGS_FILE', 'course_embeddings_float16.npy')
+        emb_path = None
         try:
             # Try configured embeddings file first (both absolute and relative paths)
+            # Memory-mapped read-only: the page cache copy is shared with scoring processes and other workers
             if os.path.exists(emb_file):
-                course_embeddings = np.load(emb_file)
+                course_embeddings = np.load(emb_file, mmap_mode='r')
+                emb_path = emb_file
                 logger.info(f"Loaded embeddings from configured file: {emb_file} with shape {course_embeddings.shape}")
             elif os.path.exists('course_embeddings_float16.npy'):
-                course_embeddings = np.load('course_embeddings_float16.npy')
+                course_embeddings = np.load('course_embeddings_float16.npy', mmap_mode='r')
+                emb_path = 'course_embeddings_float16.npy'
                 logger.info(f"Loaded embeddings from course_embeddings_float16.npy with shape {course_embeddings.shape}")
             else:
                 course_embeddings = None
@@ -274,14 +455,42 @@ async def initialize_course_data():
             course_embeddings = None
             logger.warning(f"Failed to load embeddings: {e}. Continuing without embeddings.")
 
-        # Prepare text search columns
-        if 'title_clean' not in courses_df.columns:
-            courses_df['title_clean'] = courses_df['title'].astype(str).str.lower().str.strip()
+        # recommend_courses indexes embeddings by frame position, so row counts must agree
+        if course_embeddings is not None and course_embeddings.shape[0] != len(course_store):
+            logger.warning(
+                f"Embeddings have {course_embeddings.shape[0]} rows but the course table has {len(course_store)}. "
+                "Regenerate them together (scripts/make_sample.py). Falling back to category-based recommendations."
+            )
+            course_embeddings = None
+
+        # Frame and embeddings must come from the same pipeline build (build_manifest.json)
+        build = verify_artifacts(course_store.source_path, emb_path if course_embeddings is not None else None,
+                                 full_checksum=config.VERIFY_ARTIFACT_CHECKSUMS)
+        course_store.set_build(build["build_id"], build["built_at"])
+        if build["build_id"] is None:
+            logger.info(f"Build manifest not checked: {'; '.join(build['problems'])}")
+        elif build["verified"]:
+            logger.info(f"Verified course data build {build['build_id']}")
+        else:
+            logger.error(f"Build manifest mismatch: {'; '.join(build['problems'])}")
+            if course_embeddings is not None:
+                logger.error("Disabling embeddings; similarity recommendations will fall back to category-based.")
+                course_embeddings = None
+
+        # Row norms are fixed per snapshot; computing them once halves per-request similarity work
+        embedding_row_norms = embedding_norms(course_embeddings) if course_embeddings is not None else None
+        if scoring_executor is not None:
+            if course_embeddings is not None:
+                scoring_executor.attach_embeddings(emb_path)
+            else:
+                scoring_executor.detach_embeddings()
 
     except Exception as e:
         logger.error(f"Failed to load course data: {e}")
+        course_store = None
         courses_df = pd.DataFrame()
         course_embeddings = None
+        embedding_row_norms = None
 
 def normalize_text(text):
     """Normalize text for search and comparison"""
@@ -296,7 +505,7 @@ async def fetch_udemy_courses(query: str = None, category: str = None, page: int
         params = {
             "page": page,
             "page_size": page_size,
-            "fields[course]": "@default,visible_instructors,image_480x270,estimated_content_length,num_subscribers,avg_rating_recent,content_info_short,objectives_summary"
+            "fields[course]": UDEMY_COURSE_FIELDS
         }
         
         if query:
@@ -309,17 +518,15 @@ async def fetch_udemy_courses(query: str = None, category: str = None, page: int
             "Accept": "application/json"
         }
         
-        if not session_pool:
+        if not upstream_client:
             return []
             
-        async with session_pool.get(url, params=params, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                return data.get("results", [])
-            else:
-                logger.error(f"Udemy API error: {response.status}")
-                return []
+        data = await upstream_client.get_json(url, params=params, headers=headers)
+        return data.get("results", [])
                 
+    except UpstreamError as e:
+        logger.error(f"Udemy API error: {e}")
+        return []
     except Exception as e:
         logger.error(f"Error fetching Udemy courses: {e}")
         return []
@@ -370,6 +577,114 @@ def format_course_data(course_data: dict) -> dict:
         logger.error(f"Error formatting course data: {e}")
         return {}
 
+def collapse_duplicates(frame: pd.DataFrame, limit: Optional[int] = None) -> pd.DataFrame:
+    """Keep only the best-ranked course of each near-duplicate cluster (canonical_id)"""
+    if 'canonical_id' in frame.columns:
+        frame = frame[~frame['canonical_id'].duplicated()]
+    return frame if limit is None else frame.head(limit)
+
+def collapse_positions(positions: np.ndarray) -> np.ndarray:
+    """collapse_duplicates for ranked frame positions: the first of each cluster stays, order kept"""
+    if 'canonical_id' not in courses_df.columns or not len(positions):
+        return positions
+    _, first = np.unique(courses_df['canonical_id'].to_numpy()[positions], return_index=True)
+    return positions[np.sort(first)]
+
+def listing_positions(key: str, mask: Optional[np.ndarray], count: int, category: Optional[str] = None) -> np.ndarray:
+    """The first `count` distinct-cluster positions of a presorted index, filtered by `mask`.
+
+    A prefix of the index is walked, oversampled for the rows collapsing drops,
+    and extended only when the prefix held too many near-duplicates.
+    """
+    want = count * DUPLICATE_OVERSAMPLE
+    while True:
+        positions = course_store.ordered(key, mask, want, category)
+        ranked = collapse_positions(positions)
+        if len(ranked) >= count or len(positions) < want:
+            return ranked[:count]
+        want *= 4
+
+def scored_frame(positions: np.ndarray, key: str) -> pd.DataFrame:
+    """Rows at `positions` with the sort key's value as 'score' (what coordinators merge on)"""
+    frame = courses_df.iloc[positions].copy()
+    frame['score'] = course_store.key_values(key)[positions]
+    return frame
+
+# Frontend course fields: (local table columns read, builder from a row dict)
+COURSE_FIELDS = {
+    "id": (("id",), lambda c: c["id"]),
+    "title": (("title",), lambda c: c["title"]),
+    "visible_instructors": (("instructor",), lambda c: [{"name": c.get("instructor")}]),
+    "image_480x270": (("image_url",), lambda c: c.get("image_url", "")),
+    "price": (("price",), lambda c: c.get("price")),
+    "is_paid": (("is_paid",), lambda c: c.get("is_paid")),
+    "avg_rating": (("rating",), lambda c: c.get("rating")),
+    "rating": (("rating",), lambda c: c.get("rating")),
+    "num_subscribers": (("num_subscribers",), lambda c: c.get("num_subscribers")),
+    "num_reviews": (("num_reviews",), lambda c: c.get("num_reviews")),
+    "instructional_level": (("level",), lambda c: c.get("level")),
+    "headline": (("headline",), lambda c: c.get("headline", "")),
+    "description": (("description",), lambda c: c.get("description")),
+    "primary_category": (("category",), lambda c: {"name": c.get("category")}),
+    "url": (("url",), lambda c: c.get("url", "")),
+    "language": (("language",), lambda c: c.get("language")),
+    "duration": (("duration",), lambda c: c.get("duration")),
+}
+
+# What course cards render (main.js createCourseCard / watchlist / suggestions)
+CARD_FIELDS = ("id", "title", "url", "price", "is_paid", "visible_instructors", "image_480x270", "avg_rating",
+               "rating", "num_subscribers", "num_reviews", "instructional_level", "primary_category")
+# The default list shape
+DETAIL_FIELDS = ("id", "title", "visible_instructors", "image_480x270", "price", "is_paid", "avg_rating", "rating",
+                 "num_subscribers", "num_reviews", "instructional_level", "headline", "description",
+                 "primary_category", "url")
+FIELD_PROFILES = {
+    "card": CARD_FIELDS,
+    "detail": DETAIL_FIELDS,
+    # Detail plus the remaining table columns; on /courses/{id} also the lazily loaded text
+    "full": DETAIL_FIELDS + ("language", "duration"),
+}
+
+def parse_fields(spec: Optional[str], default: str = "detail", extra: Sequence[str] = ()) -> Tuple[str, ...]:
+    """Fields selected by a ?fields= value: a profile name or a comma-separated list of field names"""
+    if not spec:
+        return FIELD_PROFILES[default]
+    if spec in FIELD_PROFILES:
+        return FIELD_PROFILES[spec]
+    fields = tuple(dict.fromkeys(name.strip() for name in spec.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in COURSE_FIELDS and name not in extra]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}; use a profile "
+                                                    f"({', '.join(FIELD_PROFILES)}) or course field names")
+    return fields if "id" in fields else ("id",) + fields
+
+def select_fields(rows: List[dict], fields: Tuple[str, ...]) -> List[dict]:
+    """Project already formatted rows (shard or cached answers) onto `fields`"""
+    return [{name: row[name] for name in fields if name in row} for row in rows]
+
+def format_local_course(course_dict: dict, fields: Sequence[str] = DETAIL_FIELDS) -> dict:
+    """Format a row of the local course table for the frontend"""
+    return {name: COURSE_FIELDS[name][1](course_dict) for name in fields if name in COURSE_FIELDS}
+
+def format_course_rows(frame: pd.DataFrame, fields: Sequence[str] = DETAIL_FIELDS) -> List[dict]:
+    """Convert rows of the local course table to frontend course dicts holding `fields`"""
+    # Only the columns the fields need are materialised (card lists never touch description text)
+    needed = {column for name in fields if name in COURSE_FIELDS for column in COURSE_FIELDS[name][0]}
+    frame = frame[[column for column in frame.columns if column in needed]]
+    results = []
+    for course_dict in frame.to_dict(orient="records"):
+        # Convert numpy types to Python types
+        for key, value in course_dict.items():
+            if isinstance(value, (np.integer, np.bool_)):
+                course_dict[key] = value.item()
+            elif pd.isna(value):
+                course_dict[key] = None
+            elif isinstance(value, (float, np.floating)):
+                # float32 columns would otherwise leak representation noise (4.97 -> 4.9699998)
+                course_dict[key] = round(float(value), 6)
+        results.append(format_local_course(course_dict, fields))
+    return results
+
 def calculate_course_similarity(courses: List[dict]) -> np.ndarray:
     """Calculate similarity matrix for courses using TF-IDF"""
     try:
@@ -417,6 +732,343 @@ def calculate_course_similarity(courses: List[dict]) -> np.ndarray:
 # API ENDPOINTS
 # ===========================================
 
+# ===========================================
+# RANKING (runs on the scoring executor)
+# ===========================================
+
+async def run_scoring(route: str, fn, *args, deadline: Optional[Deadline] = None):
+    """Run a synchronous ranking function off the event loop, gated by the route's concurrency limit.
+
+    A saturated route sheds the request with 503 + Retry-After instead of queueing it.
+    """
+    if scoring_executor is None:
+        return fn(*args)
+    try:
+        return await scoring_executor.run(route, fn, *args, deadline=deadline)
+    except ScoringOverloaded as e:
+        logger.warning(f"Shedding {route} request: {e.reason}")
+        raise HTTPException(status_code=503, detail=f"Server busy ({e.reason}), retry later",
+                            headers={"Retry-After": str(e.retry_after)})
+
+def request_deadline(budget_ms: Optional[float] = None) -> Deadline:
+    """Deadline for a request that starts now (REQUEST_DEADLINE_MS unless a smaller budget is passed)"""
+    budget = config.REQUEST_DEADLINE_MS if budget_ms is None else min(budget_ms, config.REQUEST_DEADLINE_MS)
+    return Deadline(budget / 1000)
+
+def partial_headers(route: str, partial: bool) -> Optional[Dict[str, str]]:
+    """Mark (and count) a response built from a scan that ran out of time"""
+    if not partial:
+        return None
+    if scoring_executor is not None:
+        scoring_executor.note_partial(route)
+    return {"X-Partial-Results": "true"}
+
+async def local_federated_rows(query: str, limit: int, deadline: Deadline) -> List[dict]:
+    """Local catalogue results for federated search (through the coordinator when sharded)"""
+    if shard_coordinator is not None:
+        rows, _ = await shard_coordinator.search(query, limit, deadline)
+        return rows
+    if courses_df is None or courses_df.empty:
+        return []
+    frame, _ = await run_scoring("search", search_frame, query, limit, None, deadline, deadline=deadline)
+    return format_course_rows(frame)
+
+def build_providers(names: str, timeout: float) -> list:
+    """Providers named in a comma-separated list that have what they need to run"""
+    available = {
+        "local": lambda: LocalProvider(local_federated_rows, timeout=timeout),
+        "udemy": lambda: UdemyProvider(upstream_client, UDEMY_BASE_URL, UDEMY_API_KEY, format_course_data,
+                                       config.COURSE_LINK_BASE, timeout=timeout)
+        if UDEMY_API_KEY != "your_udemy_api_key_here" else None,
+        "rapidapi": lambda: RapidAPIProvider(upstream_client, config.RAPIDAPI_BASE_URL, config.RAPIDAPI_KEY,
+                                             config.RAPIDAPI_HOST, timeout=timeout)
+        if config.RAPIDAPI_KEY else None,
+        "coursera": lambda: CourseraProvider(upstream_client, config.COURSERA_BASE_URL, timeout=timeout),
+        "edx": lambda: EdxProvider(upstream_client, config.EDX_BASE_URL, timeout=timeout),
+    }
+    providers = []
+    for name in names.split(","):
+        factory = available.get(name.strip())
+        provider = factory() if factory else None
+        if provider is not None:
+            providers.append(provider)
+    return providers
+
+def build_federated_search() -> FederatedSearch:
+    """Federated search over the providers in FEDERATED_PROVIDERS"""
+    providers = build_providers(config.FEDERATED_PROVIDERS, config.FEDERATED_TIMEOUT_MS / 1000)
+    logger.info(f"Federated search providers: {', '.join(p.name for p in providers) or 'none'}")
+    return FederatedSearch(providers, config.COURSE_LINK_BASE)
+
+def search_match_positions(query_lower: str, deadline: Optional[Deadline] = None):
+    """Frame positions matching a query, scanned block by block until the deadline.
+
+    Returns (positions, complete). Complete match sets are cached per snapshot.
+    """
+    with match_cache_lock:
+        cached = match_cache.get(query_lower)
+        if cached is not None:
+            match_cache.move_to_end(query_lower)
+            return cached, True
+    
+    parts = []
+    complete = True
+    for start in range(0, len(courses_df), SEARCH_SCAN_ROWS):
+        # The first block always runs so an expired budget still yields some results
+        if deadline is not None and start and deadline.expired():
+            complete = False
+            break
+        block = courses_df.iloc[start:start + SEARCH_SCAN_ROWS]
+        # Search in title, category, description, and instructor
+        search_mask = (
+            block['title'].str.lower().str.contains(query_lower, na=False) |
+            block['category'].str.lower().str.contains(query_lower, na=False) |
+            block['description'].str.lower().str.contains(query_lower, na=False) |
+            block['instructor'].str.lower().str.contains(query_lower, na=False)
+        )
+        parts.append(np.flatnonzero(search_mask.to_numpy()) + start)
+    positions = np.concatenate(parts).astype(np.int32) if parts else np.empty(0, dtype=np.int32)
+    
+    if complete:
+        with match_cache_lock:
+            match_cache[query_lower] = positions
+            while len(match_cache) > MATCH_CACHE_SIZE:
+                match_cache.popitem(last=False)
+    return positions, complete
+
+def search_frame(query: str, limit: int, subs_max: Optional[float] = None,
+                 deadline: Optional[Deadline] = None):
+    """Matching courses ranked by rating and popularity, near-duplicates collapsed.
+
+    subs_max normalises subscriber counts; shards get the max over all shards' matches.
+    Returns (frame, complete).
+    """
+    # Get search results
+    positions, complete = search_match_positions(query.lower().strip(), deadline)
+    search_results = courses_df.iloc[positions].copy()
+    
+    # Sort by rating and subscriber count
+    search_results['score'] = (
+        search_results['rating'] * 0.6 + 
+        (search_results['num_subscribers'] / (subs_max or search_results['num_subscribers'].max())) * 0.4
+    )
+    
+    return collapse_duplicates(search_results.sort_values('score', ascending=False), limit), complete
+
+def search_ranked_positions(query_lower: str, deadline: Optional[Deadline] = None, sort: str = "relevance"):
+    """Every match's frame position in rank order, near-duplicates collapsed.
+
+    "relevance" is search_frame's score; other sorts walk that key's presorted
+    index through the match bitmap. Returns (positions, complete). Complete
+    lists are cached per snapshot as int32, so any page of a cached query is
+    an array slice.
+    """
+    cache_key = (sort, query_lower)
+    with match_cache_lock:
+        cached = ranked_cache.get(cache_key)
+        if cached is not None:
+            ranked_cache.move_to_end(cache_key)
+            return cached, True
+    
+    positions, complete = search_match_positions(query_lower, deadline)
+    if sort == "relevance":
+        rating = courses_df['rating'].to_numpy(dtype=np.float64, na_value=np.nan)[positions]
+        subs = courses_df['num_subscribers'].to_numpy(dtype=np.float64, na_value=np.nan)[positions]
+        score = rating * 0.6 + (subs / (np.nanmax(subs) if len(subs) else 1.0)) * 0.4
+        # Stable, so ties keep frame order and pages never shuffle between requests
+        ranked = positions[np.argsort(-score, kind='stable')]
+    else:
+        matched = np.zeros(len(courses_df), dtype=bool)
+        matched[positions] = True
+        ranked = course_store.ordered(sort, matched)
+    ranked = collapse_positions(ranked).astype(np.int32)
+    
+    if complete:
+        with match_cache_lock:
+            ranked_cache[cache_key] = ranked
+            while len(ranked_cache) > MATCH_CACHE_SIZE:
+                ranked_cache.popitem(last=False)
+    return ranked, complete
+
+def rank_search_results(query: str, deadline: Optional[Deadline] = None, fields: Sequence[str] = DETAIL_FIELDS,
+                        offset: int = 0, limit: int = SEARCH_LIMIT, sort: str = "relevance"):
+    """Substring match over title, category, description and instructor, ranked by rating and popularity
+    (or by another sort key).
+
+    Returns (rows of the page starting at `offset`, partial, total ranked results).
+    """
+    ranked, complete = search_ranked_positions(query.lower().strip(), deadline, sort)
+    page = courses_df.iloc[ranked[offset:offset + limit]]
+    return format_course_rows(page, fields), not complete, len(ranked)
+
+def cursor_tag(scope: str) -> str:
+    """Binds a cursor to its query or listing (`scope`) and the catalogue snapshot it pages through"""
+    snapshot = course_store.version if course_store is not None else ""
+    return hashlib.blake2b(f"{snapshot}\0{scope}".encode(), digest_size=6).hexdigest()
+
+def encode_cursor(scope: str, offset: int) -> str:
+    token = f"{offset}.{cursor_tag(scope)}"
+    return base64.urlsafe_b64encode(token.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, scope: str) -> int:
+    """Offset a cursor points at; 400 when it is malformed or from another query, listing or snapshot"""
+    try:
+        token = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        offset, tag = token.split(".", 1)
+        offset = int(offset)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0 or tag != cursor_tag(scope):
+        raise HTTPException(status_code=400, detail="Cursor does not match this query or the catalogue has "
+                                                    "changed; start again without a cursor")
+    return offset
+
+def parse_sort(sort: Optional[str], allowed: Sequence[str], default: str) -> str:
+    if not sort:
+        return default
+    if sort not in allowed:
+        raise HTTPException(status_code=400, detail=f"Unknown sort {sort}; use one of: {', '.join(allowed)}")
+    return sort
+
+def listing_filter(category: Optional[str] = None, level: Optional[str] = None, language: Optional[str] = None,
+                   free: Optional[bool] = None) -> Optional[np.ndarray]:
+    """Intersection of the cached filter bitmaps a listing names; None when it names none"""
+    masks = [course_store.mask(column, value)
+             for column, value in (("category", category), ("level", level), ("language", language))
+             if value]
+    if free is not None:
+        masks.append(course_store.mask("is_paid", not free))
+    if not masks:
+        return None
+    return masks[0] if len(masks) == 1 else np.logical_and.reduce(masks)
+
+def rank_listing(sort: str, filters: Dict[str, Any], offset: int, limit: int,
+                 fields: Sequence[str] = DETAIL_FIELDS):
+    """One page of the catalogue in `sort` order through `filters`; returns (rows, more_follow)"""
+    positions = listing_positions(sort, listing_filter(**filters), offset + limit + 1)
+    return format_course_rows(courses_df.iloc[positions[offset:offset + limit]], fields), len(positions) > offset + limit
+
+def similar_frame(course_idx: Optional[int], limit: int, vector: Optional[np.ndarray] = None,
+                  exclude_canonical: Optional[int] = None, deadline: Optional[Deadline] = None):
+    """Most similar courses by embedding (with a 'score' column), query course and its cluster excluded.
+
+    Returns (frame, complete).
+    """
+    k = limit * DUPLICATE_OVERSAMPLE
+    if scoring_executor is not None:
+        similar_indices, scores, complete = scoring_executor.similar(
+            course_embeddings, embedding_row_norms, course_idx, k, vector=vector, deadline=deadline)
+    else:
+        query = course_embeddings[course_idx] if vector is None else vector
+        similar_indices, scores, complete = top_k_similar(
+            course_embeddings, embedding_row_norms, query, k, exclude=course_idx,
+            deadline_at=deadline.at if deadline is not None else None)
+    
+    recommendations = courses_df.iloc[similar_indices].assign(score=scores)
+    if exclude_canonical is None and course_idx is not None and 'canonical_id' in courses_df.columns:
+        exclude_canonical = courses_df.at[course_idx, 'canonical_id']
+    if exclude_canonical is not None and 'canonical_id' in courses_df.columns:
+        recommendations = recommendations[recommendations['canonical_id'] != exclude_canonical]
+    return collapse_duplicates(recommendations, limit), complete
+
+def rank_recommendations(course_id: int, limit: int, deadline: Optional[Deadline] = None,
+                         fields: Sequence[str] = DETAIL_FIELDS):
+    """Embedding similarity recommendations, falling back to same-category courses.
+
+    Returns (rows, partial).
+    """
+    # Find the course in our dataset
+    course_idx = course_store.position(course_id)
+    complete = True
+    
+    if course_idx is None:
+        logger.warning(f"Course ID {course_id} not found")
+        # Fallback to category-based recommendations
+        recommendations = courses_df.sample(n=min(limit, len(courses_df))).copy()
+    elif has_embedding(course_idx):
+        # Top similar courses, excluding the query course and its near-duplicates
+        recommendations, complete = similar_frame(course_idx, limit, deadline=deadline)
+    else:
+        # Fallback: recommend from same category, best rated first
+        same_category = course_store.mask('category', courses_df.at[course_idx, 'category'])
+        positions = listing_positions('rating', same_category, limit + 1)
+        positions = positions[positions != course_idx][:limit]
+        
+        if len(positions) > 0:
+            recommendations = courses_df.iloc[positions]
+        else:
+            recommendations = courses_df[courses_df['id'] != course_id].sample(n=min(limit, len(courses_df)-1))
+    
+    # Format results for frontend
+    return format_course_rows(recommendations, fields), not complete
+
+def trending_leaders(limit: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(frame positions, decayed scores) of the courses trending on recent interactions, best first.
+
+    Only courses above TRENDING_MIN_SCORE count; one per near-duplicate cluster.
+    """
+    if trending_tracker is None or course_store is None:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    leaders = trending_tracker.top(min_score=config.TRENDING_MIN_SCORE)
+    positions = course_store.positions([course_id for course_id, _ in leaders])
+    scores = np.array([score for _, score in leaders], dtype=np.float64)
+    found = positions >= 0
+    positions, scores = positions[found], scores[found]
+    # Positions are distinct, so the collapsed ones still index their scores
+    kept = collapse_positions(positions)[:limit]
+    return kept, scores[np.isin(positions, kept)]
+
+def trending_frame(limit: int, leaders: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> pd.DataFrame:
+    """Courses trending on decayed interaction counts, topped up by subscriber count (with a 'score' column).
+
+    Interaction leaders score their decayed count; the most-subscribed
+    courses fill the rest with negative scores, so they always rank below
+    and a coordinator can merge shards on one column.
+    """
+    positions, scores = trending_leaders(limit) if leaders is None else leaders
+    if len(positions) < limit:
+        fallback = listing_positions('subscribers', None, limit + len(positions))
+        # Without a canonical_id column collapsing keeps everything, so leaders are dropped here explicitly
+        fallback = fallback[~np.isin(fallback, positions)]
+        positions = collapse_positions(np.concatenate([positions, fallback]))[:limit]
+    frame = courses_df.iloc[positions].copy()
+    subscribers = frame['num_subscribers'].fillna(0).to_numpy(dtype=np.float64)
+    frame['score'] = np.concatenate([scores, -1.0 / (1.0 + subscribers[len(scores):])])
+    return frame
+
+def top_rated_frame(limit: int, category: Optional[str] = None,
+                    min_reviews: int = TOP_RATED_MIN_REVIEWS) -> pd.DataFrame:
+    """Best courses by Bayesian average rating, overall or within a category (with a 'score' column).
+
+    A prefix of the ranking precomputed at snapshot build; a handful of
+    5-star reviews no longer outranks thousands of 4.8s.
+    """
+    eligible = course_store.at_least('num_reviews', min_reviews) if min_reviews > 0 else None
+    return scored_frame(listing_positions('bayes', eligible, limit, category), 'bayes')
+
+def rank_trending(limit: int, fields: Sequence[str] = DETAIL_FIELDS,
+                  leaders: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> List[dict]:
+    return format_course_rows(trending_frame(limit, leaders), fields)
+
+def rank_top_rated(limit: int, fields: Sequence[str] = DETAIL_FIELDS, category: Optional[str] = None,
+                   min_reviews: int = TOP_RATED_MIN_REVIEWS) -> List[dict]:
+    return format_course_rows(top_rated_frame(limit, category, min_reviews), fields)
+
+# Sort key each listing is merged on when a coordinator combines shard answers
+LISTINGS = {
+    "trending": (trending_frame, 'score'),
+    "top-rated": (top_rated_frame, 'score'),
+}
+
+def shard_rows(frame: pd.DataFrame, score_column: str = 'score') -> List[dict]:
+    """Frontend rows plus the score and cluster id a coordinator merges on"""
+    rows = format_course_rows(frame)
+    canonical = frame['canonical_id'] if 'canonical_id' in frame.columns else frame['id']
+    for row, score, cluster in zip(rows, frame[score_column].to_numpy(), canonical.to_numpy()):
+        row["score"] = float(score)
+        row["canonical_id"] = int(cluster)
+    return rows
+
 def _host_allowed(host: str) -> bool:
     try:
         host = host.lower()
@@ -427,25 +1079,191 @@ def _host_allowed(host: str) -> bool:
             return True
     return False
 
-def get_cached_response(cache_key: str):
-    """Get cached response if valid, None otherwise"""
-    if cache_key in api_cache:
-        cached_data, timestamp = api_cache[cache_key]
-        if time.time() - timestamp < CACHE_TTL:
-            return cached_data
-        else:
-            # Remove expired cache entry
-            del api_cache[cache_key]
+def snapshot_version(*params) -> Optional[str]:
+    """Validator for a response computed from the current catalogue snapshot and `params`.
+
+    None in coordinator mode, where no snapshot is held locally.
+    """
+    if course_store is None:
+        return None
+    key = repr((course_store.version,) + params).encode()
+    return hashlib.blake2b(key, digest_size=10).hexdigest()
+
+def snapshot_modified() -> Optional[datetime]:
+    return course_store.built_at if course_store is not None else None
+
+IMAGE_REQUEST_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
+    "Referer": "https://www.udemy.com/"
+}
+
+IMAGE_CHUNK_BYTES = 64 * 1024
+
+def _too_large(resp) -> bool:
+    length = resp.headers.get("Content-Length")
+    return length is not None and length.isdigit() and int(length) > config.IMAGE_PROXY_MAX_BYTES
+
+async def fetch_image(url: str):
+    """Download an image for the proxy cache; None when the upstream does not return one within the size cap"""
+    client = session_pool
+    if not client:
+        timeout = aiohttp.ClientTimeout(total=5)
+        client = aiohttp.ClientSession(timeout=timeout)
+        close_after = True
+    else:
+        close_after = False
+    try:
+        async with client.get(url, headers=IMAGE_REQUEST_HEADERS) as resp:
+            if resp.status != 200:
+                logger.warning(f"Image proxy upstream status {resp.status} for {url}")
+                return None
+            if _too_large(resp):
+                logger.warning(f"Image proxy refused {url}: {resp.headers['Content-Length']} bytes")
+                return None
+            chunks = []
+            size = 0
+            async for chunk in resp.content.iter_chunked(IMAGE_CHUNK_BYTES):
+                size += len(chunk)
+                if size > config.IMAGE_PROXY_MAX_BYTES:
+                    logger.warning(f"Image proxy refused {url}: over {config.IMAGE_PROXY_MAX_BYTES} bytes")
+                    return None
+                chunks.append(chunk)
+            return b"".join(chunks), resp.headers.get("Content-Type", "image/jpeg")
+    finally:
+        if close_after:
+            await client.close()
+
+class UpstreamImageResponse(StreamingResponse):
+    """Relayed image that always hands its upstream connection back to the pool, even when the client
+    disconnects before the body starts (the relay generator then never runs)"""
+
+    def __init__(self, upstream: aiohttp.ClientResponse, content, **kwargs):
+        super().__init__(content, **kwargs)
+        self.upstream = upstream
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.upstream.release()
+
+async def stream_image(url: str) -> Optional[StreamingResponse]:
+    """Relay an upstream image chunk by chunk (no cache), cut off at IMAGE_PROXY_MAX_BYTES"""
+    resp = await session_pool.get(url, headers=IMAGE_REQUEST_HEADERS)
+    if resp.status != 200 or _too_large(resp):
+        logger.warning(f"Image proxy refused {url}: status {resp.status}, "
+                       f"{resp.headers.get('Content-Length', '?')} bytes")
+        resp.release()
+        return None
+    
+    async def relay():
+        sent = 0
+        try:
+            async for chunk in resp.content.iter_chunked(IMAGE_CHUNK_BYTES):
+                sent += len(chunk)
+                if sent > config.IMAGE_PROXY_MAX_BYTES:
+                    logger.warning(f"Image proxy truncated {url} at {config.IMAGE_PROXY_MAX_BYTES} bytes")
+                    break
+                yield chunk
+        finally:
+            resp.release()
+    
+    # No Content-Length: the upstream's may be absent or wrong, and the relay can stop short of it
+    headers = {"Cache-Control": "public, max-age=86400"}
+    return UpstreamImageResponse(resp, relay(), media_type=resp.headers.get("Content-Type", "image/jpeg"),
+                                 headers=headers)
+
+async def original_image(url: str) -> Optional[CachedImage]:
+    if image_cache is not None:
+        return await image_cache.get(url, fetch_image)
+    fetched = await fetch_image(url)
+    return None if fetched is None else CachedImage(fetched[0], fetched[1], make_etag(fetched[0]))
+
+async def make_variant(url: str, size: str, fmt: str):
+    """Resized/re-encoded thumbnail as (body, content_type); the original if it cannot be decoded"""
+    original = await original_image(url)
+    if original is None:
+        return None
+    width, height = (int(v) for v in size.split("x"))
+    try:
+        body = await asyncio.get_running_loop().run_in_executor(
+            image_executor, transcode, original.body, width, height, fmt)
+    except Exception as e:
+        logger.warning(f"Could not transcode {url}: {e}")
+        return original.body, original.content_type
+    return body, FORMAT_MIME[fmt]
+
+async def variant_image(url: str, size: str, fmt: str) -> Optional[CachedImage]:
+    if image_cache is not None:
+        return await image_cache.get(f"{url}#{size}.{fmt}", lambda _: make_variant(url, size, fmt))
+    made = await make_variant(url, size, fmt)
+    return None if made is None else CachedImage(made[0], made[1], make_etag(made[0]))
+
+def card_image_url(course: dict) -> Optional[str]:
+    """The proxied image URL the frontend will request for a course card (getCourseImageUrl in main.js)"""
+    for field in ("image_480x270", "image_750x422", "image_url", "thumbnail"):
+        raw = str(course.get(field) or "").strip()
+        if not raw or raw.lower() in ("null", "none", "undefined", "nan"):
+            continue
+        if raw.startswith("//"):
+            raw = "https:" + raw
+        parsed = urlparse(raw)
+        if parsed.scheme in ("http", "https") and _host_allowed(parsed.hostname or ""):
+            return raw
+        return None
     return None
 
-def set_cached_response(cache_key: str, data):
-    """Cache response with timestamp"""
-    api_cache[cache_key] = (data, time.time())
+def prefetch_variant_key(url: str) -> Optional[str]:
+    """Cache key of the card thumbnail warmed for `url` (the format most browsers negotiate), if any"""
+    if image_formats and config.IMAGE_PREFETCH_SIZE in image_variants:
+        return f"{url}#{config.IMAGE_PREFETCH_SIZE}.{image_formats[0]}"
+    return None
+
+async def warm_card_image(url: str):
+    """Fetch an image into the cache, plus its card thumbnail"""
+    await original_image(url)
+    if prefetch_variant_key(url):
+        await variant_image(url, config.IMAGE_PREFETCH_SIZE, image_formats[0])
+
+def prefetch_thumbnails(courses: List[dict]) -> int:
+    """Warm the image cache for a course-card list in the background; returns URLs queued"""
+    if image_prefetcher is None or not courses:
+        return 0
+    urls = []
+    for course in courses[:config.IMAGE_PREFETCH_PER_LIST]:
+        url = card_image_url(course)
+        variant = url and prefetch_variant_key(url)
+        if url and not (image_cache.contains(url) and (variant is None or image_cache.contains(variant))):
+            urls.append(url)
+    return image_prefetcher.submit(urls)
+
+async def warm_listing_images():
+    """Prefetch the thumbnails of the default trending / top-rated lists so the first page paint hits the cache"""
+    try:
+        for kind, rank_fn in (("trending", rank_trending), ("top-rated", rank_top_rated)):
+            if shard_coordinator is not None:
+                rows = await shard_coordinator.listing(kind, DEFAULT_LIST_LIMIT)
+            elif courses_df is not None and not courses_df.empty:
+                rows = await run_scoring("listing", rank_fn, DEFAULT_LIST_LIMIT, CARD_FIELDS)
+            else:
+                return
+            prefetch_thumbnails(rows)
+        await image_prefetcher.drain()
+        logger.info(f"Warmed listing thumbnails: {image_prefetcher.metrics()}")
+    except Exception as e:
+        logger.warning(f"Listing thumbnail warm-up failed: {e}")
 
 @app.get("/image-proxy")
-async def image_proxy(url: str = Query(..., description="Remote image URL to proxy")):
+async def image_proxy(
+    request: Request,
+    url: str = Query(..., description="Remote image URL to proxy"),
+    size: Optional[str] = Query(None, description="Thumbnail size, e.g. 240x135 or 480x270")
+):
     """Lightweight image proxy to improve reliability and avoid hotlink issues.
     Only whitelisted hosts are allowed to mitigate SSRF risks.
+    Images are served from a disk/memory cache and revalidated with ETag / If-None-Match;
+    ?size= returns a resized thumbnail in the best format the client accepts.
     """
     try:
         from urllib.parse import urlparse
@@ -453,39 +1271,60 @@ async def image_proxy(url: str = Query(..., description="Remote image URL to pro
         if parsed.scheme not in ("http", "https") or not parsed.netloc or not _host_allowed(parsed.hostname or ""):
             logger.warning(f"Blocked image proxy request to host: {parsed.hostname}")
             return RedirectResponse(url=config.FALLBACK_POSTER_URL, status_code=302)
-        client = session_pool
-        if not client:
-            timeout = aiohttp.ClientTimeout(total=5)  # Reduced from 10s to 5s
-            client = aiohttp.ClientSession(timeout=timeout)
-            close_after = True
+        if size is not None and size not in image_variants:
+            raise HTTPException(status_code=400, detail=f"size must be one of {', '.join(sorted(image_variants))}")
+        
+        headers = {"Cache-Control": "public, max-age=86400"}
+        if size and image_formats:
+            fmt = negotiate_format(request.headers.get("accept"), image_formats)
+            image = await variant_image(url, size, fmt)
+            headers["Vary"] = "Accept"
+        elif image_cache is None and session_pool is not None:
+            streamed = await stream_image(url)
+            return streamed or RedirectResponse(url=config.FALLBACK_POSTER_URL, status_code=302)
         else:
-            close_after = False
-        try:
-            headers_req = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
-                "Accept": "image/avif,image/webp,image/apng,image/*,*/*;q=0.8",
-                "Referer": "https://www.udemy.com/"
-            }
-            async with client.get(url, headers=headers_req) as resp:
-                if resp.status == 200:
-                    data = await resp.read()
-                    content_type = resp.headers.get("Content-Type", "image/jpeg")
-                    headers = {"Cache-Control": "public, max-age=86400"}
-                    return Response(content=data, media_type=content_type, headers=headers)
-                else:
-                    logger.warning(f"Image proxy upstream status {resp.status} for {url}")
-                    return RedirectResponse(url=config.FALLBACK_POSTER_URL, status_code=302)
-        finally:
-            if close_after:
-                await client.close()
+            image = await original_image(url)
+        if image is None:
+            return RedirectResponse(url=config.FALLBACK_POSTER_URL, status_code=302)
+        
+        headers["ETag"] = image.etag
+        if etag_matches(request.headers.get("if-none-match"), image.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=image.body, media_type=image.content_type, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Image proxy error: {e}")
         return RedirectResponse(url=config.FALLBACK_POSTER_URL, status_code=302)
 
-@app.get("/")
-async def read_root():
-    """Serve the frontend HTML"""
-    return FileResponse('index.html')
+@app.get("/stats/response-cache")
+async def get_response_cache_stats():
+    """Encoded response cache hits, encodings served and time spent encoding"""
+    return JSONResponse(content=response_cache.metrics())
+
+@app.get("/stats/static")
+async def get_static_stats():
+    """Static asset versions, precompressed sizes and responses by encoding"""
+    return JSONResponse(content=static_assets.metrics())
+
+@app.get("/stats/images")
+async def get_image_cache_stats():
+    """Image proxy cache hit rates, coalesced fetches, sizes and evictions"""
+    if image_cache is None:
+        return JSONResponse(content={})
+    stats = image_cache.metrics()
+    if image_prefetcher is not None:
+        stats["prefetch"] = image_prefetcher.metrics()
+    return JSONResponse(content=stats)
+
+@app.get("/stats/trending")
+async def get_trending_stats():
+    """Interaction counter totals, tracked courses, memory and the current leaders"""
+    if trending_tracker is None:
+        return JSONResponse(content={})
+    stats = trending_tracker.metrics()
+    stats["leaders_top"] = [{"id": course_id, "score": round(score, 2)} for course_id, score in trending_tracker.top(10)]
+    return JSONResponse(content=stats)
 
 @app.get("/api")
 async def api_status():
@@ -517,161 +1356,368 @@ async def get_model_status():
             "message": str(e)
         }
 
+@app.get("/stats/memory")
+async def get_memory_report():
+    """Per-column memory usage of the in-memory course table"""
+    if course_store is None:
+        return JSONResponse(content={"rows": 0, "columns": []})
+    return JSONResponse(content=course_store.memory_report())
+
+@app.get("/stats/scoring")
+async def get_scoring_stats():
+    """Scoring executor threads, per-route concurrency and queue depth"""
+    if scoring_executor is None:
+        return JSONResponse(content={"threads": 0, "queue_depth": 0, "routes": {}})
+    return JSONResponse(content=scoring_executor.metrics())
+
+@app.get("/stats/upstream")
+async def get_upstream_stats():
+    """Outbound API cache, coalescing, retry and circuit breaker counters"""
+    if upstream_client is None:
+        return JSONResponse(content={})
+    return JSONResponse(content=upstream_client.metrics())
+
+@app.get("/stats/sync")
+async def get_sync_stats():
+    """Catalogue sync progress: pass, per-stream cursors, rows synced, store revision"""
+    if catalogue_sync is None:
+        return JSONResponse(content={"enabled": False})
+    report = catalogue_sync.metrics()
+    report["store_revision"] = course_store.revision if course_store is not None else None
+    report["courses"] = len(course_store) if course_store is not None else 0
+    return JSONResponse(content=report)
+
 @app.get("/search")
-async def search_courses(query: str = Query(...)):
-    """Search for courses using local data"""
+async def search_courses(
+    query: str = Query(...),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    sort: Optional[str] = Query(None, description="relevance (default), subscribers, rating, reviews, bayes or recency"),
+    fields: Optional[str] = Query(None, description="Payload profile (card, detail, full) or comma-separated fields")
+):
+    """Search for courses using local data, one page at a time.
+
+    When more results follow, the response carries an opaque X-Next-Cursor
+    to pass back as `cursor`.
+    """
     try:
         logger.info(f"Searching for courses with query: {query}")
+        deadline = request_deadline()
+        selected = parse_fields(fields)
+        sort = parse_sort(sort, SEARCH_SORTS, "relevance")
+        query_lower = query.lower().strip()
+        scope = query_lower if sort == "relevance" else f"{sort}\0{query_lower}"
+        offset = decode_cursor(cursor, scope) if cursor else 0
+        
+        if shard_coordinator is not None:
+            # Shards rank against the global subscriber max, so the coordinator re-merges up to the page end
+            depth = min(offset + limit + 1, SHARD_SEARCH_DEPTH)
+            results, partial = await shard_coordinator.search(query, depth, deadline, sort=sort)
+            headers = partial_headers("search", partial) or {}
+            if len(results) > offset + limit:
+                headers["X-Next-Cursor"] = encode_cursor(scope, offset + limit)
+            results = select_fields(results[offset:offset + limit], selected)
+            logger.info(f"Found {len(results)} courses across shards for query: {query}")
+            return JSONResponse(content=results, headers=headers)
         
         if courses_df is None or courses_df.empty:
             logger.error("No course data available")
             return JSONResponse(content=[])
         
-        query_lower = query.lower().strip()
+        results, partial, total = await run_scoring("search", rank_search_results, query, deadline, selected,
+                                                    offset, limit, sort, deadline=deadline)
+        prefetch_thumbnails(results)
         
-        # Search in title, category, description, and instructor
-        search_mask = (
-            courses_df['title'].str.lower().str.contains(query_lower, na=False) |
-            courses_df['category'].str.lower().str.contains(query_lower, na=False) |
-            courses_df['description'].str.lower().str.contains(query_lower, na=False) |
-            courses_df['instructor'].str.lower().str.contains(query_lower, na=False)
-        )
-        
-        # Get search results
-        search_results = courses_df[search_mask].copy()
-        
-        # Sort by rating and subscriber count
-        search_results['score'] = (
-            search_results['rating'] * 0.6 + 
-            (search_results['num_subscribers'] / search_results['num_subscribers'].max()) * 0.4
-        )
-        
-        search_results = search_results.sort_values('score', ascending=False).head(12)
-        
-        # Convert to list of dictionaries
-        results = []
-        for _, row in search_results.iterrows():
-            course_dict = row.to_dict()
-            # Convert numpy types to Python types
-            for key, value in course_dict.items():
-                if isinstance(value, (np.integer, np.floating)):
-                    course_dict[key] = value.item()
-                elif pd.isna(value):
-                    course_dict[key] = None
-            
-            # Format for frontend
-            formatted_course = {
-                "id": course_dict["id"],
-                "title": course_dict["title"],
-                "visible_instructors": [{"name": course_dict["instructor"]}],
-                "image_480x270": course_dict.get("image_url", ""),
-                "price": course_dict["price"],
-                "is_paid": course_dict["is_paid"],
-                "avg_rating": course_dict["rating"],
-                "rating": course_dict["rating"],
-                "num_subscribers": course_dict["num_subscribers"],
-                "num_reviews": course_dict["num_reviews"],
-                "instructional_level": course_dict["level"],
-                "headline": course_dict.get("headline", ""),
-                "description": course_dict["description"],
-                "primary_category": {"name": course_dict["category"]},
-                "url": course_dict.get("url", "")
-            }
-            results.append(formatted_course)
-        
-        logger.info(f"Found {len(results)} courses for query: {query}")
-        return JSONResponse(content=results)
+        headers = {**(partial_headers("search", partial) or {}), "X-Total-Results": str(total)}
+        if offset + limit < total:
+            headers["X-Next-Cursor"] = encode_cursor(scope, offset + limit)
+        logger.info(f"Found {total} courses for query: {query}, returned {len(results)} from {offset}"
+                    + (" (partial)" if partial else ""))
+        return JSONResponse(content=results, headers=headers)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error in /search endpoint: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/search/federated")
+async def search_federated(
+    query: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=50),
+    providers: Optional[str] = Query(None, description="Comma-separated subset of providers")
+):
+    """Search the local catalogue and external providers concurrently and merge-rank the results.
+
+    Providers that miss their timeout or the request deadline are reported and
+    left out; the response then carries X-Partial-Results.
+    """
+    try:
+        if federated_search is None:
+            return JSONResponse(content={"results": [], "providers": {}})
+        only = [name.strip() for name in providers.split(",")] if providers else None
+        results, report = await federated_search.search(query, limit, request_deadline(), only=only)
+        partial = any(info["status"] != "ok" for info in report.values())
+        logger.info(f"Federated search for {query!r}: {len(results)} results, "
+                    + ", ".join(f"{name}={info['status']}" for name, info in report.items()))
+        return JSONResponse(content={"results": results, "providers": report},
+                            headers=partial_headers("federated", partial))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error in /search/federated endpoint: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
 @app.get("/recommendations")
 async def recommend_courses(
     course_id: int = Query(...),
-    limit: int = Query(10, ge=1, le=50)
+    limit: int = Query(10, ge=1, le=50),
+    fields: Optional[str] = Query(None, description="Payload profile (card, detail, full) or comma-separated fields")
 ):
     """Get course recommendations based on a course ID using similarity"""
     try:
         logger.info(f"Getting recommendations for course ID: {course_id}")
+        deadline = request_deadline()
+        selected = parse_fields(fields)
+        
+        if shard_coordinator is not None:
+            answer = await shard_coordinator.recommendations(course_id, limit, deadline)
+            if answer is None:
+                # Owning shard has no embeddings or no such course: use its local fallback
+                params = {"course_id": course_id, "limit": limit}
+                if fields:
+                    params["fields"] = fields
+                status, body, headers = await shard_coordinator.forward(course_id, "/recommendations", params,
+                                                                        deadline=deadline)
+                return JSONResponse(status_code=status, content=body, headers=headers)
+            results, partial = answer
+            return JSONResponse(content=select_fields(results, selected),
+                                headers=partial_headers("recommendations", partial))
         
         if courses_df is None or courses_df.empty:
             logger.error("No course data available")
             return JSONResponse(content=[])
         
-        # Find the course in our dataset
-        course_idx = courses_df[courses_df['id'] == course_id].index
+        results, partial = await run_scoring("recommendations", rank_recommendations, course_id, limit, deadline,
+                                             selected, deadline=deadline)
+        
+        logger.info(f"Found {len(results)} recommendations for course {course_id}" + (" (partial)" if partial else ""))
+        return JSONResponse(content=results, headers=partial_headers("recommendations", partial))
         
-        if len(course_idx) == 0:
-            logger.warning(f"Course ID {course_id} not found")
-            # Fallback to category-based recommendations
-            random_courses = courses_df.sample(n=min(limit, len(courses_df))).copy()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error in /recommendations endpoint: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+@app.get("/courses")
+async def list_courses(
+    sort: Optional[str] = Query(None, description="subscribers (default), rating, reviews, bayes or recency"),
+    category: Optional[str] = Query(None),
+    level: Optional[str] = Query(None),
+    language: Optional[str] = Query(None),
+    free: Optional[bool] = Query(None, description="true: free courses only, false: paid only"),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=SEARCH_MAX_LIMIT),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    fields: Optional[str] = Query(None, description="Payload profile (card, detail, full) or comma-separated fields")
+):
+    """Browse the catalogue in any presorted order, optionally filtered, one page at a time.
+
+    A page is a slice of the sort key's permutation index intersected with the
+    filter bitmaps. More pages are announced with X-Next-Cursor.
+    """
+    try:
+        selected = parse_fields(fields)
+        sort = parse_sort(sort, SORT_KEYS, "subscribers")
+        filters = {"category": category, "level": level, "language": language, "free": free}
+        scope = "courses\0" + json.dumps([sort, category, level, language, free])
+        offset = decode_cursor(cursor, scope) if cursor else 0
+        
+        if shard_coordinator is not None:
+            depth = min(offset + limit + 1, SHARD_SEARCH_DEPTH)
+            params = {name: str(value).lower() if isinstance(value, bool) else value
+                      for name, value in filters.items() if value is not None}
+            merged = await shard_coordinator.courses({"sort": sort, **params}, depth)
+            results, more = select_fields(merged[offset:offset + limit], selected), len(merged) > offset + limit
+        elif courses_df is None or courses_df.empty:
+            logger.error("No course data available")
+            return JSONResponse(content=[])
         else:
-            course_idx = course_idx[0]
-            
-            if course_embeddings is not None:
-                # Use embeddings for similarity-based recommendations
-                query_embedding = course_embeddings[course_idx].reshape(1, -1)
-                similarities = cosine_similarity(query_embedding, course_embeddings)[0]
-                
-                # Get top similar courses (excluding the query course)
-                similar_indices = similarities.argsort()[::-1]
-                similar_indices = similar_indices[similar_indices != course_idx][:limit]
-                
-                recommendations = courses_df.iloc[similar_indices].copy()
-            else:
-                # Fallback: recommend from same category
-                source_course = courses_df.iloc[course_idx]
-                same_category = courses_df[
-                    (courses_df['category'] == source_course['category']) & 
-                    (courses_df['id'] != course_id)
-                ]
-                
-                if len(same_category) > 0:
-                    recommendations = same_category.sort_values('rating', ascending=False).head(limit)
-                else:
-                    recommendations = courses_df[courses_df['id'] != course_id].sample(n=min(limit, len(courses_df)-1))
-        
-            random_courses = recommendations
-        
-        # Format results for frontend
-        results = []
-        for _, row in random_courses.iterrows():
-            course_dict = row.to_dict()
-            # Convert numpy types to Python types
-            for key, value in course_dict.items():
-                if isinstance(value, (np.integer, np.floating)):
-                    course_dict[key] = value.item()
-                elif pd.isna(value):
-                    course_dict[key] = None
-            
-            # Format for frontend
-            formatted_course = {
-                "id": course_dict["id"],
-                "title": course_dict["title"],
-                "visible_instructors": [{"name": course_dict["instructor"]}],
-                "image_480x270": course_dict.get("image_url", ""),
-                "price": course_dict["price"],
-                "is_paid": course_dict["is_paid"],
-                "avg_rating": course_dict["rating"],
-                "rating": course_dict["rating"],
-                "num_subscribers": course_dict["num_subscribers"],
-                "num_reviews": course_dict["num_reviews"],
-                "instructional_level": course_dict["level"],
-                "headline": course_dict.get("headline", ""),
-                "description": course_dict["description"],
-                "primary_category": {"name": course_dict["category"]},
-                "url": course_dict.get("url", "")
-            }
-            results.append(formatted_course)
+            results, more = await run_scoring("listing", rank_listing, sort, filters, offset, limit, selected)
         
-        logger.info(f"Found {len(results)} recommendations for course {course_id}")
-        return JSONResponse(content=results)
+        headers = dict(LISTING_HEADERS)
+        if more:
+            headers["X-Next-Cursor"] = encode_cursor(scope, offset + limit)
+        return JSONResponse(content=results, headers=headers)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.exception(f"Error in /recommendations endpoint: {e}")
+        logger.exception(f"Error in /courses endpoint: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+@app.get("/courses/{course_id}")
+async def get_course_detail(
+    request: Request,
+    course_id: int,
+    fields: Optional[str] = Query(None, description="Payload profile (card, detail, full) or comma-separated fields")
+):
+    """Get the full record for one course, including lazily loaded text"""
+    try:
+        selected = parse_fields(fields, default="full", extra=LAZY_TEXT_COLUMNS)
+        # The "full" profile (this endpoint's default) includes all lazily loaded text; field lists name theirs.
+        # Resolved here so the cache key and ETag tell the two apart
+        if (fields or "full") == "full":
+            selected = selected + LAZY_TEXT_COLUMNS
+        if shard_coordinator is not None:
+            status, body, headers = await shard_coordinator.forward(course_id, f"/courses/{course_id}",
+                                                                    {"fields": fields} if fields else None)
+            return JSONResponse(status_code=status, content=body, headers=headers)
+        
+        if course_store is None or len(course_store) == 0:
+            logger.error("No course data available")
+            raise HTTPException(status_code=404, detail="Course data not available")
+        
+        # Checked before the lookup: a revalidation costs no row access or lazy text read
+        version, last_modified = snapshot_version("course", course_id, selected), snapshot_modified()
+        unchanged = response_cache.conditional(request.headers, version, last_modified, LISTING_HEADERS)
+        if unchanged is not None:
+            return unchanged
+        accept_encoding = request.headers.get("accept-encoding")
+        cache_key = f"course_{course_id}_{','.join(selected)}"
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return response_cache.respond(cached, accept_encoding, LISTING_HEADERS)
+        
+        position = course_store.position(course_id)
+        if position is None:
+            raise HTTPException(status_code=404, detail=f"Course {course_id} not found")
+        
+        course = format_course_rows(courses_df.iloc[[position]], selected)[0]
+        # The lazy text is only read from disk when asked for
+        heavy = [column for column in LAZY_TEXT_COLUMNS if column in selected]
+        if heavy:
+            course.update(course_store.heavy_text(position, heavy))
+        entry = response_cache.set(cache_key, course, version, last_modified)
+        return response_cache.respond(entry, accept_encoding, LISTING_HEADERS)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error in /courses/{course_id} endpoint: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+# ===========================================
+# SHARD ENDPOINTS (called by a coordinator)
+# ===========================================
+
+@app.get("/shard/info")
+async def shard_info():
+    """Which slice of the catalogue this server holds"""
+    return JSONResponse(content={
+        "shard_index": config.SHARD_INDEX,
+        "shard_count": config.SHARD_COUNT,
+        "rows": len(course_store) if course_store is not None else 0,
+        "build_id": course_store.build_id if course_store is not None else None,
+        "embeddings": course_embeddings is not None,
+    })
+
+@app.get("/shard/search")
+async def shard_search(
+    query: str = Query(...),
+    subs_max: Optional[float] = Query(None),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=SHARD_SEARCH_DEPTH),
+    sort: str = Query("relevance"),
+    budget_ms: Optional[float] = Query(None, description="Remaining request budget forwarded by the coordinator")
+):
+    """Without subs_max: match count and max subscribers. With it: this shard's ranked top rows"""
+    sort = parse_sort(sort, SEARCH_SORTS, "relevance")
+    if courses_df is None or courses_df.empty:
+        return JSONResponse(content={"matches": 0, "max_subscribers": 0, "rows": [], "partial": False})
+    deadline = request_deadline(budget_ms)
+    if subs_max is None:
+        def stats():
+            positions, complete = search_match_positions(query.lower().strip(), deadline)
+            subs = courses_df['num_subscribers'].to_numpy()[positions]
+            return {"matches": len(positions), "max_subscribers": int(subs.max()) if len(subs) else 0,
+                    "partial": not complete}
+        return JSONResponse(content=await run_scoring("search", stats, deadline=deadline))
+    def ranked():
+        if sort != "relevance":
+            positions, complete = search_ranked_positions(query.lower().strip(), deadline, sort)
+            return {"rows": shard_rows(scored_frame(positions[:limit], sort)), "partial": not complete}
+        frame, complete = search_frame(query, limit, subs_max, deadline)
+        return {"rows": shard_rows(frame), "partial": not complete}
+    return JSONResponse(content=await run_scoring("search", ranked, deadline=deadline))
+
+@app.get("/shard/vector")
+async def shard_vector(course_id: int = Query(...)):
+    """Embedding and cluster id of a course this shard owns"""
+    position = course_store.position(course_id) if course_store is not None else None
+    if position is None:
+        raise HTTPException(status_code=404, detail=f"Course {course_id} not found")
+    canonical = courses_df.at[position, 'canonical_id'] if 'canonical_id' in courses_df.columns else course_id
+    vector = None if not has_embedding(position) else np.asarray(course_embeddings[position], dtype=np.float32).tolist()
+    return JSONResponse(content={"vector": vector, "canonical_id": int(canonical)})
+
+@app.post("/shard/similar")
+async def shard_similar(payload: dict = Body(...)):
+    """This shard's most similar courses to a query vector"""
+    if course_embeddings is None or courses_df is None or courses_df.empty:
+        return JSONResponse(content={"rows": []})
+    limit = min(int(payload.get("limit", 10)), 50)
+    vector = np.asarray(payload["vector"], dtype=np.float32)
+    exclude_id = payload.get("exclude_id")
+    exclude_idx = course_store.position(int(exclude_id)) if exclude_id is not None else None
+    deadline = request_deadline(payload.get("budget_ms"))
+    def ranked():
+        frame, complete = similar_frame(exclude_idx, limit, vector=vector,
+                                        exclude_canonical=payload.get("exclude_canonical"), deadline=deadline)
+        return {"rows": shard_rows(frame), "partial": not complete}
+    return JSONResponse(content=await run_scoring("recommendations", ranked, deadline=deadline))
+
+@app.post("/shard/events")
+async def shard_events(batch: EventBatch):
+    """Interaction events for this shard's courses, routed here by a coordinator"""
+    return JSONResponse(content=record_events(batch.events))
+
+@app.get("/shard/listing")
+async def shard_listing(
+    kind: str = Query(...),
+    limit: int = Query(10, ge=1, le=50),
+    category: Optional[str] = Query(None),
+    min_reviews: Optional[int] = Query(None, ge=0)
+):
+    """Trending or top-rated rows of this shard, scored by the listing's sort key"""
+    if kind not in LISTINGS:
+        raise HTTPException(status_code=404, detail=f"Unknown listing {kind}")
+    if courses_df is None or courses_df.empty:
+        return JSONResponse(content={"rows": []})
+    frame_fn, key = LISTINGS[kind]
+    # Only top-rated takes options; the coordinator sends none for trending
+    options = {name: value for name, value in (("category", category), ("min_reviews", min_reviews))
+               if value is not None}
+    rows = await run_scoring("listing", lambda: shard_rows(frame_fn(limit, **options), score_column=key))
+    return JSONResponse(content={"rows": rows})
+
+@app.get("/shard/courses")
+async def shard_courses(
+    sort: str = Query("subscribers"),
+    category: Optional[str] = Query(None),
+    level: Optional[str] = Query(None),
+    language: Optional[str] = Query(None),
+    free: Optional[bool] = Query(None),
+    limit: int = Query(SEARCH_LIMIT, ge=1, le=SHARD_SEARCH_DEPTH)
+):
+    """This shard's first `limit` rows of a /courses listing, scored by the sort key"""
+    sort = parse_sort(sort, SORT_KEYS, "subscribers")
+    if courses_df is None or courses_df.empty:
+        return JSONResponse(content={"rows": []})
+    filters = {"category": category, "level": level, "language": language, "free": free}
+    def rows():
+        return shard_rows(scored_frame(listing_positions(sort, listing_filter(**filters), limit), sort))
+    return JSONResponse(content={"rows": await run_scoring("listing", rows)})
+
 @app.get("/external/udemy-rapid/search")
 async def udemy_rapid_search(
     query: str = Query(..., min_length=1),
@@ -680,203 +1726,141 @@ async def udemy_rapid_search(
 ):
     """Search Udemy via RapidAPI and normalize results to CourseScout shape"""
     try:
-        RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
-        RAPIDAPI_HOST = os.getenv("RAPIDAPI_HOST", "udemy-paid-courses-for-free-api.p.rapidapi.com")
-        if not RAPIDAPI_KEY:
+        if not config.RAPIDAPI_KEY:
             logger.warning("RAPIDAPI_KEY not configured")
             return JSONResponse(content=[])
+        if not upstream_client:
+            return JSONResponse(content=[])
 
-        url = "https://udemy-paid-courses-for-free-api.p.rapidapi.com/rapidapi/courses/search"
-        headers = {
-            "X-RapidAPI-Key": RAPIDAPI_KEY,
-            "X-RapidAPI-Host": RAPIDAPI_HOST,
-            "Accept": "application/json"
-        }
-        params = {"page": str(page), "page_size": str(page_size), "query": query}
-
-        client = session_pool
-        close_after = False
-        if not client:
-            timeout = aiohttp.ClientTimeout(total=15)
-            client = aiohttp.ClientSession(timeout=timeout)
-            close_after = True
+        provider = RapidAPIProvider(upstream_client, config.RAPIDAPI_BASE_URL, config.RAPIDAPI_KEY,
+                                    config.RAPIDAPI_HOST)
         try:
-            async with client.get(url, headers=headers, params=params) as resp:
-                if resp.status != 200:
-                    logger.warning(f"RapidAPI upstream status {resp.status}")
-                    return JSONResponse(content=[])
-                data = await resp.json()
-                items = data.get("results") or data.get("data") or []
-                results = []
-                for item in items:
-                    try:
-                        img = item.get("image") or item.get("image_480x270") or item.get("thumbnail") or ""
-                        instructors = item.get("instructors") or item.get("authors") or []
-                        if isinstance(instructors, list):
-                            instructor_list = [{"name": (i.get("name") or i.get("title") or "")} for i in instructors]
-                        else:
-                            instructor_list = [{"name": str(instructors)}]
-                        cid = item.get("id") or item.get("course_id") or abs(hash(item.get("url") or item.get("title", "")))
-                        results.append({
-                            "id": cid,
-                            "title": item.get("title", ""),
-                            "url": item.get("url", ""),
-                            "price": item.get("price") or ("Free" if not item.get("is_paid", True) else "Paid"),
-                            "is_paid": bool(item.get("is_paid", True)),
-                            "visible_instructors": instructor_list,
-                            "image_480x270": img,
-                            "avg_rating": float(item.get("rating") or item.get("avg_rating") or 0) or 0.0,
-                            "rating": float(item.get("rating") or item.get("avg_rating") or 0) or 0.0,
-                            "num_subscribers": int(item.get("num_subscribers") or item.get("students") or 0),
-                            "num_reviews": int(item.get("num_reviews") or 0),
-                            "instructional_level": item.get("level") or item.get("instructional_level") or "All Levels",
-                            "headline": item.get("headline") or item.get("short_description") or "",
-                            "description": item.get("description") or "",
-                            "primary_category": {"name": item.get("category") or ""}
-                        })
-                    except Exception:
-                        continue
-                return JSONResponse(content=results)
-        finally:
-            if close_after:
-                await client.close()
+            results = await provider.fetch(query, page_size, None, page=page)
+        except UpstreamError as e:
+            logger.warning(f"RapidAPI upstream failed: {e}")
+            return JSONResponse(content=[])
+        return JSONResponse(content=results)
     except Exception as e:
         logger.exception(f"Error in /external/udemy-rapid/search: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.get("/trending")
 async def get_trending_courses(
-    limit: int = Query(10, ge=1, le=50)
+    request: Request,
+    limit: int = Query(10, ge=1, le=50),
+    fields: Optional[str] = Query(None, description="Payload profile (card, detail, full) or comma-separated fields")
 ):
-    """Get trending courses based on subscriber count"""
+    """Get trending courses: most interacted with recently, then by subscriber count"""
     try:
-        # Check cache first
-        cache_key = f"trending_{limit}"
-        cached_result = get_cached_response(cache_key)
-        if cached_result is not None:
-            headers = {"Cache-Control": "public, max-age=60"}
-            return JSONResponse(content=cached_result, headers=headers)
+        # Check cache first; the leaders are part of the validator, so new interactions change the ETag
+        selected = parse_fields(fields)
+        leaders = trending_leaders(limit) if courses_df is not None else None
+        live = tuple(leaders[0].tolist()) if leaders is not None else ()
+        version = snapshot_version("trending", limit, selected, live)
+        # The snapshot's build time says nothing about when the interaction ranking last moved
+        last_modified = None if live else snapshot_modified()
+        unchanged = response_cache.conditional(request.headers, version, last_modified, LISTING_HEADERS)
+        if unchanged is not None:
+            return unchanged
+        
+        cache_key = f"trending_{limit}_{','.join(selected)}_{version or ''}"
+        accept_encoding = request.headers.get("accept-encoding")
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return response_cache.respond(cached, accept_encoding, LISTING_HEADERS)
         
         logger.info("Fetching trending courses")
         
-        if courses_df is None or courses_df.empty:
+        if shard_coordinator is not None:
+            results = select_fields(await shard_coordinator.listing("trending", limit), selected)
+        elif courses_df is None or courses_df.empty:
             logger.error("No course data available")
             return JSONResponse(content=[])
-        
-        # Sort by subscriber count (trending indicator)
-        trending = courses_df.nlargest(limit, 'num_subscribers').copy()
-        
-        # Format results for frontend
-        results = []
-        for _, row in trending.iterrows():
-            course_dict = row.to_dict()
-            # Convert numpy types to Python types
-            for key, value in course_dict.items():
-                if isinstance(value, (np.integer, np.floating)):
-                    course_dict[key] = value.item()
-                elif pd.isna(value):
-                    course_dict[key] = None
-            
-            # Format for frontend
-            formatted_course = {
-                "id": course_dict["id"],
-                "title": course_dict["title"],
-                "visible_instructors": [{"name": course_dict["instructor"]}],
-                "image_480x270": course_dict.get("image_url", ""),
-                "price": course_dict["price"],
-                "is_paid": course_dict["is_paid"],
-                "avg_rating": course_dict["rating"],
-                "rating": course_dict["rating"],
-                "num_subscribers": course_dict["num_subscribers"],
-                "num_reviews": course_dict["num_reviews"],
-                "instructional_level": course_dict["level"],
-                "headline": course_dict.get("headline", ""),
-                "description": course_dict["description"],
-                "primary_category": {"name": course_dict["category"]},
-                "url": course_dict.get("url", "")
-            }
-            results.append(formatted_course)
+        else:
+            results = await run_scoring("listing", rank_trending, limit, selected, leaders)
         
         logger.info(f"Found {len(results)} trending courses")
         
-        # Cache the results
-        set_cached_response(cache_key, results)
+        # Cache the encoded results and warm their thumbnails before the browser asks for them
+        entry = response_cache.set(cache_key, results, version, last_modified)
+        prefetch_thumbnails(results)
         
-        headers = {"Cache-Control": "public, max-age=60"}
-        return JSONResponse(content=results, headers=headers)
+        return response_cache.respond(entry, accept_encoding, LISTING_HEADERS)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error in /trending endpoint: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
 
+def record_events(events: List[InteractionEvent]) -> Dict[str, int]:
+    """Count events for known courses towards /trending; unknown ids are rejected"""
+    if trending_tracker is None or course_store is None:
+        raise HTTPException(status_code=503, detail="Trending counters are not enabled")
+    ids = np.fromiter((event.course_id for event in events), dtype=np.int64, count=len(events))
+    known = course_store.positions(ids) >= 0
+    kinds = [event.type for event, ok in zip(events, known.tolist()) if ok]
+    accepted = trending_tracker.record(ids[known], kinds)
+    return {"accepted": accepted, "rejected": len(events) - accepted}
+
+@app.post("/events", status_code=202)
+async def post_events(batch: EventBatch):
+    """Record course impressions, clicks and watchlist adds from the frontend (batched)"""
+    if len(batch.events) > config.TRENDING_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {config.TRENDING_MAX_BATCH} events per request")
+    if shard_coordinator is not None:
+        accepted = await shard_coordinator.events([event.model_dump() for event in batch.events])
+        counts = {"accepted": accepted, "rejected": len(batch.events) - accepted}
+    else:
+        counts = record_events(batch.events)
+    return JSONResponse(status_code=202, content=counts)
+
 @app.get("/top-rated")
 async def get_top_rated_courses(
-    limit: int = Query(10, ge=1, le=50)
+    request: Request,
+    limit: int = Query(10, ge=1, le=50),
+    category: Optional[str] = Query(None, description="Rank within one category"),
+    min_reviews: int = Query(TOP_RATED_MIN_REVIEWS, ge=0),
+    fields: Optional[str] = Query(None, description="Payload profile (card, detail, full) or comma-separated fields")
 ):
-    """Get top rated courses based on rating"""
+    """Get top rated courses by Bayesian average rating"""
     try:
         # Check cache first
-        cache_key = f"top_rated_{limit}"
-        cached_result = get_cached_response(cache_key)
-        if cached_result is not None:
-            headers = {"Cache-Control": "public, max-age=60"}
-            return JSONResponse(content=cached_result, headers=headers)
+        selected = parse_fields(fields)
+        category = category.strip() if category and category.strip() else None
+        version, last_modified = (snapshot_version("top-rated", limit, category, min_reviews, selected),
+                                  snapshot_modified())
+        unchanged = response_cache.conditional(request.headers, version, last_modified, LISTING_HEADERS)
+        if unchanged is not None:
+            return unchanged
+        
+        cache_key = f"top_rated_{limit}_{(category or '').lower()}_{min_reviews}_{','.join(selected)}"
+        accept_encoding = request.headers.get("accept-encoding")
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return response_cache.respond(cached, accept_encoding, LISTING_HEADERS)
         
         logger.info("Fetching top rated courses")
         
-        if courses_df is None or courses_df.empty:
+        if shard_coordinator is not None:
+            options = {"min_reviews": min_reviews, **({"category": category} if category else {})}
+            results = select_fields(await shard_coordinator.listing("top-rated", limit, options), selected)
+        elif courses_df is None or courses_df.empty:
             logger.error("No course data available")
             return JSONResponse(content=[])
-        
-        # Filter courses with decent number of reviews and sort by rating
-        top_rated = courses_df[
-            (courses_df['rating'] >= 4.0) & 
-            (courses_df['num_reviews'] >= 10)
-        ].nlargest(limit, 'rating').copy()
-        
-        # If not enough highly rated courses, fallback to all courses sorted by rating
-        if len(top_rated) < limit:
-            top_rated = courses_df.nlargest(limit, 'rating').copy()
-        
-        # Format results for frontend
-        results = []
-        for _, row in top_rated.iterrows():
-            course_dict = row.to_dict()
-            # Convert numpy types to Python types
-            for key, value in course_dict.items():
-                if isinstance(value, (np.integer, np.floating)):
-                    course_dict[key] = value.item()
-                elif pd.isna(value):
-                    course_dict[key] = None
-            
-            # Format for frontend
-            formatted_course = {
-                "id": course_dict["id"],
-                "title": course_dict["title"],
-                "visible_instructors": [{"name": course_dict["instructor"]}],
-                "image_480x270": course_dict.get("image_url", ""),
-                "price": course_dict["price"],
-                "is_paid": course_dict["is_paid"],
-                "avg_rating": course_dict["rating"],
-                "rating": course_dict["rating"],
-                "num_subscribers": course_dict["num_subscribers"],
-                "num_reviews": course_dict["num_reviews"],
-                "instructional_level": course_dict["level"],
-                "headline": course_dict.get("headline", ""),
-                "description": course_dict["description"],
-                "primary_category": {"name": course_dict["category"]},
-                "url": course_dict.get("url", "")
-            }
-            results.append(formatted_course)
+        else:
+            results = await run_scoring("listing", rank_top_rated, limit, selected, category, min_reviews)
         
         logger.info(f"Found {len(results)} top-rated courses")
         
-        # Cache the results
-        set_cached_response(cache_key, results)
+        # Cache the encoded results and warm their thumbnails before the browser asks for them
+        entry = response_cache.set(cache_key, results, version, last_modified)
+        prefetch_thumbnails(results)
         
-        headers = {"Cache-Control": "public, max-age=60"}
-        return JSONResponse(content=results, headers=headers)
+        return response_cache.respond(entry, accept_encoding, LISTING_HEADERS)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error in /top-rated endpoint: {e}")
         return JSONResponse(status_code=500, content={"error": str(e)})
@@ -937,9 +1921,18 @@ async def recommend_for_user(payload: dict = Body(...)):
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 @app.get("/categories")
-async def get_categories():
+async def get_categories(request: Request):
     """Get available course categories"""
     try:
+        version, last_modified = snapshot_version("categories"), snapshot_modified()
+        unchanged = response_cache.conditional(request.headers, version, last_modified, LISTING_HEADERS)
+        if unchanged is not None:
+            return unchanged
+        accept_encoding = request.headers.get("accept-encoding")
+        cached = response_cache.get("categories")
+        if cached is not None:
+            return response_cache.respond(cached, accept_encoding, LISTING_HEADERS)
+        
         # Return common programming and tech categories
         categories = [
             {"id": "programming", "name": "Programming", "icon": "code"},
@@ -954,7 +1947,8 @@ async def get_categories():
             {"id": "databases", "name": "Databases", "icon": "database"}
         ]
         
-        return JSONResponse(content=categories)
+        entry = response_cache.set("categories", categories, version, last_modified)
+        return response_cache.respond(entry, accept_encoding, LISTING_HEADERS)
         
     except Exception as e:
         logger.exception(f"Error in /categories endpoint: {e}")
@@ -9,10 +9,25 @@ from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import re
 import logging
+import os
+import time
+import sys
+import argparse
+from build_manifest import MANIFEST_FILE, BuildManifest
+from course_store import DEFAULT_CHUNK_ROWS, DEFAULT_COMPRESSION, read_artifact, write_artifact
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# TF-IDF settings; part of the embed stage's cache key
+EMBEDDING_PARAMS = {
+    'max_features': 5000,
+    'stop_words': 'english',
+    'ngram_range': (1, 2),  # Include bigrams
+    'min_df': 2,  # Ignore very rare terms
+    'max_df': 0.8  # Ignore very common terms
+}
+
 def clean_text(text):
     """Clean and normalize text data"""
     if pd.isna(text):
@@ -40,7 +55,7 @@ def estimate_duration_from_curriculum(curriculum):
     else:
         return "50+ hours"
 
-def process_udemy_data(input_file, output_file):
+def process_udemy_data(input_file):
     """Process Udemy dataset into CourseMate format"""
     logger.info(f"Loading Udemy dataset from {input_file}")
     
@@ -87,15 +102,6 @@ def process_udemy_data(input_file, output_file):
     processed_df['num_subscribers'] = processed_df['num_subscribers'].fillna(0)
     processed_df['category'] = processed_df['category'].fillna('General')
     
-    # Save as feather for fast loading (binary format)
-    feather_file = output_file.replace('.csv', '.feather')
-    processed_df.to_feather(feather_file)
-    logger.info(f"Saved processed data as feather: {feather_file}")
-    
-    # Also save as CSV for inspection
-    processed_df.to_csv(output_file, index=False)
-    logger.info(f"Saved processed data as CSV: {output_file}")
-    
     return processed_df
 
 def create_course_embeddings(df, embeddings_file):
@@ -109,13 +115,7 @@ def create_course_embeddings(df, embeddings_file):
         text_features.append(combined_text)
     
     # Create TF-IDF vectors
-    vectorizer = TfidfVectorizer(
-        max_features=5000,
-        stop_words='english',
-        ngram_range=(1, 2),  # Include bigrams
-        min_df=2,  # Ignore very rare terms
-        max_df=0.8  # Ignore very common terms
-    )
+    vectorizer = TfidfVectorizer(**EMBEDDING_PARAMS)
     
     tfidf_matrix = vectorizer.fit_transform(text_features)
     logger.info(f"Created TF-IDF matrix with shape: {tfidf_matrix.shape}")
@@ -134,22 +134,241 @@ def create_course_embeddings(df, embeddings_file):
     
     return embeddings
 
+# MinHash/LSH near-duplicate detection; part of the dedupe stage's cache key
+DEDUPE_PARAMS = {
+    'shingle_chars': 5,
+    'num_perm': 64,
+    'bands': 8,  # 8 bands x 8 rows: candidate threshold ~0.77 Jaccard
+    'threshold': 0.8,  # estimated Jaccard needed to merge a candidate pair
+    'seed': 1,
+    'chunk_shingles': 100000  # bounds the (num_perm x chunk) hash matrix to ~50 MB
+}
+MERSENNE_PRIME = (1 << 31) - 1
+# The full 98K catalogue runs in ~10 s; the stage warns when it drifts past this
+DEDUPE_BUDGET = {'seconds': 120, 'peak_rss_mb': 2048}
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1e6 if sys.platform == 'darwin' else 1e3), 1)
+
+def dedupe_text(row):
+    """Text used to detect re-uploads: title + headline with digits/punctuation removed"""
+    text = f"{row.get('title', '')} {row.get('headline', '')}".lower()
+    return re.sub(r'\s+', ' ', re.sub(r'[^a-z]+', ' ', text)).strip()
+
+def shingle_codes(texts, k):
+    """Exact base-27 codes of every character k-gram, grouped by document.
+
+    Texts contain only a-z and spaces (see dedupe_text), so a k-gram maps to
+    an integer below 27**k without hashing. Returns (codes, doc_index, offsets)
+    where codes[offsets[j]:offsets[j+1]] belong to texts[doc_index[j]].
+    Repeated grams are kept: they do not change a MinHash minimum.
+    """
+    docs = [i for i, t in enumerate(texts) if t]
+    if not docs:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    padded = [texts[i].ljust(k) for i in docs]
+    lengths = np.fromiter((len(t) for t in padded), dtype=np.int64, count=len(padded))
+    chars = np.frombuffer(''.join(padded).encode('ascii'), dtype=np.uint8).astype(np.uint64)
+    chars = np.where(chars == ord(' '), 0, chars - ord('a') + 1)
+
+    powers = (27 ** np.arange(k - 1, -1, -1)).astype(np.uint64)
+    codes = np.lib.stride_tricks.sliding_window_view(chars, k) @ powers
+
+    # Keep only grams that start and end inside the same document
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    grams_per_doc = lengths - k + 1
+    keep = np.concatenate([np.arange(s, s + g) for s, g in zip(starts, grams_per_doc)])
+    offsets = np.concatenate(([0], np.cumsum(grams_per_doc)[:-1]))
+    return codes[keep], np.array(docs, dtype=np.int64), offsets
+
+def minhash_signatures(texts, params):
+    """MinHash signature matrix (n x num_perm), computed in bounded-size chunks"""
+    num_perm = params['num_perm']
+    k = params['shingle_chars']
+    rng = np.random.default_rng(params['seed'])
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+    signatures = np.full((len(texts), num_perm), MERSENNE_PRIME, dtype=np.uint32)
+
+    # Roughly one gram per character, so chunk by character budget
+    lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+    bounds = np.searchsorted(np.cumsum(lengths), np.arange(params['chunk_shingles'], lengths.sum() + 1,
+                                                           params['chunk_shingles']))
+    edges = np.unique(np.concatenate(([0], bounds + 1, [len(texts)])).clip(0, len(texts)))
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        codes, docs, offsets = shingle_codes(texts[lo:hi], k)
+        if not len(docs):
+            continue
+        # (a*x + b) mod p with x < 27**k and a < 2**31 stays inside uint64
+        hashed = (a * (codes % MERSENNE_PRIME)[None, :] + b) % MERSENNE_PRIME
+        signatures[lo + docs] = np.minimum.reduceat(hashed, offsets, axis=1).T.astype(np.uint32)
+    return signatures
+
+def lsh_clusters(signatures, params):
+    """Union-find clusters of near-duplicates from banded LSH buckets"""
+    n, num_perm = signatures.shape
+    rows = num_perm // params['bands']
+    parent = np.arange(n)
+
+    def find(i):
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    # Docs without shingles keep the sentinel signature and must not collide
+    empty = (signatures == MERSENNE_PRIME).all(axis=1)
+    for band in range(params['bands']):
+        block = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        keys = block.view(np.dtype((np.void, block.dtype.itemsize * rows))).ravel()
+        order = np.argsort(keys, kind='stable')
+        same = keys[order[1:]] == keys[order[:-1]]
+        left, right = order[:-1][same], order[1:][same]
+        keep = ~(empty[left] | empty[right])
+        left, right = left[keep], right[keep]
+        # Verify candidates on the full signature before merging
+        agreement = (signatures[left] == signatures[right]).mean(axis=1)
+        for i, j in zip(left[agreement >= params['threshold']], right[agreement >= params['threshold']]):
+            ri, rj = find(int(i)), find(int(j))
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(n)])
+
+def find_near_duplicates(df, params=DEDUPE_PARAMS):
+    """Canonical course id per row: the most-subscribed member of its near-duplicate cluster"""
+    texts = [dedupe_text(row) for row in df[['title', 'headline']].to_dict(orient='records')]
+    signatures = minhash_signatures(texts, params)
+    roots = lsh_clusters(signatures, params)
+
+    # Most subscribers wins; ties go to the lowest id
+    ranked = pd.DataFrame({'root': roots, 'id': df['id'].to_numpy(),
+                           'subs': df['num_subscribers'].to_numpy()})
+    ranked = ranked.sort_values(['root', 'subs', 'id'], ascending=[True, False, True])
+    canonical = ranked.groupby('root')['id'].first()
+    return canonical.reindex(roots).to_numpy().astype(np.int64)
+
+def stage_clean(manifest, input_file, clean_file, force=False):
+    """Stage 1: raw Udemy CSV -> cleaned course artifact"""
+    inputs = {'raw_csv': input_file}
+    params = {'compression': DEFAULT_COMPRESSION, 'chunk_rows': DEFAULT_CHUNK_ROWS}
+    if not force and manifest.stage_is_current('clean', inputs, params, [clean_file]):
+        logger.info(f"[clean] up to date, reusing {clean_file}")
+        return
+    df = process_udemy_data(input_file)
+    write_artifact(df, clean_file)
+    logger.info(f"Saved cleaned data as feather ({DEFAULT_COMPRESSION}): {clean_file}")
+    manifest.record_stage('clean', inputs, params, [clean_file])
+    manifest.save()
+
+def stage_dedupe(manifest, clean_file, canonical_file, force=False):
+    """Stage 2: MinHash/LSH near-duplicate clusters -> canonical id per course"""
+    inputs = {'courses': clean_file}
+    if not force and manifest.stage_is_current('dedupe', inputs, DEDUPE_PARAMS, [canonical_file]):
+        logger.info(f"[dedupe] up to date, reusing {canonical_file}")
+        return
+    df = read_artifact(clean_file, columns=['id', 'title', 'headline', 'num_subscribers'])
+    started = time.perf_counter()
+    canonical = find_near_duplicates(df)
+    elapsed = time.perf_counter() - started
+    np.save(canonical_file, canonical)
+    stats = {
+        'courses': int(len(df)),
+        'duplicates': int((canonical != df['id'].to_numpy()).sum()),
+        'clusters_with_duplicates': int(pd.Series(canonical[canonical != df['id'].to_numpy()]).nunique()),
+        'seconds': round(elapsed, 2),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    logger.info(f"[dedupe] {stats['duplicates']} near-duplicates in {stats['clusters_with_duplicates']} clusters "
+                f"({stats['courses']} courses, {stats['seconds']}s, peak RSS {stats['peak_rss_mb']} MB)")
+    if elapsed > DEDUPE_BUDGET['seconds'] or (stats['peak_rss_mb'] or 0) > DEDUPE_BUDGET['peak_rss_mb']:
+        logger.warning(f"[dedupe] exceeded budget {DEDUPE_BUDGET}; lower chunk_shingles or num_perm")
+    manifest.record_stage('dedupe', inputs, DEDUPE_PARAMS, [canonical_file], stats=stats)
+    manifest.save()
+
+def stage_assemble(manifest, clean_file, canonical_file, feather_file, force=False):
+    """Stage 3: cleaned artifact + derived columns -> served course artifact"""
+    inputs = {'courses': clean_file, 'canonical_id': canonical_file}
+    params = {'compression': DEFAULT_COMPRESSION, 'chunk_rows': DEFAULT_CHUNK_ROWS}
+    if not force and manifest.stage_is_current('assemble', inputs, params, [feather_file]):
+        logger.info(f"[assemble] up to date, reusing {feather_file}")
+        return
+    df = read_artifact(clean_file)
+    df['canonical_id'] = np.load(canonical_file)
+    write_artifact(df, feather_file)
+    logger.info(f"Saved processed data as feather ({DEFAULT_COMPRESSION}): {feather_file}")
+    manifest.record_stage('assemble', inputs, params, [feather_file])
+    manifest.save()
+
+def stage_embed(manifest, feather_file, embeddings_file, force=False):
+    """Stage 4: course artifact -> TF-IDF embeddings and fitted vectorizer"""
+    vectorizer_file = embeddings_file.replace('.npy', '_vectorizer.pkl')
+    inputs = {'courses': feather_file}
+    params = dict(EMBEDDING_PARAMS, dtype='float16')
+    if not force and manifest.stage_is_current('embed', inputs, params, [embeddings_file, vectorizer_file]):
+        logger.info(f"[embed] up to date, reusing {embeddings_file}")
+        return
+    create_course_embeddings(read_artifact(feather_file), embeddings_file)
+    manifest.record_stage('embed', inputs, params, [embeddings_file, vectorizer_file])
+    manifest.save()
+
+def stage_export(manifest, feather_file, csv_file, force=False):
+    """Stage 5: course artifact -> CSV for inspection"""
+    inputs = {'courses': feather_file}
+    if not force and manifest.stage_is_current('export', inputs, {}, [csv_file]):
+        logger.info(f"[export] up to date, reusing {csv_file}")
+        return
+    read_artifact(feather_file).to_csv(csv_file, index=False)
+    logger.info(f"Saved processed data as CSV: {csv_file}")
+    manifest.record_stage('export', inputs, {}, [csv_file])
+    manifest.save()
+
+STAGES = ('clean', 'dedupe', 'assemble', 'embed', 'export')
+
 def main():
     """Main processing function"""
-    input_file = r"C:\Users\AjayM.AJAYS_DEVICE\OneDrive\Desktop\dataest\udemy_courses.csv"
+    parser = argparse.ArgumentParser(description="Build CourseMate data artifacts")
+    parser.add_argument('input_file', nargs='?',
+                        default=os.getenv('RAW_COURSES_CSV', r"C:\Users\AjayM.AJAYS_DEVICE\OneDrive\Desktop\dataest\udemy_courses.csv"))
+    parser.add_argument('--force', nargs='*', choices=STAGES, default=None,
+                        help="Re-run these stages (all stages when given without names)")
+    args = parser.parse_args()
+    forced = set(STAGES) if args.force == [] else set(args.force or ())
+
     output_file = "courses_data.csv"
+    clean_file = "courses_data.clean.feather"
+    canonical_file = "course_canonical_ids.npy"
+    feather_file = "courses_data.feather"
     embeddings_file = "course_embeddings_float16.npy"
+    manifest = BuildManifest(MANIFEST_FILE)
     
-    # Process the dataset
-    df = process_udemy_data(input_file, output_file)
+    # Each stage is skipped when its inputs, parameters and outputs match the manifest
+    stage_clean(manifest, args.input_file, clean_file, force='clean' in forced)
+    stage_dedupe(manifest, clean_file, canonical_file, force='dedupe' in forced)
+    stage_assemble(manifest, clean_file, canonical_file, feather_file, force='assemble' in forced)
+    # Embeddings only depend on the cleaned text, so dedupe tuning never re-embeds
+    stage_embed(manifest, clean_file, embeddings_file, force='embed' in forced)
+    stage_export(manifest, feather_file, output_file, force='export' in forced)
     
-    # Create embeddings for similarity search
-    embeddings = create_course_embeddings(df, embeddings_file)
+    # Frame and embeddings served together share a build id (the frame's checksum)
+    build_id = manifest.checksum(feather_file)[:16]
+    manifest.record_artifacts(build_id, [feather_file, embeddings_file])
+    manifest.save()
     
+    df = read_artifact(feather_file)
     logger.info("Data processing completed successfully!")
+    logger.info(f"Build id: {build_id}")
     logger.info(f"Final dataset shape: {df.shape}")
     logger.info(f"Sample courses:")
     print("\n" + df[['title', 'instructor', 'category', 'rating', 'price']].head().to_string())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,323 @@
+"""
+Course Providers for CourseMate
+Adapters that search one catalogue (the local index, Udemy, RapidAPI,
+Coursera, edX) and normalise its results to the frontend course shape,
+plus the federated search that fans a query out to all of them under a
+deadline and merge-ranks whatever came back in time
+"""
+
+import re
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlparse
+
+from scoring import Deadline
+from upstream import UpstreamClient, UpstreamError
+
+logger = logging.getLogger(__name__)
+
+# Course fields requested from the Udemy Affiliate API
+UDEMY_COURSE_FIELDS = ("@default,visible_instructors,image_480x270,estimated_content_length,num_subscribers,"
+                       "avg_rating_recent,content_info_short,objectives_summary")
+
+# Reciprocal rank fusion constant: damps the advantage of the very top ranks
+RRF_K = 60
+
+
+def _number(value, cast=float, default=0):
+    try:
+        return cast(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def course_shape(**fields) -> Dict[str, Any]:
+    """A course dict with every key the frontend reads, defaults filled in"""
+    course = {
+        "id": None,
+        "title": "",
+        "url": "",
+        "price": "",
+        "is_paid": False,
+        "visible_instructors": [],
+        "image_480x270": "",
+        "avg_rating": 0.0,
+        "rating": 0.0,
+        "num_subscribers": 0,
+        "num_reviews": 0,
+        "instructional_level": "All Levels",
+        "headline": "",
+        "description": "",
+        "primary_category": {"name": ""},
+    }
+    course.update(fields)
+    course["rating"] = course["avg_rating"]
+    return course
+
+
+def normalize_rapid_item(item: dict) -> dict:
+    """RapidAPI Udemy search item -> course dict"""
+    instructors = item.get("instructors") or item.get("authors") or []
+    if isinstance(instructors, list):
+        instructor_list = [{"name": (i.get("name") or i.get("title") or "")} for i in instructors]
+    else:
+        instructor_list = [{"name": str(instructors)}]
+    return course_shape(
+        # No fallback id: catalogue sync derives a stable one from the url or title (hash() changes per run)
+        id=item.get("id") or item.get("course_id"),
+        title=item.get("title", ""),
+        url=item.get("url", ""),
+        price=item.get("price") or ("Free" if not item.get("is_paid", True) else "Paid"),
+        is_paid=bool(item.get("is_paid", True)),
+        visible_instructors=instructor_list,
+        image_480x270=item.get("image") or item.get("image_480x270") or item.get("thumbnail") or "",
+        avg_rating=_number(item.get("rating") or item.get("avg_rating")),
+        num_subscribers=_number(item.get("num_subscribers") or item.get("students"), int),
+        num_reviews=_number(item.get("num_reviews"), int),
+        instructional_level=item.get("level") or item.get("instructional_level") or "All Levels",
+        headline=item.get("headline") or item.get("short_description") or "",
+        description=item.get("description") or "",
+        primary_category={"name": item.get("category") or ""},
+    )
+
+
+# ===========================================
+# ADAPTERS
+# ===========================================
+
+class Provider:
+    """One searchable catalogue; subclasses implement fetch()"""
+
+    name = "provider"
+    url = ""
+
+    def __init__(self, timeout: float = 1.2):
+        self.timeout = timeout
+        # Bulk consumers (catalogue sync) turn this off so they don't evict request-path entries
+        self.use_cache = True
+
+    async def fetch(self, query: str, limit: int, deadline: Optional[Deadline], page: int = 1) -> List[dict]:
+        """Page `page` (1-based) of `limit` results for a query"""
+        raise NotImplementedError
+
+    async def search(self, query: str, limit: int, deadline: Deadline) -> List[dict]:
+        rows = await self.fetch(query, limit, deadline)
+        return [dict(row, source=self.name) for row in rows[:limit] if row.get("title")]
+
+
+class LocalProvider(Provider):
+    """The local course index (or the shard coordinator in front of it)"""
+
+    name = "local"
+
+    def __init__(self, search_fn: Callable[[str, int, Deadline], Awaitable[List[dict]]], timeout: float = 1.2):
+        super().__init__(timeout)
+        self.search_fn = search_fn
+
+    async def fetch(self, query, limit, deadline, page=1):
+        return await self.search_fn(query, limit, deadline)
+
+
+class UdemyProvider(Provider):
+    """Udemy Affiliate API /courses/ search"""
+
+    name = "udemy"
+
+    def __init__(self, client: UpstreamClient, base_url: str, api_key: str,
+                 format_fn: Callable[[dict], dict], link_base: str, timeout: float = 1.2):
+        super().__init__(timeout)
+        self.client = client
+        self.url = f"{base_url.rstrip('/')}/courses/"
+        self.headers = {"Authorization": f"Basic {api_key}", "Accept": "application/json"}
+        self.format_fn = format_fn
+        self.link_base = link_base
+
+    async def fetch(self, query, limit, deadline, page=1):
+        params = {"search": query, "page": page, "page_size": limit, "fields[course]": UDEMY_COURSE_FIELDS}
+        data = await self.client.get_json(self.url, params=params, headers=self.headers, use_cache=self.use_cache)
+        rows = []
+        for item in data.get("results", []):
+            course = self.format_fn(item)
+            if course:
+                course["url"] = urljoin(self.link_base, course.get("url") or "")
+                rows.append(course)
+        return rows
+
+
+class RapidAPIProvider(Provider):
+    """Udemy search through a RapidAPI listing"""
+
+    name = "rapidapi"
+
+    def __init__(self, client: UpstreamClient, base_url: str, api_key: str, host: str, timeout: float = 1.2):
+        super().__init__(timeout)
+        self.client = client
+        self.url = f"{base_url.rstrip('/')}/rapidapi/courses/search"
+        self.headers = {"X-RapidAPI-Key": api_key, "X-RapidAPI-Host": host, "Accept": "application/json"}
+
+    async def fetch(self, query, limit, deadline, page=1):
+        params = {"page": str(page), "page_size": str(limit), "query": query}
+        data = await self.client.get_json(self.url, params=params, headers=self.headers, use_cache=self.use_cache)
+        rows = []
+        for item in data.get("results") or data.get("data") or []:
+            try:
+                rows.append(normalize_rapid_item(item))
+            except Exception:
+                continue
+        return rows
+
+
+class CourseraProvider(Provider):
+    """Coursera catalog API (courses.v1 search)"""
+
+    name = "coursera"
+    FIELDS = "name,slug,description,photoUrl,workload,partnerIds,instructorIds,domainTypes"
+
+    def __init__(self, client: UpstreamClient, base_url: str, timeout: float = 1.2,
+                 link_base: str = "https://www.coursera.org/learn/"):
+        super().__init__(timeout)
+        self.client = client
+        self.url = f"{base_url.rstrip('/')}/courses.v1"
+        self.link_base = link_base
+
+    async def fetch(self, query, limit, deadline, page=1):
+        params = {"q": "search", "query": query, "start": (page - 1) * limit, "limit": limit,
+                  "fields": self.FIELDS}
+        data = await self.client.get_json(self.url, params=params, use_cache=self.use_cache)
+        rows = []
+        for item in data.get("elements", []):
+            domains = item.get("domainTypes") or [{}]
+            rows.append(course_shape(
+                id=item.get("id"),
+                title=item.get("name", ""),
+                url=self.link_base + item.get("slug", "") if item.get("slug") else "",
+                price="Free to audit",
+                image_480x270=item.get("photoUrl", ""),
+                headline=(item.get("description") or "")[:160],
+                description=item.get("description") or "",
+                primary_category={"name": domains[0].get("domainId", "")},
+            ))
+        return rows
+
+
+class EdxProvider(Provider):
+    """edX Courses API search"""
+
+    name = "edx"
+
+    def __init__(self, client: UpstreamClient, base_url: str, timeout: float = 1.2):
+        super().__init__(timeout)
+        self.client = client
+        self.url = f"{base_url.rstrip('/')}/courses/v1/courses/"
+        parsed = urlparse(base_url)
+        self.link_base = f"{parsed.scheme}://{parsed.netloc}"
+
+    async def fetch(self, query, limit, deadline, page=1):
+        params = {"search_term": query, "page": page, "page_size": limit}
+        data = await self.client.get_json(self.url, params=params, use_cache=self.use_cache)
+        rows = []
+        for item in data.get("results", []):
+            image = ((item.get("media") or {}).get("image") or {}).get("raw", "")
+            course_id = item.get("course_id") or item.get("id") or ""
+            rows.append(course_shape(
+                id=course_id,
+                title=item.get("name", ""),
+                url=f"{self.link_base}/courses/{course_id}/about" if course_id else "",
+                price="Free to audit",
+                visible_instructors=[{"name": item.get("org", "")}] if item.get("org") else [],
+                image_480x270=image,
+                headline=item.get("short_description") or "",
+                description=item.get("short_description") or "",
+            ))
+        return rows
+
+
+# ===========================================
+# FEDERATED SEARCH
+# ===========================================
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def dedupe_keys(course: dict, link_base: str) -> Tuple[Optional[str], Optional[str]]:
+    """(url key, title key) identifying the same course across providers"""
+    url = course.get("url") or ""
+    url_key = None
+    if url:
+        parsed = urlparse(urljoin(link_base, url))
+        host = parsed.netloc.lower()
+        if host.startswith("www."):
+            host = host[4:]
+        url_key = host + parsed.path.rstrip("/").lower()
+    title_key = _NON_WORD.sub(" ", (course.get("title") or "").lower()).strip() or None
+    return url_key, title_key
+
+
+def merge_ranked(results: Dict[str, List[dict]], limit: int, link_base: str,
+                 weights: Optional[Dict[str, float]] = None) -> List[dict]:
+    """Reciprocal rank fusion over the providers' lists, duplicates merged.
+
+    A course found by several providers keeps the first provider's copy (in
+    `results` order), lists every provider under "sources" and sums their
+    rank contributions, so agreement between catalogues lifts it.
+    """
+    merged: List[dict] = []
+    scores: List[float] = []
+    by_key: Dict[str, int] = {}
+    for provider, rows in results.items():
+        weight = (weights or {}).get(provider, 1.0)
+        for rank, course in enumerate(rows):
+            keys = [key for key in dedupe_keys(course, link_base) if key]
+            slot = next((by_key[key] for key in keys if key in by_key), None)
+            if slot is None:
+                slot = len(merged)
+                merged.append(dict(course, sources=[provider]))
+                scores.append(0.0)
+            elif provider not in merged[slot]["sources"]:
+                merged[slot]["sources"].append(provider)
+            scores[slot] += weight / (RRF_K + rank + 1)
+            for key in keys:
+                by_key.setdefault(key, slot)
+    order = sorted(range(len(merged)), key=lambda i: -scores[i])
+    return [dict(merged[i], score=round(scores[i], 6)) for i in order[:limit]]
+
+
+class FederatedSearch:
+    """Concurrent fan-out to providers, each bounded by its own timeout and the request deadline"""
+
+    def __init__(self, providers: List[Provider], link_base: str, weights: Optional[Dict[str, float]] = None):
+        self.providers = providers
+        self.link_base = link_base
+        self.weights = weights or {}
+
+    @property
+    def names(self) -> List[str]:
+        return [provider.name for provider in self.providers]
+
+    async def _one(self, provider: Provider, query: str, limit: int, deadline: Deadline):
+        start = time.perf_counter()
+        timeout = max(0.0, min(provider.timeout, deadline.remaining()))
+        try:
+            rows = await asyncio.wait_for(provider.search(query, limit, deadline), timeout)
+            status = "ok"
+        except asyncio.TimeoutError:
+            rows, status = [], "timeout"
+        except UpstreamError as e:
+            rows, status = [], "error"
+            logger.warning(f"Federated search: {provider.name} failed: {e}")
+        except Exception as e:
+            rows, status = [], "error"
+            logger.exception(f"Federated search: {provider.name} raised: {e}")
+        report = {"status": status, "count": len(rows), "ms": round((time.perf_counter() - start) * 1000, 1)}
+        return provider.name, rows, report
+
+    async def search(self, query: str, limit: int, deadline: Deadline,
+                     only: Optional[List[str]] = None) -> Tuple[List[dict], Dict[str, dict]]:
+        """Returns (merged rows, per-provider report of status / count / latency)"""
+        providers = [p for p in self.providers if only is None or p.name in only]
+        outcomes = await asyncio.gather(*(self._one(p, query, limit, deadline) for p in providers))
+        results = {name: rows for name, rows, _ in outcomes}
+        report = {name: info for name, _, info in outcomes}
+        return merge_ranked(results, limit, self.link_base, self.weights), report
@@ -0,0 +1,203 @@
+"""
+Rate Limiting for CourseMate
+Per-client token buckets as a pure ASGI middleware, keyed by a configured
+API key or the client IP, with an in-process backend and an optional Redis backend so
+limits hold across uvicorn workers
+"""
+
+import json
+import math
+import time
+import logging
+from collections import OrderedDict
+from typing import Collection, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+API_KEY_HEADER = b"x-api-key"
+FORWARDED_HEADER = b"x-forwarded-for"
+
+# Memory backend: least recently used buckets are evicted past this many keys
+MAX_MEMORY_KEYS = 100_000
+
+
+class RateRule:
+    """Token budget for one route: `rate` tokens per second, bursts up to `burst`"""
+
+    __slots__ = ("path", "rate", "burst")
+
+    def __init__(self, path: str, rate: float, burst: float):
+        self.path = path
+        self.rate = rate
+        self.burst = burst
+
+    def matches(self, path: str) -> bool:
+        return path == self.path or path.startswith(self.path.rstrip("/") + "/")
+
+
+def parse_rate_limits(spec: str) -> List[RateRule]:
+    """Parse "/search=5:20,/image-proxy=20:60" (path=rate_per_sec:burst) into rules"""
+    rules = []
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        path, budget = part.split("=", 1)
+        rate, _, burst = budget.partition(":")
+        rules.append(RateRule(path.strip(), float(rate), float(burst or rate)))
+    # Longest path first so a specific rule wins over a prefix rule
+    return sorted(rules, key=lambda rule: -len(rule.path))
+
+
+# ===========================================
+# BACKENDS
+# ===========================================
+
+class MemoryBackend:
+    """Token buckets in an LRU dict; exact within one process"""
+
+    def __init__(self, max_keys: int = MAX_MEMORY_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.evicted = 0
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> Tuple[bool, float]:
+        """Spend `cost` tokens; returns (allowed, seconds until enough tokens)"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            # Only the idlest client loses its state; a flood of new keys cannot reset everyone's budget
+            while len(self._buckets) >= self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evicted += 1
+            bucket = self._buckets[key] = [burst, now]
+        else:
+            self._buckets.move_to_end(key)
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= cost:
+            bucket[0] = tokens - cost
+            return True, 0.0
+        bucket[0] = tokens
+        return False, (cost - tokens) / rate
+
+
+# Atomic refill-and-spend; Redis TIME keeps every worker on one clock
+_REDIS_TAKE = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+  tokens = tokens - cost
+  allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """Token buckets in Redis, shared by every worker and host using the same URL"""
+
+    def __init__(self, url: str, prefix: str = "coursemate:rl:"):
+        try:
+            import redis.asyncio as redis_asyncio
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis://... requires the 'redis' package (pip install redis)") from e
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+        self._take = self._client.register_script(_REDIS_TAKE)
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> Tuple[bool, float]:
+        try:
+            allowed, tokens = await self._take(keys=[self.prefix + key], args=[rate, burst, cost])
+        except Exception as e:
+            # Fail open: a Redis outage must not take the API down with it
+            logger.warning(f"Rate limit backend unavailable, allowing request: {e}")
+            return True, 0.0
+        if int(allowed):
+            return True, 0.0
+        return False, (cost - float(tokens)) / rate
+
+
+def create_backend(spec: str):
+    """"memory" or a redis:// / rediss:// URL"""
+    if spec and spec.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(spec)
+    return MemoryBackend()
+
+
+# ===========================================
+# MIDDLEWARE
+# ===========================================
+
+class RateLimitMiddleware:
+    """Pure ASGI middleware: 429 + Retry-After once a client exhausts a route's budget.
+
+    Clients are keyed by X-API-Key when it is one of `api_keys`, otherwise by
+    IP: the last X-Forwarded-For hop (the one the proxy appended) when
+    trust_forwarded is set, for use behind a proxy. Unknown keys are ignored,
+    so inventing keys does not buy fresh buckets. Paths without a rule pass
+    straight through.
+    """
+
+    def __init__(self, app, rules: List[RateRule], backend=None, trust_forwarded: bool = False,
+                 api_keys: Collection[str] = ()):
+        self.app = app
+        self.rules = rules
+        self.backend = backend or MemoryBackend()
+        self.trust_forwarded = trust_forwarded
+        self.api_keys = {key.encode("latin-1") for key in api_keys if key}
+        self.limited = 0
+
+    def _rule_for(self, path: str) -> Optional[RateRule]:
+        for rule in self.rules:
+            if rule.matches(path):
+                return rule
+        return None
+
+    def _client_key(self, scope) -> str:
+        forwarded = None
+        for name, value in scope["headers"]:
+            if name == API_KEY_HEADER and value in self.api_keys:
+                return "key:" + value.decode("latin-1")
+            if name == FORWARDED_HEADER:
+                forwarded = value
+        if forwarded and self.trust_forwarded:
+            # Earlier hops are whatever the client sent; only the proxy's own entry can be trusted
+            hop = forwarded.rsplit(b",", 1)[-1].strip()
+            if hop:
+                return "ip:" + hop.decode("latin-1")
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.rules:
+            return await self.app(scope, receive, send)
+        rule = self._rule_for(scope["path"])
+        if rule is None:
+            return await self.app(scope, receive, send)
+
+        allowed, wait = await self.backend.take(f"{rule.path}|{self._client_key(scope)}", rule.rate, rule.burst)
+        if allowed:
+            return await self.app(scope, receive, send)
+
+        self.limited += 1
+        body = json.dumps({"error": "Rate limit exceeded", "route": rule.path}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(wait))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
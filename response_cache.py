@@ -0,0 +1,177 @@
+"""
+Response Cache for CourseMate
+TTL cache of JSON endpoint responses stored already serialised and
+compressed (identity, gzip and Brotli when available). A hit picks the
+body matching Accept-Encoding and sends it as is: no JSON encoding and
+no per-request compression. Versioned entries carry ETag / Last-Modified,
+and conditional requests are answered with 304 before any work is done.
+"""
+
+import json
+import time
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi.responses import Response
+
+from static_assets import choose_encoding, compress, matching_etag, representation_etag
+
+logger = logging.getLogger(__name__)
+
+
+def encode_json(data: Any) -> bytes:
+    """The bytes JSONResponse would render for `data`"""
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def http_date(moment: datetime) -> str:
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def validator_headers(version: Optional[str], last_modified: Optional[datetime],
+                      encoding: str = "identity") -> Dict[str, str]:
+    headers = {}
+    if version:
+        headers["ETag"] = representation_etag(version, encoding)
+    if last_modified is not None:
+        headers["Last-Modified"] = http_date(last_modified)
+    return headers
+
+
+def not_modified(if_none_match: Optional[str], if_modified_since: Optional[str], version: Optional[str],
+                 last_modified: Optional[datetime], headers: Optional[Dict[str, str]] = None) -> Optional[Response]:
+    """304 when the client's validators still match, else None.
+
+    If-Modified-Since only counts when If-None-Match is absent (RFC 9110 13.2.2).
+    """
+    if if_none_match:
+        etag = matching_etag(if_none_match, version) if version else None
+        if etag is None:
+            return None
+        return Response(status_code=304, headers={**(headers or {}), **validator_headers(None, last_modified),
+                                                  "ETag": etag})
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have one-second resolution
+        if last_modified.replace(microsecond=0) <= since:
+            return Response(status_code=304, headers={**(headers or {}),
+                                                      **validator_headers(version, last_modified)})
+    return None
+
+
+class EncodedResponse:
+    """One payload in every content encoding; `data` is kept for callers that post-process results"""
+
+    __slots__ = ("data", "bodies", "created", "version", "last_modified")
+
+    def __init__(self, data: Any, bodies: Dict[str, bytes], version: Optional[str] = None,
+                 last_modified: Optional[datetime] = None):
+        self.data = data
+        self.bodies = bodies
+        self.created = time.time()
+        self.version = version
+        self.last_modified = last_modified
+
+    def response(self, accept_encoding: Optional[str], headers: Optional[Dict[str, str]] = None,
+                 status_code: int = 200) -> Tuple[Response, str]:
+        """(Response with the best body for the client, encoding chosen)"""
+        encoding = choose_encoding(accept_encoding, self.bodies)
+        out = dict(headers or {})
+        out.update(validator_headers(self.version, self.last_modified, encoding))
+        if len(self.bodies) > 1:
+            out["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            # GZipMiddleware leaves responses that already carry Content-Encoding alone
+            out["Content-Encoding"] = encoding
+        return Response(content=self.bodies[encoding], status_code=status_code, media_type="application/json",
+                        headers=out), encoding
+
+
+class ResponseCache:
+    """LRU of up to `max_entries` encoded responses, each fresh for `ttl` seconds.
+
+    Bodies under `min_compress_bytes` are stored identity-only, matching
+    GZipMiddleware's minimum_size. Compression levels favour speed: each
+    entry is compressed once per TTL, at request time.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 512, min_compress_bytes: int = 1000,
+                 gzip_level: int = 6, brotli_quality: int = 5):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_compress_bytes = min_compress_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._entries: "OrderedDict[str, EncodedResponse]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "not_modified": 0, "identity": 0, "gzip": 0, "br": 0,
+                      "encode_ms": 0.0}
+
+    def get(self, key: str) -> Optional[EncodedResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if time.time() - entry.created >= self.ttl:
+            del self._entries[key]
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return entry
+
+    def set(self, key: str, data: Any, version: Optional[str] = None,
+            last_modified: Optional[datetime] = None) -> EncodedResponse:
+        """Serialise and compress `data` once and cache the result (validated by `version` when given)"""
+        start = time.perf_counter()
+        body = encode_json(data)
+        if len(body) >= self.min_compress_bytes:
+            bodies = compress(body, gzip_level=self.gzip_level, brotli_quality=self.brotli_quality)
+        else:
+            bodies = {"identity": body}
+        entry = EncodedResponse(data, bodies, version, last_modified)
+        self.stats["encode_ms"] += (time.perf_counter() - start) * 1000
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def conditional(self, request_headers, version: Optional[str], last_modified: Optional[datetime],
+                    headers: Optional[Dict[str, str]] = None) -> Optional[Response]:
+        """304 for a request whose If-None-Match / If-Modified-Since still match, else None"""
+        response = not_modified(request_headers.get("if-none-match"), request_headers.get("if-modified-since"),
+                                version, last_modified, headers)
+        if response is not None:
+            self.stats["not_modified"] += 1
+        return response
+
+    def respond(self, entry: EncodedResponse, accept_encoding: Optional[str],
+                headers: Optional[Dict[str, str]] = None) -> Response:
+        response, encoding = entry.response(accept_encoding, headers)
+        self.stats[encoding] += 1
+        return response
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "encode_ms": round(self.stats["encode_ms"], 1),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+            "bytes": sum(sum(len(b) for b in entry.bodies.values()) for entry in self._entries.values()),
+        }
@@ -0,0 +1,371 @@
+"""
+Scoring Executor for CourseMate
+Runs CPU-bound ranking (pandas scans, similarity scoring) off the asyncio
+event loop with per-route concurrency limits and queue-depth metrics.
+Optionally hands similarity scoring to a pool of processes that memory-map
+the embedding matrix, so every process on the host shares one page-cache copy
+"""
+
+import os
+import math
+import time
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows scored per block; keeps the float32 working copy of float16 embeddings small
+SCORING_BLOCK_ROWS = 8192
+
+# Threads in the priority lane used by light routes (see ScoringExecutor.priority_routes)
+PRIORITY_THREADS = 2
+
+# How long past the deadline to wait for a worker process: it stops scanning at the deadline and
+# still has to send back its best-so-far rows
+PROCESS_RESULT_GRACE_SEC = 0.1
+
+
+class Deadline:
+    """Time budget of one request, as an absolute time.monotonic() instant.
+
+    CLOCK_MONOTONIC is host-wide, so `at` can be handed to scoring processes.
+    """
+
+    __slots__ = ("at",)
+
+    def __init__(self, budget: float):
+        self.at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return self.at - time.monotonic()
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.at
+
+
+class ScoringOverloaded(Exception):
+    """A route's wait queue is full or its queue deadline passed; the caller should shed the request"""
+
+    def __init__(self, route: str, reason: str, retry_after: int):
+        super().__init__(f"{route} overloaded: {reason}")
+        self.route = route
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_route_limits(spec: str) -> Dict[str, int]:
+    """Parse "search=4,recommendations=4" into a route -> limit mapping"""
+    limits = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            route, value = part.split("=", 1)
+            limits[route.strip()] = int(value)
+    return limits
+
+
+# ===========================================
+# SIMILARITY KERNELS
+# ===========================================
+
+def embedding_norms(embeddings: np.ndarray) -> np.ndarray:
+    """L2 norm of every embedding row, computed block by block in float32"""
+    norms = np.empty(embeddings.shape[0], dtype=np.float32)
+    for start in range(0, embeddings.shape[0], SCORING_BLOCK_ROWS):
+        block = np.asarray(embeddings[start:start + SCORING_BLOCK_ROWS], dtype=np.float32)
+        norms[start:start + len(block)] = np.sqrt(np.einsum('ij,ij->i', block, block))
+    return norms
+
+
+def top_k_similar(embeddings: np.ndarray, norms: np.ndarray, query: np.ndarray, k: int,
+                  exclude: Optional[int] = None, deadline_at: Optional[float] = None):
+    """Cosine top-k over all rows without materialising a float64 copy of the matrix.
+
+    With deadline_at (time.monotonic), scoring stops at the first block
+    boundary past the deadline and ranks the rows scored so far.
+    Returns (positions, scores, complete) sorted by descending similarity.
+    """
+    query = np.asarray(query, dtype=np.float32).ravel()
+    query_norm = float(np.linalg.norm(query)) or 1.0
+    scores = np.full(embeddings.shape[0], -np.inf, dtype=np.float32)
+    scanned = 0
+    complete = True
+    for start in range(0, embeddings.shape[0], SCORING_BLOCK_ROWS):
+        # The first block always runs so an expired budget still yields some results
+        if deadline_at is not None and start and time.monotonic() >= deadline_at:
+            complete = False
+            break
+        block = np.asarray(embeddings[start:start + SCORING_BLOCK_ROWS], dtype=np.float32)
+        scores[start:start + len(block)] = block @ query
+        scanned = start + len(block)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores[:scanned] /= np.where(norms[:scanned] > 0, norms[:scanned], 1.0) * query_norm
+    if exclude is not None:
+        scores[exclude] = -np.inf
+    k = min(k, scanned)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), complete
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return top, scores[top], complete
+
+
+# ===========================================
+# PROCESS WORKERS
+# ===========================================
+
+# Per-process state, filled by the pool initializer
+_worker: Dict[str, Any] = {}
+
+
+def _attach_worker(embeddings_path: str):
+    """Pool initializer: map the embeddings read-only (shared page cache, no private copy)"""
+    embeddings = np.load(embeddings_path, mmap_mode='r')
+    _worker['embeddings'] = embeddings
+    _worker['norms'] = embedding_norms(embeddings)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _similar_in_worker(position: Optional[int], k: int, vector: Optional[np.ndarray] = None,
+                       deadline_at: Optional[float] = None):
+    embeddings = _worker['embeddings']
+    query = embeddings[position] if vector is None else vector
+    return top_k_similar(embeddings, _worker['norms'], query, k, exclude=position, deadline_at=deadline_at)
+
+
+# ===========================================
+# EXECUTOR
+# ===========================================
+
+class RouteLimiter:
+    """Concurrency cap, bounded wait queue and queue metrics for one route"""
+
+    def __init__(self, route: str, limit: int, max_queue: Optional[int] = None, max_wait: Optional[float] = None):
+        self.route = route
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.semaphore = asyncio.Semaphore(limit)
+        self.in_flight = 0
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.partial = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    def locked_out(self) -> bool:
+        """True when a new request would have to queue and the queue is already full"""
+        return (self.max_queue is not None and self.semaphore.locked()
+                and self.queued >= self.max_queue)
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained (at least 1)"""
+        done = self.completed + self.failed
+        avg_run = self.total_run / done if done else 0.0
+        return max(1, math.ceil((self.queued + self.in_flight) * avg_run / self.limit))
+
+    def metrics(self) -> Dict[str, Any]:
+        done = self.completed + self.failed
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "max_wait_ms": round(1000 * self.max_wait) if self.max_wait else None,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queued": self.max_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "partial": self.partial,
+            "avg_wait_ms": round(1000 * self.total_wait / done, 2) if done else 0.0,
+            "avg_run_ms": round(1000 * self.total_run / done, 2) if done else 0.0,
+        }
+
+
+class ScoringExecutor:
+    """Thread pool for GIL-releasing NumPy/pandas work, gated per route.
+
+    Each route waits in a bounded queue (max_queue) for at most max_wait
+    seconds; beyond that run() raises ScoringOverloaded instead of letting
+    requests pile up. Routes in priority_routes run on their own small lane
+    so cheap work never queues behind expensive scans.
+
+    With processes > 0, similarity scoring is forwarded from the pool threads
+    to worker processes attached to the embeddings file (see attach_embeddings).
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, route_limits: Optional[Dict[str, int]] = None,
+                 default_limit: int = 4, processes: int = 0, max_queue: Optional[int] = None,
+                 max_wait: Optional[float] = None, priority_routes: Sequence[str] = ()):
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.route_limits = route_limits or {}
+        self.default_limit = default_limit
+        self.processes = processes
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.priority_routes = set(priority_routes)
+        self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="scoring")
+        self._priority_threads = ThreadPoolExecutor(max_workers=PRIORITY_THREADS,
+                                                    thread_name_prefix="scoring-priority")
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._attached: Optional[tuple] = None
+        # _worker_ready jobs of a freshly started pool; similarity is scored in-thread until all are done
+        self._warming: List[Any] = []
+        self._limiters: Dict[str, RouteLimiter] = {}
+        # Similarity jobs whose deadline passed while waiting on a worker process
+        self.process_timeouts = 0
+
+    def _limiter(self, route: str) -> RouteLimiter:
+        limiter = self._limiters.get(route)
+        if limiter is None:
+            limiter = RouteLimiter(route, self.route_limits.get(route, self.default_limit),
+                                   max_queue=self.max_queue, max_wait=self.max_wait)
+            self._limiters[route] = limiter
+        return limiter
+
+    async def run(self, route: str, fn: Callable, *args, deadline: Optional[Deadline] = None, **kwargs):
+        """Run fn(*args, **kwargs) on the pool once the route has a free slot.
+
+        Raises ScoringOverloaded when the route's queue is full or the wait
+        exceeds the queue deadline (or the request's own deadline, if sooner).
+        """
+        limiter = self._limiter(route)
+        if limiter.locked_out():
+            limiter.rejected += 1
+            raise ScoringOverloaded(route, "queue full", limiter.retry_after())
+        wait = limiter.max_wait
+        if deadline is not None:
+            wait = max(0.0, deadline.remaining()) if wait is None else max(0.0, min(wait, deadline.remaining()))
+        limiter.queued += 1
+        limiter.max_queued = max(limiter.max_queued, limiter.queued)
+        queued_at = time.perf_counter()
+        try:
+            if limiter.semaphore.locked():
+                await asyncio.wait_for(limiter.semaphore.acquire(), timeout=wait)
+            else:
+                # Free slot: take it even when the budget is already spent (wait_for(0) would refuse)
+                await limiter.semaphore.acquire()
+        except asyncio.TimeoutError:
+            limiter.timed_out += 1
+            raise ScoringOverloaded(route, "queue deadline exceeded", limiter.retry_after()) from None
+        finally:
+            limiter.queued -= 1
+        started = time.perf_counter()
+        limiter.total_wait += started - queued_at
+        limiter.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._priority_threads if route in self.priority_routes else self._threads
+            result = await loop.run_in_executor(pool, partial(fn, *args, **kwargs))
+            limiter.completed += 1
+            return result
+        except Exception:
+            limiter.failed += 1
+            raise
+        finally:
+            limiter.in_flight -= 1
+            limiter.total_run += time.perf_counter() - started
+            limiter.semaphore.release()
+
+    # ---------- process workers ----------
+
+    def attach_embeddings(self, path: str):
+        """Point the process workers at an embeddings snapshot.
+
+        Workers are (re)started only when the file changed, so calling this
+        after every data load is cheap. No-op without processes.
+        """
+        if not self.processes:
+            return
+        stat = os.stat(path)
+        snapshot = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if snapshot == self._attached:
+            return
+        previous = self._processes
+        # spawn: never fork a process that owns an event loop and live threads
+        self._processes = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_attach_worker,
+            initargs=(snapshot[0],),
+        )
+        self._attached = snapshot
+        # Start every worker now; requests score in-thread until the workers have imported and attached
+        self._warming = [self._processes.submit(_worker_ready) for _ in range(self.processes)]
+        if previous is not None:
+            previous.shutdown(wait=False, cancel_futures=True)
+        logger.info(f"Scoring processes ({self.processes}) attached to {snapshot[0]}")
+
+    def detach_embeddings(self):
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+        self._processes = None
+        self._attached = None
+        self._warming = []
+
+    def _pool_ready(self) -> bool:
+        if self._processes is None:
+            return False
+        if self._warming and all(future.done() for future in self._warming):
+            self._warming = []
+        return not self._warming
+
+    def similar(self, embeddings: np.ndarray, norms: np.ndarray, position: Optional[int], k: int,
+                vector: Optional[np.ndarray] = None, deadline: Optional[Deadline] = None):
+        """Top-k rows similar to row `position` (or to `vector`), excluding `position`.
+
+        Meant to be called from a job already running on this executor: the
+        pool thread blocks on the worker process while holding its route slot,
+        at most PROCESS_RESULT_GRACE_SEC past the deadline (queueing for a
+        worker counts against it). Until a new pool's workers are up, the
+        scoring runs on the calling thread instead.
+        Returns (positions, scores, complete) like top_k_similar.
+        """
+        deadline_at = deadline.at if deadline is not None else None
+        if self._pool_ready():
+            future = self._processes.submit(_similar_in_worker, position, k, vector, deadline_at)
+            timeout = max(0.0, deadline.remaining()) + PROCESS_RESULT_GRACE_SEC if deadline is not None else None
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeout:
+                # Still queued: never runs. Already running: the worker stops at the deadline on its own
+                future.cancel()
+                self.process_timeouts += 1
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32), False
+        query = embeddings[position] if vector is None else vector
+        return top_k_similar(embeddings, norms, query, k, exclude=position, deadline_at=deadline_at)
+
+    def note_partial(self, route: str):
+        """Count a response that was cut short by its deadline"""
+        self._limiter(route).partial += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "threads": self.max_workers,
+            "priority_threads": PRIORITY_THREADS,
+            "priority_routes": sorted(self.priority_routes),
+            "processes": self.processes if self._processes is not None else 0,
+            "processes_warm": self._pool_ready(),
+            "process_timeouts": self.process_timeouts,
+            "embeddings": self._attached[0] if self._attached else None,
+            "queue_depth": sum(l.queued for l in self._limiters.values()),
+            "routes": {route: limiter.metrics() for route, limiter in self._limiters.items()},
+        }
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        self._priority_threads.shutdown(wait=False, cancel_futures=True)
+        self.detach_embeddings()
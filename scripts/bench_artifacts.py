@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Artifact codec benchmark: on-disk size vs load time for each columnar encoding.
+
+Usage: python scripts/bench_artifacts.py [courses_data.feather] [repeats]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from course_store import CourseStore, read_artifact, write_artifact  # noqa: E402
+
+CODECS = [
+    ("feather", "uncompressed"),
+    ("feather", "lz4"),
+    ("feather", "zstd"),
+    ("parquet", "snappy"),
+    ("parquet", "zstd"),
+]
+
+# Columns a list endpoint needs (what the server keeps resident)
+PROJECTED = ["id", "title", "instructor", "price", "rating", "category", "level",
+             "num_subscribers", "num_reviews", "is_paid", "image_url", "url"]
+
+
+def best_of(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    src = sys.argv[1] if len(sys.argv) > 1 else "courses_data.feather"
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    if not os.path.exists(src):
+        raise SystemExit(f"{src} not found")
+
+    df = pd.read_csv(src) if src.lower().endswith(".csv") else pd.read_feather(src)
+    projected = [c for c in PROJECTED if c in df.columns]
+    zip_note = ""
+
+    print(f"SOURCE: {src} rows={len(df)} columns={len(df.columns)}")
+    print(f"{'format':<8} {'codec':<13} {'size MB':>8} {'full s':>8} {'proj s':>8} {'store s':>8} {'detail ms':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt, codec in CODECS:
+            path = os.path.join(tmp, f"courses.{codec}.{fmt}")
+            write_artifact(df, path, compression=codec)
+            size_mb = os.path.getsize(path) / 1e6
+            full = best_of(lambda: read_artifact(path), repeats)
+            proj = best_of(lambda: read_artifact(path, columns=projected), repeats)
+            store_holder = {}
+            store_t = best_of(lambda: store_holder.update(store=CourseStore.load(path)), repeats)
+            store = store_holder["store"]
+            middle = len(store) // 2
+            detail = best_of(lambda: store.heavy_text(middle), repeats)
+            print(f"{fmt:<8} {codec:<13} {size_mb:>8.2f} {full:>8.3f} {proj:>8.3f} {store_t:>8.3f} {detail * 1000:>10.2f}")
+
+        # Reference point: the old DEFLATE-zipped feather (must be unzipped before use)
+        import zipfile
+        plain = os.path.join(tmp, "plain.feather")
+        df.to_feather(plain)
+        zipped = plain + ".zip"
+        with zipfile.ZipFile(zipped, mode="w", compression=zipfile.ZIP_DEFLATED) as z:
+            z.write(plain, arcname="plain.feather")
+        zip_note = f"legacy feather.zip (DEFLATE): {os.path.getsize(zipped) / 1e6:.2f} MB + {os.path.getsize(plain) / 1e6:.2f} MB unzipped"
+    print(zip_note)
+
+
+if __name__ == "__main__":
+    main()
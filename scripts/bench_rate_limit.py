@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Rate limiter overhead: time per request through RateLimitMiddleware vs the bare app.
+
+Drives the ASGI callables directly (no sockets), so the difference is the
+middleware's own cost: rule match, client key, bucket update.
+
+Usage: python scripts/bench_rate_limit.py [requests] [clients] [--backend redis://localhost:6379/0]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rate_limit import RateLimitMiddleware, create_backend, parse_rate_limits  # noqa: E402
+
+HEADERS = [(b"host", b"127.0.0.1:8000"), (b"user-agent", b"bench"), (b"accept", b"*/*"),
+           (b"accept-encoding", b"gzip, br")]
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def timed(app, scopes):
+    start = time.perf_counter()
+    for scope in scopes:
+        await app(scope, receive, send)
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure RateLimitMiddleware overhead")
+    parser.add_argument("requests", nargs="?", type=int, default=200_000)
+    parser.add_argument("clients", nargs="?", type=int, default=1_000)
+    parser.add_argument("--backend", default="memory")
+    args = parser.parse_args()
+
+    # Budgets high enough that every request is admitted: the common path is the one that matters
+    rules = parse_rate_limits("/search=1000000:1000000,/image-proxy=1000000:1000000")
+    limited = RateLimitMiddleware(bare_app, rules, backend=create_backend(args.backend))
+    scopes = [{"type": "http", "path": "/search", "headers": HEADERS,
+               "client": (f"10.0.{i // 256 % 256}.{i % 256}", 50000)} for i in range(args.clients)]
+    unmatched = [dict(scope, path="/api") for scope in scopes]
+    workload = [scopes[i % len(scopes)] for i in range(args.requests)]
+    passthrough = [unmatched[i % len(unmatched)] for i in range(args.requests)]
+
+    await timed(limited, workload[:10_000])  # warm up
+    base = min([await timed(bare_app, workload) for _ in range(3)])
+    checked = min([await timed(limited, workload) for _ in range(3)])
+    skipped = min([await timed(limited, passthrough) for _ in range(3)])
+
+    per = 1e6 / args.requests
+    print(f"backend={args.backend} requests={args.requests} clients={args.clients}")
+    print(f"bare app:            {base * per:7.2f} us/request")
+    print(f"limited route:       {checked * per:7.2f} us/request  (+{(checked - base) * per:.2f} us)")
+    print(f"unlimited route:     {skipped * per:7.2f} us/request  (+{(skipped - base) * per:.2f} us)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
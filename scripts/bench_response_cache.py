@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+CPU per cached /trending-style response: JSONResponse + GZipMiddleware vs the encoded response cache.
+
+Both variants serve the same cached list of course dicts through an app
+wrapped in GZipMiddleware(minimum_size=1000), driven as ASGI calls (no
+sockets). "before" re-renders JSON and gzips it on every hit (the old
+api_cache path); "after" sends the body ResponseCache stored pre-encoded.
+
+Usage: python scripts/bench_response_cache.py [requests] [--limit 10] [--encoding "gzip, deflate, br"]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.middleware.gzip import GZipMiddleware  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from providers import course_shape  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+HEADERS = {"Cache-Control": "public, max-age=60"}
+WORDS = ("python data course learn build projects machine learning web development javascript react "
+         "beginners complete guide hands-on master fundamentals advanced practical").split()
+
+
+def fake_courses(limit: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    text = lambda n: " ".join(rng.choice(WORDS) for _ in range(n)).capitalize()  # noqa: E731
+    return [course_shape(
+        id=100000 + i,
+        title=text(7),
+        url=f"https://www.udemy.com/course/{text(4).lower().replace(' ', '-')}/",
+        price=f"${rng.randrange(10, 200)}.99",
+        is_paid=True,
+        visible_instructors=[{"name": text(2)}],
+        image_480x270=f"https://img-c.udemycdn.com/course/480x270/{100000 + i}_1a2b.jpg",
+        avg_rating=round(rng.uniform(3.5, 5), 2),
+        num_subscribers=rng.randrange(1000, 900000),
+        num_reviews=rng.randrange(100, 90000),
+        headline=text(18),
+        description=text(110),
+        primary_category={"name": "Development"},
+    ) for i in range(limit)]
+
+
+def build_app(courses: list, cache: ResponseCache) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+    cache.set("trending", courses)
+
+    @app.get("/before")
+    async def before():
+        return JSONResponse(content=courses, headers=HEADERS)
+
+    @app.get("/after")
+    async def after(request: Request):
+        return cache.respond(cache.get("trending"), request.headers.get("accept-encoding"), HEADERS)
+
+    return app
+
+
+async def run(app, path: str, encoding: str, requests: int):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"host", b"127.0.0.1"), (b"accept-encoding", encoding.encode())],
+             "client": ("127.0.0.1", 50000), "server": ("127.0.0.1", 8000)}
+    sizes = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and len(sizes) < 1:
+            sizes.append(len(message.get("body", b"")))
+
+    start_cpu, start_wall = time.process_time(), time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return time.process_time() - start_cpu, time.perf_counter() - start_wall, sizes[0]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure CPU per cached listing response")
+    parser.add_argument("requests", nargs="?", type=int, default=5_000)
+    parser.add_argument("--limit", type=int, default=10, help="courses in the cached list")
+    parser.add_argument("--encoding", default="gzip, deflate, br", help="Accept-Encoding sent by the client")
+    args = parser.parse_args()
+
+    cache = ResponseCache(ttl=3600)
+    app = build_app(fake_courses(args.limit), cache)
+    await run(app, "/before", args.encoding, 200)  # warm up
+    await run(app, "/after", args.encoding, 200)
+
+    print(f"requests={args.requests} courses={args.limit} accept-encoding={args.encoding!r}")
+    results = {}
+    for path in ("/before", "/after"):
+        cpu, wall, size = min([await run(app, path, args.encoding, args.requests) for _ in range(3)])
+        results[path] = cpu
+        print(f"{path[1:]:>7}: {cpu / args.requests * 1e6:8.1f} us CPU/request  "
+              f"{wall / args.requests * 1e6:8.1f} us wall/request  body {size} bytes")
+    print(f"speedup: {results['/before'] / results['/after']:.1f}x CPU per cached request")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
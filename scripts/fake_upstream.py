@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Fake Udemy / RapidAPI / Coursera / edX upstream for exercising the outbound client locally.
+
+Serves generated courses on each provider's search path, with knobs for
+latency, slow responses and injected failures, so retries, the circuit
+breaker, coalescing, stale serving and federated search timeouts can be
+observed without touching the real services.
+
+Usage: python scripts/fake_upstream.py [--port 8900] [--fail-rate 0.3] [--status 503]
+       [--latency-ms 50] [--slow-rate 0.1] [--slow-ms 6000] [--path-latency /api/courses.v1=2000]
+
+Point the app at it with
+  UDEMY_BASE_URL=http://127.0.0.1:8900/api-2.0 RAPIDAPI_BASE_URL=http://127.0.0.1:8900
+  COURSERA_BASE_URL=http://127.0.0.1:8900/api EDX_BASE_URL=http://127.0.0.1:8900/api
+"""
+import argparse
+import asyncio
+import io
+import random
+
+from aiohttp import web
+
+TOPICS = ["python", "javascript", "data science", "machine learning", "react", "sql", "design", "marketing"]
+
+
+def make_course(course_id: int, query: str) -> dict:
+    topic = query or TOPICS[course_id % len(TOPICS)]
+    return {
+        "id": course_id,
+        "title": f"{topic.title()} Course {course_id}",
+        "url": f"/course/{topic.replace(' ', '-')}-{course_id}/",
+        "headline": f"Learn {topic} step by step",
+        "is_paid": course_id % 3 != 0,
+        "price": "Free" if course_id % 3 == 0 else f"${10 + course_id % 90}.99",
+        "image_480x270": f"https://img.example.com/{course_id}_480x270.jpg",
+        "avg_rating": round(3.5 + (course_id % 15) / 10, 1),
+        "num_subscribers": 1000 + course_id * 37 % 50000,
+        "num_reviews": 50 + course_id * 13 % 5000,
+        "instructional_level": ["Beginner Level", "Intermediate Level", "All Levels"][course_id % 3],
+        "visible_instructors": [{"name": f"Instructor {course_id % 40}"}],
+        "primary_category": {"title": "Development"},
+    }
+
+
+def page_of(request: web.Request, query_param: str, size_param: str = "page_size"):
+    query = request.query.get(query_param, "").strip().lower()
+    page = max(1, int(request.query.get("page", "1")))
+    page_size = min(100, max(1, int(request.query.get(size_param, "12"))))
+    offset = int(request.query["start"]) if "start" in request.query else (page - 1) * page_size
+    if offset >= request.app["opts"].total:
+        return []
+    seed = sum(map(ord, query)) * 1000
+    start = seed + offset
+    return [make_course(start + i, query) for i in range(min(page_size, request.app["opts"].total - offset))]
+
+
+@web.middleware
+async def flaky(request: web.Request, handler):
+    """Apply base latency, occasional slow responses and injected failures"""
+    if request.path.startswith("/_"):
+        return await handler(request)
+    opts = request.app["opts"]
+    request.app["hits"] += 1
+    delay = opts.path_latency.get(request.path, opts.latency_ms) / 1000
+    if random.random() < opts.slow_rate:
+        delay = opts.slow_ms / 1000
+    if delay:
+        await asyncio.sleep(delay)
+    if random.random() < opts.fail_rate:
+        request.app["failures"] += 1
+        headers = {"Retry-After": str(opts.retry_after)} if opts.retry_after is not None else None
+        return web.json_response({"detail": "injected failure"}, status=opts.status, headers=headers)
+    return await handler(request)
+
+
+async def udemy_courses(request: web.Request):
+    results = page_of(request, "search")
+    return web.json_response({"count": request.app["opts"].total, "next": None, "previous": None, "results": results})
+
+
+async def rapid_search(request: web.Request):
+    courses = page_of(request, "query")
+    items = [{
+        "id": c["id"], "title": c["title"], "url": "https://www.udemy.com" + c["url"], "image": c["image_480x270"],
+        "rating": c["avg_rating"], "students": c["num_subscribers"], "num_reviews": c["num_reviews"],
+        "is_paid": c["is_paid"], "level": c["instructional_level"], "headline": c["headline"],
+        "instructors": c["visible_instructors"], "category": "Development",
+    } for c in courses]
+    return web.json_response({"data": items})
+
+
+async def coursera_courses(request: web.Request):
+    courses = page_of(request, "query", size_param="limit")
+    elements = [{
+        "id": f"crs{c['id']}", "slug": f"{c['url'].strip('/').split('/')[-1]}-crs", "name": c["title"],
+        "description": c["headline"], "photoUrl": c["image_480x270"], "domainTypes": [{"domainId": "computer-science"}],
+    } for c in courses]
+    return web.json_response({"elements": elements, "paging": {"total": request.app["opts"].total}})
+
+
+async def edx_courses(request: web.Request):
+    courses = page_of(request, "search_term")
+    results = [{
+        "id": f"course-v1:FakeX+C{c['id']}+2024", "course_id": f"course-v1:FakeX+C{c['id']}+2024",
+        "name": c["title"], "short_description": c["headline"], "org": "FakeX",
+        "media": {"image": {"raw": c["image_480x270"]}},
+    } for c in courses]
+    return web.json_response({"results": results, "pagination": {"count": request.app["opts"].total}})
+
+
+def make_image(seed: int, width: int = 750, height: int = 422) -> bytes:
+    """A JPEG thumbnail (random bytes when Pillow is not installed)"""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return random.Random(seed).randbytes(width * height // 8)
+    rng = random.Random(seed)
+    image = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.ellipse((x, y, x + rng.randrange(20, 200), y + rng.randrange(20, 200)),
+                     fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+async def image(request: web.Request):
+    """GET /img/<n>.jpg: a generated course thumbnail, stable per n"""
+    seed = int(request.match_info["seed"])
+    cache = request.app["images"]
+    if seed not in cache:
+        cache[seed] = make_image(seed)
+    request.app["image_bytes"] += len(cache[seed])
+    return web.Response(body=cache[seed], content_type="image/jpeg")
+
+
+async def stats(request: web.Request):
+    return web.json_response({"hits": request.app["hits"], "failures": request.app["failures"],
+                              "image_bytes": request.app["image_bytes"]})
+
+
+async def configure(request: web.Request):
+    """Change failure knobs at runtime, e.g. POST /_control?fail_rate=1"""
+    opts = request.app["opts"]
+    for name in ("fail_rate", "slow_rate", "latency_ms", "slow_ms"):
+        if name in request.query:
+            setattr(opts, name, float(request.query[name]))
+    if "status" in request.query:
+        opts.status = int(request.query["status"])
+    return web.json_response(vars(opts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Udemy / RapidAPI upstream")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with --status")
+    parser.add_argument("--status", type=int, default=503)
+    parser.add_argument("--retry-after", type=int, default=None, help="Retry-After seconds sent with failures")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests delayed by --slow-ms")
+    parser.add_argument("--slow-ms", type=float, default=6000.0)
+    parser.add_argument("--total", type=int, default=10000, help="results available per query before pages run dry")
+    parser.add_argument("--path-latency", default="", help="per-path latency overrides, e.g. /api/courses.v1=2000")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    args.path_latency = {path: float(ms) for path, _, ms in
+                         (part.partition("=") for part in args.path_latency.split(",") if "=" in part)}
+    random.seed(args.seed)
+
+    app = web.Application(middlewares=[flaky])
+    app["opts"] = args
+    app["hits"] = 0
+    app["failures"] = 0
+    app["images"] = {}
+    app["image_bytes"] = 0
+    app.router.add_get("/api-2.0/courses/", udemy_courses)
+    app.router.add_get("/rapidapi/courses/search", rapid_search)
+    app.router.add_get("/api/courses.v1", coursera_courses)
+    app.router.add_get("/api/courses/v1/courses/", edx_courses)
+    app.router.add_get(r"/img/{seed:\d+}.jpg", image)
+    app.router.add_get("/_stats", stats)
+    app.router.add_post("/_control", configure)
+    web.run_app(app, host="127.0.0.1", port=args.port, print=lambda *_: None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Open-loop load test: offered load vs goodput for heavy and light routes.
+
+Requests are fired on a fixed schedule regardless of how fast the server
+answers (the way real users arrive), so saturation shows up as shed 503s or
+collapsing goodput instead of a politely slowed-down client.
+
+Usage: python scripts/load_test.py [--url http://127.0.0.1:8000] [--rates 10,25,50,100]
+       [--duration 10] [--slo-ms 2000] [--light-share 0.3]
+"""
+import argparse
+import asyncio
+import random
+import string
+import time
+
+import aiohttp
+
+HEAVY = "heavy"
+LIGHT = "light"
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def fire(session, url, kind, stats, timeout):
+    start = time.perf_counter()
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=timeout)) as resp:
+            await resp.read()
+            status = resp.status
+    except Exception:
+        status = None
+    elapsed = (time.perf_counter() - start) * 1000
+    bucket = stats[kind]
+    if status == 200:
+        bucket["ok"].append(elapsed)
+    elif status == 503:
+        bucket["shed"] += 1
+    else:
+        bucket["errors"] += 1
+
+
+def pick_request(base, course_ids, light_share, rng):
+    if rng.random() < light_share:
+        return LIGHT, base + rng.choice(["/api", "/trending?limit=10"])
+    if course_ids and rng.random() < 0.5:
+        return HEAVY, f"{base}/recommendations?course_id={rng.choice(course_ids)}&limit=10"
+    # Random two-letter queries defeat the per-query match cache, so each one is a full scan
+    query = "".join(rng.choice(string.ascii_lowercase) for _ in range(2))
+    return HEAVY, f"{base}/search?query={query}"
+
+
+async def run_rate(session, base, rate, duration, slo_ms, light_share, course_ids, rng):
+    stats = {kind: {"ok": [], "shed": 0, "errors": 0} for kind in (HEAVY, LIGHT)}
+    tasks = []
+    interval = 1.0 / rate
+    started = time.perf_counter()
+    for i in range(int(rate * duration)):
+        delay = started + i * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        kind, url = pick_request(base, course_ids, light_share, rng)
+        tasks.append(asyncio.create_task(fire(session, url, kind, stats, timeout=slo_ms / 1000 * 5)))
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started
+    for kind in (HEAVY, LIGHT):
+        ok = stats[kind]["ok"]
+        good = sum(1 for ms in ok if ms <= slo_ms)
+        sent = len(ok) + stats[kind]["shed"] + stats[kind]["errors"]
+        print(f"{rate:>7.0f} {kind:<6} {sent:>6} {good / wall:>10.1f} {stats[kind]['shed']:>6} "
+              f"{stats[kind]['errors']:>6} {percentile(ok, 0.5):>8.0f} {percentile(ok, 0.99):>8.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rates", default="10,25,50,100", help="offered requests/second, comma separated")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per rate")
+    parser.add_argument("--slo-ms", type=float, default=2000.0, help="responses slower than this are not goodput")
+    parser.add_argument("--light-share", type=float, default=0.3, help="fraction of /api and /trending requests")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    base = args.url.rstrip("/")
+    rng = random.Random(args.seed)
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async with session.get(base + "/trending?limit=50") as resp:
+            course_ids = [course["id"] for course in await resp.json()]
+        print(f"target {base}, slo {args.slo_ms:.0f} ms, {args.duration:.0f}s per rate, light share {args.light_share}")
+        print(f"{'offered':>7} {'class':<6} {'sent':>6} {'goodput/s':>10} {'503':>6} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8}")
+        for rate in (float(r) for r in args.rates.split(",")):
+            await run_rate(session, base, rate, args.duration, args.slo_ms, args.light_share, course_ids, rng)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,18 +1,86 @@
 import os
-import pandas as pd
+import sys
 import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from build_manifest import MANIFEST_FILE, BuildManifest  # noqa: E402
+from course_store import DEFAULT_COMPRESSION, build_indexes, save_indexes, write_artifact  # noqa: E402
 
 SAMPLE_ROWS = int(os.getenv("SAMPLE_ROWS", "15000"))
 RANDOM_STATE = 42
+POPULARITY_BUCKETS = int(os.getenv("SAMPLE_POPULARITY_BUCKETS", "4"))
+EMBEDDING_CHUNK_ROWS = int(os.getenv("SAMPLE_EMBEDDING_CHUNK_ROWS", "2048"))
 
 ROOT = os.getcwd()
 
 FEATHER_IN = os.path.join(ROOT, "courses_data.feather")
 CSV_IN = os.path.join(ROOT, "courses_data.csv")
+EMB_IN = os.path.join(ROOT, "course_embeddings_float16.npy")
 
-FEATHER_OUT = os.path.join(ROOT, "courses_data.sample.feather")
+# .feather/.arrow (Arrow IPC) or .parquet; compression via ARTIFACT_COMPRESSION
+FEATHER_OUT = os.path.join(ROOT, os.getenv("SAMPLE_ARTIFACT", "courses_data.sample.feather"))
 CSV_OUT = os.path.join(ROOT, "courses_data.sample.csv")
-ZIP_OUT = os.path.join(ROOT, "courses_data.sample.feather.zip")
+EMB_OUT = os.path.join(ROOT, "course_embeddings_sample.npy")
+
+
+def stratified_rows(df, k, rng):
+    """Pick k row positions, allocated across category x popularity strata.
+
+    Each stratum gets its proportional share (largest remainder rounding) and
+    at least one row while the budget allows, so rare categories survive.
+    """
+    n = len(df)
+    if k >= n:
+        return np.arange(n)
+
+    category = df["category"].fillna("General").astype(str).to_numpy() if "category" in df.columns else np.zeros(n)
+    subscribers = df["num_subscribers"].to_numpy() if "num_subscribers" in df.columns else np.zeros(n)
+    # Rank-based buckets stay well defined when many courses share a count
+    ranks = pd.Series(subscribers).rank(method="first").to_numpy()
+    popularity = np.minimum((ranks - 1) * POPULARITY_BUCKETS // n, POPULARITY_BUCKETS - 1).astype(int)
+
+    strata = pd.Series(np.arange(n)).groupby([category, popularity]).indices
+    keys = list(strata.keys())
+    sizes = np.array([len(strata[key]) for key in keys])
+
+    quota = sizes * k / n
+    alloc = np.floor(quota).astype(int)
+    if k >= len(keys):
+        alloc = np.maximum(alloc, 1)
+    remainder = k - alloc.sum()
+    if remainder > 0:
+        order = np.argsort(-(quota - np.floor(quota)), kind="stable")
+        for i in order:
+            if remainder == 0:
+                break
+            if alloc[i] < sizes[i]:
+                alloc[i] += 1
+                remainder -= 1
+    elif remainder < 0:
+        # Minimum-one guarantees overshot the budget; trim the largest strata
+        for i in np.argsort(-alloc, kind="stable"):
+            if remainder == 0:
+                break
+            take = min(alloc[i] - 1, -remainder)
+            alloc[i] -= take
+            remainder += take
+
+    picked = [rng.choice(strata[key], size=alloc[i], replace=False) for i, key in enumerate(keys) if alloc[i] > 0]
+    # Sorted positions keep embedding reads sequential through the memory map
+    return np.sort(np.concatenate(picked))
+
+
+def copy_embedding_rows(src_path, rows, dst_path):
+    """Stream selected embedding rows from a memory map into a new .npy file"""
+    src = np.load(src_path, mmap_mode="r")
+    dst = np.lib.format.open_memmap(dst_path, mode="w+", dtype=src.dtype, shape=(len(rows), src.shape[1]))
+    for start in range(0, len(rows), EMBEDDING_CHUNK_ROWS):
+        chunk = rows[start:start + EMBEDDING_CHUNK_ROWS]
+        dst[start:start + len(chunk)] = src[chunk]
+    dst.flush()
+    del dst
+    return src.shape
 
 
 def main():
@@ -28,31 +96,51 @@ def main():
     n = len(df)
     k = min(SAMPLE_ROWS, n)
 
-    # Stable sample: if dataset smaller than k, just use all rows
-    if n > k:
-        df_sample = df.sample(n=k, random_state=RANDOM_STATE)
-    else:
-        df_sample = df
+    has_embeddings = os.path.exists(EMB_IN)
+    if has_embeddings:
+        emb_rows = np.load(EMB_IN, mmap_mode="r").shape[0]
+        if emb_rows != n:
+            raise SystemExit(f"{EMB_IN} has {emb_rows} rows but {src} has {n}; rebuild them together.")
+
+    # Stable stratified sample: if dataset smaller than k, just use all rows
+    rows = stratified_rows(df, k, np.random.default_rng(RANDOM_STATE))
+    df_sample = df.iloc[rows].reset_index(drop=True)
 
-    # Write feather first (preferred for runtime)
-    df_sample.reset_index(drop=True).to_feather(FEATHER_OUT)
+    # Write the compressed columnar artifact first (read directly by the server)
+    write_artifact(df_sample, FEATHER_OUT)
+
+    # Aligned embedding subset, row i of the sample matches row i of the frame
+    if has_embeddings:
+        copy_embedding_rows(EMB_IN, rows, EMB_OUT)
+
+    # Derived indexes for the sample, plus where each row came from
+    indexes = build_indexes(df_sample)
+    indexes["source_rows"] = rows.astype(np.int64)
+    index_out = save_indexes(FEATHER_OUT, indexes)
+
+    # Tag the sample frame and embeddings as one build so the server can verify them
+    manifest = BuildManifest(os.path.join(ROOT, MANIFEST_FILE))
+    source_entry = manifest.artifact(src)
+    build_id = manifest.checksum(FEATHER_OUT)[:16]
+    served = [FEATHER_OUT, EMB_OUT] if has_embeddings else [FEATHER_OUT]
+    manifest.record_artifacts(build_id, served, source_build=source_entry["build_id"] if source_entry else None,
+                              sample_rows=int(k))
+    manifest.save()
 
     # Also write CSV (optional, for inspection)
     df_sample.to_csv(CSV_OUT, index=False)
 
-    # Zip the feather for easier upload limits
-    import zipfile
-    with zipfile.ZipFile(ZIP_OUT, mode="w", compression=zipfile.ZIP_DEFLATED) as z:
-        z.write(FEATHER_OUT, arcname=os.path.basename(FEATHER_OUT))
-
     # Print sizes
     def size(p):
         return os.path.getsize(p) if os.path.exists(p) else 0
 
     print("SOURCE:", src, size(src))
-    print("FEATHER_OUT:", FEATHER_OUT, size(FEATHER_OUT))
+    print("ROWS:", k, "of", n, "across", df_sample["category"].nunique() if "category" in df_sample.columns else 0, "categories")
+    print("FEATHER_OUT:", FEATHER_OUT, f"({DEFAULT_COMPRESSION})", size(FEATHER_OUT))
+    print("EMB_OUT:", EMB_OUT if has_embeddings else "(no embeddings found)", size(EMB_OUT) if has_embeddings else 0)
+    print("INDEX_OUT:", index_out, size(index_out))
+    print("BUILD_ID:", build_id)
     print("CSV_OUT:", CSV_OUT, size(CSV_OUT))
-    print("ZIP_OUT:", ZIP_OUT, size(ZIP_OUT))
 
 
 if __name__ == "__main__":
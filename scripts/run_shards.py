@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Run a sharded CourseMate locally: N shard servers plus a coordinator.
+
+Splits the course artifacts into shards/ (unless already split), starts one
+uvicorn process per shard and a coordinator that fans requests out to them.
+
+Usage: python scripts/run_shards.py [shards] [--frame courses_data.feather]
+       [--embeddings course_embeddings_float16.npy] [--port 8000] [--resplit]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from sharding import shard_paths, split_artifacts  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run N local shard servers and a coordinator")
+    parser.add_argument("shards", nargs="?", type=int, default=2)
+    parser.add_argument("--frame", default=os.getenv("COURSES_DATA_FILE", "courses_data.feather"))
+    parser.add_argument("--embeddings", default=os.getenv("EMBEDDINGS_FILE", "course_embeddings_float16.npy"))
+    parser.add_argument("--out-dir", default=os.path.join(ROOT, "shards"))
+    parser.add_argument("--port", type=int, default=8000, help="coordinator port; shards use the next N ports")
+    parser.add_argument("--resplit", action="store_true", help="rewrite shard artifacts even if present")
+    args = parser.parse_args()
+
+    count = args.shards
+    embeddings = args.embeddings if os.path.exists(args.embeddings) else None
+    if args.resplit or not all(os.path.exists(shard_paths(args.out_dir, i, count)[0]) for i in range(count)):
+        print(f"Splitting {args.frame} into {count} shards under {args.out_dir}")
+        split_artifacts(args.frame, embeddings, count, args.out_dir)
+
+    procs = []
+    urls = []
+    try:
+        for index in range(count):
+            port = args.port + 1 + index
+            frame_path, emb_path = shard_paths(args.out_dir, index, count)
+            # Per-process state: shards would otherwise overwrite each other's trending snapshot
+            # and evict each other's cached images
+            env = dict(os.environ, COURSES_DATA_FILE=frame_path, SHARD_INDEX=str(index),
+                       SHARD_COUNT=str(count), SHARD_URLS="",
+                       TRENDING_SNAPSHOT_FILE=os.path.join(args.out_dir, f"trending_state.{index}of{count}.npz"),
+                       IMAGE_CACHE_DIR=os.path.join(args.out_dir, f"image_cache.{index}of{count}"))
+            env["EMBEDDINGS_FILE"] = emb_path if embeddings else ""
+            procs.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+                cwd=ROOT, env=env))
+            urls.append(f"http://127.0.0.1:{port}")
+            print(f"shard {index}: {urls[-1]} ({frame_path})")
+
+        env = dict(os.environ, SHARD_URLS=",".join(urls),
+                   IMAGE_CACHE_DIR=os.path.join(args.out_dir, "image_cache.coordinator"))
+        procs.append(subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "info"],
+            cwd=ROOT, env=env))
+        print(f"coordinator: http://127.0.0.1:{args.port}  (Ctrl+C to stop)")
+
+        while all(p.poll() is None for p in procs):
+            time.sleep(0.5)
+        print("A server exited; shutting the rest down")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            if p.poll() is None:
+                p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+
+
+if __name__ == "__main__":
+    main()
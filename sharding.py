@@ -0,0 +1,244 @@
+"""
+Sharding for CourseMate
+Splits course artifacts into N shards by course id and merges the top-K
+lists that shard servers return for search and recommendations
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+import numpy as np
+
+from build_manifest import MANIFEST_FILE, BuildManifest
+from scoring import Deadline
+from course_store import build_indexes, read_artifact, save_indexes, write_artifact
+
+logger = logging.getLogger(__name__)
+
+# Embedding rows copied per chunk when splitting a memory-mapped matrix
+SPLIT_CHUNK_ROWS = 4096
+
+# Budget kept back from the shards for the coordinator's own merge and response
+COORDINATOR_RESERVE_SEC = 0.05
+
+# Shard response headers a coordinator passes on when it proxies a request
+FORWARDED_HEADERS = ("Retry-After", "X-Partial-Results")
+
+
+def shard_of(course_id: int, count: int) -> int:
+    """Shard that owns a course id"""
+    return int(course_id) % count
+
+
+def parse_shard_urls(spec: str) -> List[str]:
+    """Comma-separated shard base URLs, shard 0 first"""
+    return [url.strip().rstrip("/") for url in (spec or "").split(",") if url.strip()]
+
+
+# ===========================================
+# SPLITTING ARTIFACTS
+# ===========================================
+
+def shard_paths(out_dir: str, index: int, count: int) -> Tuple[str, str]:
+    """Frame and embeddings paths of one shard"""
+    stem = os.path.join(out_dir, f"courses_data.shard{index}of{count}")
+    return stem + ".feather", stem + ".embeddings.npy"
+
+
+def split_artifacts(frame_path: str, embeddings_path: Optional[str], count: int, out_dir: str) -> List[Tuple[str, Optional[str]]]:
+    """Write one self-contained snapshot per shard (frame, indexes, embeddings, manifest entry).
+
+    Each shard is an ordinary artifact set, so a shard server loads it through
+    COURSES_DATA_FILE / EMBEDDINGS_FILE like any other snapshot.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    frame = read_artifact(frame_path)
+    embeddings = np.load(embeddings_path, mmap_mode='r') if embeddings_path else None
+    if embeddings is not None and embeddings.shape[0] != len(frame):
+        raise ValueError(f"{embeddings_path} has {embeddings.shape[0]} rows but {frame_path} has {len(frame)}")
+
+    source_manifest = BuildManifest(os.path.join(os.path.dirname(os.path.abspath(frame_path)), MANIFEST_FILE))
+    source_entry = source_manifest.artifact(frame_path)
+    manifest = BuildManifest(os.path.join(out_dir, MANIFEST_FILE))
+
+    owners = frame['id'].to_numpy() % count
+    written = []
+    for index in range(count):
+        rows = np.flatnonzero(owners == index)
+        shard_frame_path, shard_emb_path = shard_paths(out_dir, index, count)
+        shard_frame = frame.iloc[rows].reset_index(drop=True)
+        write_artifact(shard_frame, shard_frame_path)
+        save_indexes(shard_frame_path, build_indexes(shard_frame))
+        served = [shard_frame_path]
+        if embeddings is not None:
+            out = np.lib.format.open_memmap(shard_emb_path, mode="w+", dtype=embeddings.dtype,
+                                            shape=(len(rows), embeddings.shape[1]))
+            for start in range(0, len(rows), SPLIT_CHUNK_ROWS):
+                chunk = rows[start:start + SPLIT_CHUNK_ROWS]
+                out[start:start + len(chunk)] = embeddings[chunk]
+            out.flush()
+            del out
+            served.append(shard_emb_path)
+        build_id = f"{manifest.checksum(shard_frame_path)[:12]}-s{index}of{count}"
+        manifest.record_artifacts(build_id, served, shard_index=index, shard_count=count,
+                                  source_build=source_entry["build_id"] if source_entry else None)
+        written.append((shard_frame_path, shard_emb_path if embeddings is not None else None))
+        logger.info(f"Shard {index}/{count}: {len(rows)} courses -> {shard_frame_path}")
+    manifest.save()
+    return written
+
+
+# ===========================================
+# COORDINATOR
+# ===========================================
+
+def _strip(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop the shard-only ranking fields before a row goes to the client"""
+    row = dict(row)
+    row.pop("score", None)
+    row.pop("canonical_id", None)
+    return row
+
+
+def merge_ranked(pages: Sequence[List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """Merge per-shard rows by score, collapsing near-duplicates across shards.
+
+    Each shard already collapsed its own clusters and returned its best `limit`
+    rows, so the first member of a cluster seen here is its global best.
+    """
+    merged = sorted((row for page in pages for row in page), key=lambda row: -row["score"])
+    seen = set()
+    results = []
+    for row in merged:
+        cluster = row.get("canonical_id", row["id"])
+        if cluster in seen:
+            continue
+        seen.add(cluster)
+        results.append(_strip(row))
+        if len(results) == limit:
+            break
+    return results
+
+
+class ShardCoordinator:
+    """Fans requests out to shard servers over HTTP and merges their answers"""
+
+    def __init__(self, urls: Sequence[str], session: aiohttp.ClientSession, timeout: float = 5.0):
+        self.urls = list(urls)
+        self.session = session
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+
+    def url_for(self, course_id: int) -> str:
+        return self.urls[shard_of(course_id, len(self.urls))]
+
+    def _timeout(self, deadline: Optional[Deadline]) -> aiohttp.ClientTimeout:
+        if deadline is None:
+            return self.timeout
+        return aiohttp.ClientTimeout(total=max(0.01, min(self.timeout.total, deadline.remaining())))
+
+    @staticmethod
+    def _budget_ms(deadline: Optional[Deadline]) -> Optional[float]:
+        """What a shard may spend: the request's remaining time minus the coordinator's reserve"""
+        if deadline is None:
+            return None
+        return max(1.0, 1000 * (deadline.remaining() - COORDINATOR_RESERVE_SEC))
+
+    async def _call(self, base: str, method: str, path: str, deadline: Optional[Deadline] = None,
+                    **kwargs) -> Optional[Any]:
+        try:
+            async with self.session.request(method, base + path, timeout=self._timeout(deadline), **kwargs) as resp:
+                if resp.status == 404:
+                    return None
+                resp.raise_for_status()
+                return await resp.json()
+        except Exception as e:
+            logger.warning(f"Shard {base} failed on {path}: {e}")
+            raise
+
+    async def _scatter(self, method: str, path: str, urls: Optional[Sequence[str]] = None, **kwargs) -> List[Any]:
+        """Call every shard concurrently; failed shards are logged and left out"""
+        urls = self.urls if urls is None else urls
+        answers = await asyncio.gather(*(self._call(base, method, path, **kwargs) for base in urls),
+                                       return_exceptions=True)
+        return [answer for answer in answers if answer is not None and not isinstance(answer, Exception)]
+
+    async def search(self, query: str, limit: int, deadline: Optional[Deadline] = None, sort: str = "relevance"):
+        """Merged search results; returns (rows, partial). Missing or truncated shards make it partial"""
+        # Phase 1: the score normalises subscribers by the max over all matches, which spans shards
+        params = {"query": query}
+        if deadline is not None:
+            params["budget_ms"] = self._budget_ms(deadline)
+        stats = await asyncio.gather(*(self._call(base, "GET", "/shard/search", deadline=deadline, params=params)
+                                       for base in self.urls), return_exceptions=True)
+        answered = [(base, s) for base, s in zip(self.urls, stats) if s is not None and not isinstance(s, Exception)]
+        partial = len(answered) < len(self.urls) or any(s.get("partial") for _, s in answered)
+        live = [(base, s) for base, s in answered if s["matches"]]
+        if not live:
+            return [], partial
+        subs_max = max(s["max_subscribers"] for _, s in live)
+        # Phase 2: only shards with matches rank them (their match sets are cached shard-side)
+        params = {"query": query, "subs_max": subs_max, "limit": limit, "sort": sort}
+        if deadline is not None:
+            params["budget_ms"] = self._budget_ms(deadline)
+        pages = await self._scatter("GET", "/shard/search", urls=[base for base, _ in live], deadline=deadline,
+                                    params=params)
+        partial = partial or len(pages) < len(live) or any(page.get("partial") for page in pages)
+        return merge_ranked([page["rows"] for page in pages], limit), partial
+
+    async def recommendations(self, course_id: int, limit: int, deadline: Optional[Deadline] = None):
+        """Similarity recommendations across shards as (rows, partial); None when the owner cannot score"""
+        owner = self.url_for(course_id)
+        try:
+            source = await self._call(owner, "GET", "/shard/vector", deadline=deadline,
+                                      params={"course_id": course_id})
+        except Exception:
+            # The caller's forward() to the owner reports the failure (a 503 when it is down)
+            return None
+        if source is None or source.get("vector") is None:
+            return None
+        body = {"vector": source["vector"], "limit": limit, "exclude_id": course_id,
+                "exclude_canonical": source.get("canonical_id"), "budget_ms": self._budget_ms(deadline)}
+        pages = await self._scatter("POST", "/shard/similar", deadline=deadline, json=body)
+        partial = len(pages) < len(self.urls) or any(page.get("partial") for page in pages)
+        return merge_ranked([page["rows"] for page in pages], limit), partial
+
+    async def listing(self, kind: str, limit: int, options: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Trending / top-rated: each shard's best rows merged on the listing's sort key"""
+        pages = await self._scatter("GET", "/shard/listing", params={"kind": kind, "limit": limit, **(options or {})})
+        return merge_ranked([page["rows"] for page in pages], limit)
+
+    async def courses(self, params: Dict[str, Any], limit: int) -> List[Dict[str, Any]]:
+        """A /courses listing: each shard's first `limit` rows merged on the sort key"""
+        pages = await self._scatter("GET", "/shard/courses", params={**params, "limit": limit})
+        return merge_ranked([page["rows"] for page in pages], limit)
+
+    async def events(self, events: List[Dict[str, Any]]) -> int:
+        """Route interaction events to the shards owning their courses; returns how many were recorded"""
+        batches: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            batches.setdefault(self.url_for(event["course_id"]), []).append(event)
+        answers = await asyncio.gather(*(self._call(base, "POST", "/shard/events", json={"events": batch})
+                                         for base, batch in batches.items()), return_exceptions=True)
+        return sum(answer["accepted"] for answer in answers if isinstance(answer, dict))
+
+    async def forward(self, course_id: int, path: str, params: Optional[Dict] = None,
+                      deadline: Optional[Deadline] = None) -> Tuple[int, Any, Dict[str, str]]:
+        """Proxy a single-course request to the shard that owns it.
+
+        Returns (status, body, headers to relay). An unreachable or timed-out
+        owner shard becomes a 503.
+        """
+        base = self.url_for(course_id)
+        try:
+            async with self.session.get(base + path, params=params, timeout=self._timeout(deadline)) as resp:
+                headers = {name: resp.headers[name] for name in FORWARDED_HEADERS if name in resp.headers}
+                return resp.status, await resp.json(content_type=None), headers
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            logger.warning(f"Shard {base} failed on {path}: {e!r}")
+            return 503, {"error": "Shard unavailable"}, {"Retry-After": "1"}
+
+    async def info(self) -> List[Dict[str, Any]]:
+        return await self._scatter("GET", "/shard/info")
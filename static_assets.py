@@ -0,0 +1,246 @@
+"""
+Static Assets for CourseMate
+Serves the frontend files from memory: an allowlist of files and asset
+directories is read once, precompressed to gzip (and Brotli when the
+`brotli` package is installed) and fingerprinted by content hash. Pages
+reference assets as `name?v=<hash>`, which are cached as immutable;
+everything else revalidates with ETag / If-None-Match.
+"""
+
+import os
+import re
+import gzip
+import hashlib
+import logging
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Servable file types; compressible ones get precompressed bodies
+ASSET_TYPES = {
+    ".html": ("text/html; charset=utf-8", True),
+    ".css": ("text/css; charset=utf-8", True),
+    ".js": ("text/javascript; charset=utf-8", True),
+    ".json": ("application/json", True),
+    ".svg": ("image/svg+xml", True),
+    ".png": ("image/png", False),
+    ".jpg": ("image/jpeg", False),
+    ".jpeg": ("image/jpeg", False),
+    ".webp": ("image/webp", False),
+    ".ico": ("image/x-icon", True),
+    ".woff2": ("font/woff2", False),
+}
+
+IMMUTABLE = b"public, max-age=31536000, immutable"
+REVALIDATE = b"no-cache"
+
+# Local src= / href= references in HTML, with any existing ?query
+_REFERENCE = re.compile(r'((?:src|href)=")(/?)([^"?#:]+)(\?[^"#]*)?"')
+
+
+class Asset:
+    __slots__ = ("path", "content_type", "version", "bodies")
+
+    def __init__(self, path: str, content_type: str, version: str, bodies: Dict[str, bytes]):
+        self.path = path
+        self.content_type = content_type
+        self.version = version
+        # encoding ("identity", "gzip", "br") -> body
+        self.bodies = bodies
+
+    def etag(self, encoding: str) -> str:
+        return representation_etag(self.version, encoding)
+
+
+def representation_etag(version: str, encoding: str) -> str:
+    """Strong ETag of one encoding of a versioned payload (each representation needs its own)"""
+    return f'"{version}"' if encoding == "identity" else f'"{version}-{encoding}"'
+
+
+def matching_etag(if_none_match: Optional[str], version: str) -> Optional[str]:
+    """The If-None-Match tag naming any representation of `version` (intermediaries may re-encode), or None"""
+    if not if_none_match:
+        return None
+    if if_none_match.strip() == "*":
+        return representation_etag(version, "identity")
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    for encoding in ("identity", "gzip", "br"):
+        etag = representation_etag(version, encoding)
+        if etag in tags:
+            return etag
+    return None
+
+
+def accepted_encodings(header: Optional[str]) -> List[str]:
+    """Content codings the client accepts (q > 0)"""
+    accepted = []
+    for part in (header or "").lower().split(","):
+        coding, _, params = part.partition(";")
+        quality = 1.0
+        name, _, value = params.strip().partition("=")
+        if name.strip() == "q":
+            try:
+                quality = float(value)
+            except ValueError:
+                pass
+        if coding.strip() and quality > 0:
+            accepted.append(coding.strip())
+    return accepted
+
+
+def choose_encoding(header: Optional[str], available) -> str:
+    accepted = accepted_encodings(header)
+    for encoding in ("br", "gzip"):
+        if encoding in available and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def compress(body: bytes, gzip_level: int = 9, brotli_quality: int = 11) -> Dict[str, bytes]:
+    """identity plus whichever precompressed bodies are actually smaller"""
+    bodies = {"identity": body}
+    candidates = {"gzip": gzip.compress(body, compresslevel=gzip_level, mtime=0)}
+    if brotli is not None:
+        candidates["br"] = brotli.compress(body, quality=brotli_quality)
+    for encoding, encoded in candidates.items():
+        if len(encoded) < len(body):
+            bodies[encoding] = encoded
+    return bodies
+
+
+class StaticAssets:
+    """The allowlisted files under `root`, keyed by URL path ("/" maps to `index`)"""
+
+    def __init__(self, root: str, files: List[str], directories: List[str], index: str = "index.html"):
+        self.root = root
+        self.files = files
+        self.directories = directories
+        self.index = index
+        self.assets: Dict[str, Asset] = {}
+        self.stats = {"served": 0, "not_modified": 0, "gzip": 0, "br": 0, "identity": 0}
+        self.load()
+
+    def _allowed_paths(self) -> List[str]:
+        paths = [path for path in self.files if os.path.isfile(os.path.join(self.root, path))]
+        for directory in self.directories:
+            base = os.path.join(self.root, directory)
+            for current, _, names in os.walk(base):
+                for name in sorted(names):
+                    rel = os.path.relpath(os.path.join(current, name), self.root).replace(os.sep, "/")
+                    paths.append(rel)
+        return [path for path in paths if os.path.splitext(path)[1].lower() in ASSET_TYPES]
+
+    def _build(self, path: str, body: bytes) -> Asset:
+        content_type, compressible = ASSET_TYPES[os.path.splitext(path)[1].lower()]
+        version = hashlib.blake2b(body, digest_size=8).hexdigest()
+        bodies = compress(body) if compressible else {"identity": body}
+        return Asset(path, content_type, version, bodies)
+
+    def _fingerprint_html(self, html: str) -> str:
+        """Point local asset references at their content-hashed URLs"""
+        def replace(match):
+            prefix, slash, path, _ = match.groups()
+            asset = self.assets.get("/" + path)
+            if asset is None:
+                return match.group(0)
+            return f'{prefix}{slash}{path}?v={asset.version}"'
+        return _REFERENCE.sub(replace, html)
+
+    def load(self):
+        """(Re)read, fingerprint and precompress every allowlisted file"""
+        assets: Dict[str, Asset] = {}
+        pages = []
+        for path in self._allowed_paths():
+            with open(os.path.join(self.root, path), "rb") as f:
+                body = f.read()
+            if path.endswith(".html"):
+                pages.append((path, body))
+                continue
+            assets["/" + path] = self._build(path, body)
+        self.assets = assets
+        # Pages last: they embed the other assets' versions
+        for path, body in pages:
+            html = self._fingerprint_html(body.decode("utf-8"))
+            self.assets["/" + path] = self._build(path, html.encode("utf-8"))
+        if self.index in self.files and "/" + self.index in self.assets:
+            self.assets["/"] = self.assets["/" + self.index]
+        raw = sum(len(a.bodies["identity"]) for a in self.assets.values())
+        logger.info(f"Static assets: {len(self.assets)} paths, {raw / 1e3:.0f} KB"
+                    f"{' (brotli)' if brotli is not None else ' (gzip only, brotli not installed)'}")
+
+    def url(self, path: str) -> str:
+        """Fingerprinted URL for an asset path"""
+        asset = self.assets.get("/" + path.lstrip("/"))
+        return f"/{path.lstrip('/')}?v={asset.version}" if asset else f"/{path.lstrip('/')}"
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            **self.stats,
+            "assets": {path: {"version": asset.version,
+                              "bytes": {enc: len(body) for enc, body in asset.bodies.items()}}
+                       for path, asset in self.assets.items() if path != "/"},
+        }
+
+
+class StaticAssetsMiddleware:
+    """Pure ASGI middleware answering GET/HEAD for the asset paths; other requests pass through.
+
+    Added outside GZipMiddleware so precompressed bodies are never re-encoded.
+    """
+
+    def __init__(self, app, assets: StaticAssets):
+        self.app = app
+        self.assets = assets
+
+    @staticmethod
+    def _request_headers(scope) -> Tuple[Optional[str], Optional[str]]:
+        accept_encoding = if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+            elif name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+        return accept_encoding, if_none_match
+
+    @staticmethod
+    def _fingerprinted(scope, asset: Asset) -> bool:
+        query = scope.get("query_string", b"").decode("latin-1")
+        return f"v={asset.version}" in query.split("&")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        asset = self.assets.assets.get(scope["path"])
+        if asset is None:
+            return await self.app(scope, receive, send)
+
+        accept_encoding, if_none_match = self._request_headers(scope)
+        encoding = choose_encoding(accept_encoding, asset.bodies)
+        etag = asset.etag(encoding)
+        headers = [
+            (b"content-type", asset.content_type.encode()),
+            (b"etag", etag.encode()),
+            (b"cache-control", IMMUTABLE if self._fingerprinted(scope, asset) else REVALIDATE),
+        ]
+        if len(asset.bodies) > 1:
+            headers.append((b"vary", b"Accept-Encoding"))
+
+        if matching_etag(if_none_match, asset.version):
+            self.assets.stats["not_modified"] += 1
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        body = asset.bodies[encoding]
+        if encoding != "identity":
+            headers.append((b"content-encoding", encoding.encode()))
+        headers.append((b"content-length", str(len(body)).encode()))
+        self.assets.stats["served"] += 1
+        self.assets.stats[encoding] += 1
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
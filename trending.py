@@ -0,0 +1,266 @@
+"""
+Trending for CourseMate
+Exponentially time-decayed interaction counters fed by frontend events
+(impressions, clicks, watchlist adds). Every event goes into a count-min
+sketch; courses whose estimate beats the weakest tracked course get an
+exact counter in fixed-size arrays, and a top-K heap over those counters
+is kept current on every update. Decay uses a forward-decay landmark, so
+an event touches one counter instead of all of them. State is written to
+disk periodically and reloaded at startup.
+"""
+
+import os
+import math
+import time
+import heapq
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Contribution of one event of each type to a course's trending score
+EVENT_WEIGHTS = {"impression": 0.05, "click": 1.0, "watchlist": 4.0}
+
+# Stored values grow as e^((now - landmark) / tau); everything is rescaled
+# before that factor eats into float64 headroom
+MAX_EXPONENT = 40.0
+
+# The heap is rebuilt from the live top-K once stale entries outnumber them this many times
+HEAP_SLACK = 4
+
+
+class CountMinSketch:
+    """`depth` rows of `width` float counters (rounded up to a power of two); estimates never undercount"""
+
+    def __init__(self, width: int = 65536, depth: int = 4, seed: int = 0x7E4D):
+        self.bits = max(1, int(width - 1).bit_length())
+        self.width = 1 << self.bits
+        self.depth = depth
+        rng = np.random.default_rng(seed)
+        # Odd 64-bit multipliers for multiply-shift hashing (one per row)
+        self.multipliers = rng.integers(1, 2 ** 63, size=depth, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.table = np.zeros((depth, self.width), dtype=np.float64)
+        self._rows = np.arange(depth)[:, None]
+
+    def _columns(self, keys: np.ndarray) -> np.ndarray:
+        keys = keys.astype(np.uint64)
+        # uint64 products wrap, which is what multiply-shift hashing wants
+        with np.errstate(over="ignore"):
+            hashed = self.multipliers[:, None] * keys[None, :]
+        return (hashed >> np.uint64(64 - self.bits)).astype(np.intp)
+
+    def add(self, keys: np.ndarray, amounts: np.ndarray) -> np.ndarray:
+        """Add `amounts` to `keys` (unique) and return their estimates afterwards"""
+        columns = self._columns(keys)
+        for row in range(self.depth):
+            np.add.at(self.table[row], columns[row], amounts)
+        return self.table[self._rows, columns].min(axis=0)
+
+    def estimate(self, keys: np.ndarray) -> np.ndarray:
+        return self.table[self._rows, self._columns(keys)].min(axis=0)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.table.nbytes)
+
+
+class TrendingTracker:
+    """Decayed interaction scores with a half-life of `half_life` seconds.
+
+    At most `capacity` courses hold exact counters; the rest live only in the
+    sketch until their estimate beats the weakest tracked course. The
+    `top_k` best tracked courses are kept in a heap for /trending.
+    """
+
+    def __init__(self, half_life: float, capacity: int = 4096, top_k: int = 200, sketch_width: int = 65536,
+                 sketch_depth: int = 4, weights: Optional[Dict[str, float]] = None):
+        self.half_life = half_life
+        self.tau = half_life / math.log(2)
+        self.capacity = capacity
+        # The heap must be smaller than the tracked set, so eviction never removes a leader
+        self.top_k = min(top_k, capacity - 1)
+        self.weights = dict(weights or EVENT_WEIGHTS)
+        self.landmark = time.time()
+        self.sketch = CountMinSketch(sketch_width, sketch_depth)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.scores = np.zeros(capacity, dtype=np.float64)
+        self.slots: Dict[int, int] = {}
+        # Lower bound on the smallest tracked score (scores only grow between rescales)
+        self._floor = 0.0
+        self._top: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []
+        # Events arrive on the event loop; snapshots are copied from a worker thread
+        self._lock = threading.Lock()
+        self.stats = {"events": 0, "admitted": 0, "evicted": 0, "sketch_only": 0, "rescales": 0, "snapshots": 0}
+
+    # ---------- ingestion ----------
+
+    def record(self, course_ids: Sequence[int], kinds: Sequence[str], now: Optional[float] = None) -> int:
+        """Count one event per (course id, kind) pair; returns how many were recorded"""
+        if not len(course_ids):
+            return 0
+        now = time.time() if now is None else now
+        with self._lock:
+            exponent = (now - self.landmark) / self.tau
+            if exponent > MAX_EXPONENT:
+                self._rescale(now)
+                exponent = 0.0
+            growth = math.exp(exponent)
+            ids = np.asarray(course_ids, dtype=np.int64)
+            amounts = np.fromiter((self.weights[kind] for kind in kinds), dtype=np.float64, count=len(ids)) * growth
+            # All of a batch's events for one course become a single update
+            unique, inverse = np.unique(ids, return_inverse=True)
+            totals = np.bincount(inverse, weights=amounts)
+            estimates = self.sketch.add(unique, totals)
+            for course_id, total, estimate in zip(unique.tolist(), totals.tolist(), estimates.tolist()):
+                slot = self.slots.get(course_id)
+                if slot is not None:
+                    self.scores[slot] += total
+                elif estimate <= self._floor and len(self.slots) >= self.capacity:
+                    self.stats["sketch_only"] += 1
+                    continue
+                else:
+                    slot = self._admit(course_id, estimate)
+                    if slot is None:
+                        continue
+                self._offer(course_id, float(self.scores[slot]))
+            self.stats["events"] += len(ids)
+        return len(ids)
+
+    def _admit(self, course_id: int, estimate: float) -> Optional[int]:
+        """Give a course an exact counter seeded with its sketch estimate, evicting the weakest if full"""
+        if len(self.slots) < self.capacity:
+            slot = len(self.slots)
+        else:
+            slot = int(np.argmin(self.scores))
+            self._floor = float(self.scores[slot])
+            if self._floor >= estimate:
+                self.stats["sketch_only"] += 1
+                return None
+            # Its count stays in the sketch, so it can come back with its history
+            evicted = int(self.ids[slot])
+            del self.slots[evicted]
+            self._top.pop(evicted, None)
+            self.stats["evicted"] += 1
+        self.ids[slot] = course_id
+        self.scores[slot] = estimate
+        self.slots[course_id] = slot
+        self.stats["admitted"] += 1
+        return slot
+
+    def _offer(self, course_id: int, score: float):
+        """Update the top-K with a course's new score (stale heap entries are skipped lazily)"""
+        if course_id not in self._top and len(self._top) >= self.top_k:
+            weakest, weakest_id = self._heap_min()
+            if score <= weakest:
+                return
+            heapq.heappop(self._heap)
+            del self._top[weakest_id]
+        self._top[course_id] = score
+        heapq.heappush(self._heap, (score, course_id))
+        if len(self._heap) > HEAP_SLACK * max(self.top_k, 16):
+            self._rebuild_heap()
+
+    def _heap_min(self) -> Tuple[float, int]:
+        while self._heap[0][0] != self._top.get(self._heap[0][1]):
+            heapq.heappop(self._heap)
+        return self._heap[0]
+
+    def _rebuild_heap(self):
+        self._heap = [(score, course_id) for course_id, score in self._top.items()]
+        heapq.heapify(self._heap)
+
+    def _rescale(self, now: float):
+        """Move the landmark to `now`: every stored value becomes its decayed value"""
+        factor = math.exp(-(now - self.landmark) / self.tau)
+        self.scores *= factor
+        self.sketch.table *= factor
+        self._floor *= factor
+        self._top = {course_id: score * factor for course_id, score in self._top.items()}
+        self._rebuild_heap()
+        self.landmark = now
+        self.stats["rescales"] += 1
+
+    # ---------- queries ----------
+
+    def top(self, count: Optional[int] = None, min_score: float = 0.0,
+            now: Optional[float] = None) -> List[Tuple[int, float]]:
+        """(course id, decayed score) of the leaders, best first, scores at least `min_score`"""
+        now = time.time() if now is None else now
+        with self._lock:
+            decay = math.exp(-(now - self.landmark) / self.tau)
+            leaders = sorted(self._top.items(), key=lambda item: (-item[1], item[0]))
+        ranked = [(course_id, score * decay) for course_id, score in leaders if score * decay >= min_score]
+        return ranked if count is None else ranked[:count]
+
+    def score(self, course_id: int, now: Optional[float] = None) -> float:
+        """Decayed score of one course (exact when tracked, else the sketch's upper bound)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            slot = self.slots.get(course_id)
+            stored = self.scores[slot] if slot is not None else \
+                self.sketch.estimate(np.asarray([course_id], dtype=np.int64))[0]
+            return float(stored) * math.exp(-(now - self.landmark) / self.tau)
+
+    # ---------- persistence ----------
+
+    def save(self, path: str):
+        """Write the counters to `path` (atomically, via a temporary file)"""
+        with self._lock:
+            tracked = len(self.slots)
+            state = {
+                "ids": self.ids[:tracked].copy(),
+                "scores": self.scores[:tracked].copy(),
+                "sketch": self.sketch.table.copy(),
+                "landmark": np.float64(self.landmark),
+                "tau": np.float64(self.tau),
+            }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **state)
+        os.replace(tmp, path)
+        self.stats["snapshots"] += 1
+
+    def load(self, path: str, now: Optional[float] = None) -> bool:
+        """Restore counters saved by `save`, decayed to `now`; False when there is nothing usable"""
+        if not os.path.exists(path):
+            return False
+        now = time.time() if now is None else now
+        try:
+            with np.load(path) as data:
+                state = {name: data[name] for name in data.files}
+            # Values saved against another landmark (and maybe another half-life) become decayed values
+            factor = math.exp(-(now - float(state["landmark"])) / float(state["tau"]))
+            ids, scores = state["ids"][:self.capacity], state["scores"][:self.capacity] * factor
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable trending snapshot {path}: {e}")
+            return False
+        with self._lock:
+            self.landmark = now
+            self.ids[:len(ids)] = ids
+            self.scores[:len(ids)] = scores
+            self.slots = {int(course_id): slot for slot, course_id in enumerate(ids)}
+            if state["sketch"].shape == self.sketch.table.shape:
+                self.sketch.table = state["sketch"] * factor
+            self._floor = float(scores.min()) if len(scores) else 0.0
+            self._top = {}
+            self._heap = []
+            for slot in np.argsort(-scores, kind="stable")[:self.top_k]:
+                self._top[int(ids[slot])] = float(scores[slot])
+            self._rebuild_heap()
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "tracked": len(self.slots),
+            "capacity": self.capacity,
+            "leaders": len(self._top),
+            "half_life_hours": round(self.half_life / 3600, 2),
+            "bytes": self.sketch.nbytes + int(self.ids.nbytes + self.scores.nbytes),
+        }
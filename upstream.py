@@ -0,0 +1,257 @@
+"""
+Upstream API Client for CourseMate
+Shared layer for outbound JSON calls (Udemy, RapidAPI, other catalogues):
+jittered retries, a circuit breaker per host, coalescing of identical
+in-flight requests and a TTL cache that can serve stale data when the
+upstream is failing
+"""
+
+import time
+import random
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth another attempt; other 4xx mean the request itself is wrong
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+# Parameters holding free text; their values are case- and whitespace-normalised in cache keys
+FREE_TEXT_PARAMS = {"search", "query", "q"}
+
+
+class UpstreamError(Exception):
+    """An upstream call failed after retries (or was refused by the circuit breaker)"""
+
+    def __init__(self, host: str, message: str, status: Optional[int] = None):
+        super().__init__(f"{host}: {message}")
+        self.host = host
+        self.status = status
+
+
+class CircuitOpen(UpstreamError):
+    pass
+
+
+def normalize_params(params: Optional[Dict[str, Any]]) -> Tuple[Tuple[str, str], ...]:
+    """Canonical, hashable form of query parameters (sorted, empty values dropped)"""
+    items = []
+    for key, value in (params or {}).items():
+        if value is None or value == "":
+            continue
+        text = " ".join(str(value).split())
+        if key in FREE_TEXT_PARAMS:
+            text = text.lower()
+        items.append((key, text))
+    return tuple(sorted(items))
+
+
+# ===========================================
+# CIRCUIT BREAKER
+# ===========================================
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; lets one probe through after `reset_timeout`"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            return True
+        # Half-open admits a single probe until it resolves
+        return self.state == self.CLOSED
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+
+# ===========================================
+# CACHE
+# ===========================================
+
+class TTLCache:
+    """LRU of responses that are fresh for `ttl` seconds and usable as a fallback for `stale_ttl`"""
+
+    def __init__(self, ttl: float, stale_ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key, allow_stale: bool = False):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        age = time.monotonic() - entry[0]
+        if age > self.stale_ttl:
+            del self._entries[key]
+            return None
+        if age > self.ttl and not allow_stale:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key, value):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# ===========================================
+# CLIENT
+# ===========================================
+
+class UpstreamClient:
+    """GET-JSON client over a shared aiohttp session"""
+
+    def __init__(self, session: aiohttp.ClientSession, max_retries: int = 3, attempt_timeout: float = 4.0,
+                 cache_ttl: float = 60.0, stale_ttl: float = 600.0, backoff_base: float = 0.2,
+                 backoff_max: float = 2.0, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 max_cache_entries: int = 1024):
+        self.session = session
+        self.max_retries = max_retries
+        self.timeout = aiohttp.ClientTimeout(total=attempt_timeout)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.cache = TTLCache(cache_ttl, stale_ttl, max_cache_entries)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._inflight: Dict[Any, asyncio.Future] = {}
+        self.stats = {"requests": 0, "cache_hits": 0, "coalesced": 0, "upstream_calls": 0,
+                      "retries": 0, "failures": 0, "stale_served": 0}
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return breaker
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None,
+                       headers: Optional[Dict[str, str]] = None, use_cache: bool = True) -> Any:
+        """Cached, coalesced, retried GET returning parsed JSON.
+
+        Raises UpstreamError when the upstream fails and no stale copy exists.
+        """
+        self.stats["requests"] += 1
+        key = (url, normalize_params(params))
+        if use_cache:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.stats["cache_hits"] += 1
+                return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+        else:
+            pending = asyncio.ensure_future(self._fetch(url, params, headers))
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda done: self._settled(key, done))
+        try:
+            # shield: one caller giving up must not cancel the fetch the others are waiting on
+            data = await asyncio.shield(pending)
+        except UpstreamError:
+            stale = self.cache.get(key, allow_stale=True) if use_cache else None
+            if stale is not None:
+                self.stats["stale_served"] += 1
+                return stale
+            raise
+        if use_cache:
+            self.cache.set(key, data)
+        return data
+
+    def _settled(self, key, done: asyncio.Future):
+        self._inflight.pop(key, None)
+        # Mark the outcome retrieved even if every waiter was cancelled (avoids "never retrieved" noise)
+        if not done.cancelled():
+            done.exception()
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After when it is short enough"""
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _fetch(self, url: str, params: Optional[Dict[str, Any]], headers: Optional[Dict[str, str]]) -> Any:
+        host = urlparse(url).hostname or url
+        breaker = self.breaker(host)
+        last_error = "no attempt made"
+        last_status = None
+        for attempt in range(self.max_retries + 1):
+            if not breaker.allow():
+                self.stats["failures"] += 1
+                raise CircuitOpen(host, "circuit open")
+            if attempt:
+                self.stats["retries"] += 1
+            self.stats["upstream_calls"] += 1
+            retry_after = None
+            try:
+                async with self.session.get(url, params=params, headers=headers, timeout=self.timeout) as resp:
+                    if resp.status < 400:
+                        data = await resp.json(content_type=None)
+                        breaker.record_success()
+                        return data
+                    last_status = resp.status
+                    last_error = f"HTTP {resp.status}"
+                    if resp.status not in RETRYABLE_STATUSES:
+                        # The upstream answered; the request is what's wrong
+                        breaker.record_success()
+                        self.stats["failures"] += 1
+                        raise UpstreamError(host, last_error, resp.status)
+                    retry_after = resp.headers.get("Retry-After")
+            except UpstreamError:
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                last_error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            breaker.record_failure()
+            if attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+        self.stats["failures"] += 1
+        logger.warning(f"Upstream {host} failed after {self.max_retries + 1} attempts: {last_error}")
+        raise UpstreamError(host, last_error, last_status)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "cache_entries": len(self.cache),
+            "inflight": len(self._inflight),
+            "hosts": {host: breaker.metrics() for host, breaker in self._breakers.items()},
+        }